@@ -0,0 +1,4 @@
+"""
+II-Agent MCP Server Add-On - Benchmarks Init
+Initializes the benchmarks package
+"""
@@ -0,0 +1,134 @@
+"""
+II-Agent MCP Server Add-On - JSON Benchmark
+Compares bytes/sec of the standard library JSON path against the fast JSON
+backend for upstream payload encoding, upstream response decoding and
+/generate response rendering
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Callable, Dict, Any, List, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Add parent directory to path for imports
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+
+from ii_agent_mcp_mvp.utils import jsonlib
+
+SIZES = {"1KB": 1024, "32KB": 32 * 1024, "512KB": 512 * 1024}
+
+
+class GenerateResponse(BaseModel):
+    """Same fields as main.GenerateResponse, which cannot be imported without starting the app's config"""
+    text: str
+    model: str
+    provider: str
+    latency: float
+    fallback_used: bool = False
+    usage: Optional[Dict[str, int]] = None
+    cost: Optional[float] = None
+
+
+def _text(size: int) -> str:
+    """Mixed ASCII and non-ASCII text of roughly the given size in bytes"""
+    unit = "The quick brown fox jumps over the lazy dog. Überprüfung — ok. "
+    return (unit * (size // len(unit.encode()) + 1))[:size]
+
+
+def _payloads(size: int) -> Dict[str, Any]:
+    text = _text(size)
+    usage = {"prompt_tokens": size // 4, "completion_tokens": size // 4, "cached_tokens": 0, "total_tokens": size // 2}
+    return {
+        "request": {
+            "model": "deepseek-chat",
+            "messages": [{"role": "user", "content": text}],
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "max_tokens": 1024
+        },
+        "upstream_response": json.dumps({
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "model": "deepseek-chat",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage
+        }).encode(),
+        "response": {
+            "text": text, "model": "deepseek-chat", "provider": "deepseek", "latency": 1.25,
+            "fallback_used": False, "usage": usage, "cost": 0.000123
+        }
+    }
+
+
+def _measure(func: Callable[[], int], min_time: float) -> float:
+    """Run func repeatedly for at least min_time seconds, returning bytes/sec"""
+    func()
+    total_bytes = 0
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        total_bytes += func()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and iterations >= 3:
+            return total_bytes / elapsed
+
+
+def run(min_time: float = 0.5) -> List[Dict[str, Any]]:
+    """Benchmark each operation and payload size on both paths"""
+    results = []
+    for label, size in SIZES.items():
+        data = _payloads(size)
+        request, upstream_response, response = data["request"], data["upstream_response"], data["response"]
+
+        cases = {
+            # requests' json= keyword vs encoding the payload ourselves
+            "encode": (lambda: len(json.dumps(request).encode()),
+                       lambda: len(jsonlib.dumps(request))),
+            # response.json() decodes the body to text first
+            "decode": (lambda: len(upstream_response) if json.loads(upstream_response.decode("utf-8")) else 0,
+                       lambda: len(upstream_response) if jsonlib.loads(upstream_response) else 0),
+            # FastAPI validates against the response model, dumps it and renders with the stdlib
+            "render": (lambda: len(JSONResponse(GenerateResponse.model_validate(response).model_dump(mode="json")).body),
+                       lambda: len(jsonlib.FastJSONResponse(response).body))
+        }
+
+        for operation, (baseline, fast) in cases.items():
+            baseline_rate = _measure(baseline, min_time)
+            fast_rate = _measure(fast, min_time)
+            results.append({
+                "operation": operation,
+                "size": label,
+                "baseline_mb_s": baseline_rate / 1e6,
+                "fast_mb_s": fast_rate / 1e6,
+                "speedup": fast_rate / baseline_rate if baseline_rate else 0.0
+            })
+    return results
+
+
+def main():
+    """Main entry point for the JSON benchmark"""
+    parser = argparse.ArgumentParser(description="II-Agent MCP Server JSON benchmark")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to run each case")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    print(f"Fast JSON backend: {jsonlib.BACKEND}")
+    results = run(args.min_time)
+
+    print(f"\n{'Operation':<10}{'Size':<8}{'Baseline MB/s':>15}{'Fast MB/s':>12}{'Speedup':>10}")
+    for r in results:
+        print(f"{r['operation']:<10}{r['size']:<8}{r['baseline_mb_s']:>15.1f}{r['fast_mb_s']:>12.1f}{r['speedup']:>9.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": jsonlib.BACKEND, "results": results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+II-Agent MCP Server Add-On - Load Test
+Drives /generate at a controlled concurrency against a mock upstream and
+reports throughput, latency percentiles and gateway overhead
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import requests
+import yaml
+
+# Add parent directory to path for imports
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+
+from ii_agent_mcp_mvp.security import SecurityManager
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class GatewayProcess:
+    """Runs the gateway in a subprocess configured against the mock upstream"""
+
+    def __init__(self, upstream_url: str, providers: List[str], extra_config: Optional[Dict[str, Any]] = None):
+        """Prepare a temporary working directory with an encrypted providers.yaml"""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process: Optional[subprocess.Popen] = None
+
+        security = SecurityManager(
+            os.path.join(self.workdir.name, ".mcp_key"),
+            os.path.join(self.workdir.name, ".mcp_salt")
+        )
+        base_urls = {"gemini": f"{upstream_url}/v1beta", "deepseek": f"{upstream_url}/v1", "mistral": f"{upstream_url}/v1"}
+        models = {"gemini": ["gemini-1.5-flash"], "deepseek": ["deepseek-chat"], "mistral": ["mistral-small"]}
+        config = {
+            "providers": [
+                {"name": name, "api_key": security.encrypt("benchmark-key"), "models": models[name], "base_url": base_urls[name]}
+                for name in providers
+            ],
+            "fallback": {"enabled": True, "max_retries": 2, "timeout": 10},
+            "server": {"host": "127.0.0.1", "port": self.port, "log_level": "warning"}
+        }
+        config.update(extra_config or {})
+        with open(os.path.join(self.workdir.name, "providers.yaml"), "w") as f:
+            yaml.dump(config, f, default_flow_style=False)
+
+    def start(self, timeout: float = 30.0, graceful: bool = False) -> None:
+        """Start the gateway and wait until /status answers; graceful runs it through main(), which drains on exit"""
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        if graceful:
+            command = [sys.executable, "-m", "ii_agent_mcp_mvp.main"]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "ii_agent_mcp_mvp.main:app",
+                       "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"]
+        self.process = subprocess.Popen(
+            command, cwd=self.workdir.name, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if requests.get(f"{self.url}/status", timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("Gateway did not start in time")
+
+    def stop(self) -> None:
+        """Stop the gateway and clean up its working directory"""
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.workdir.cleanup()
+
+
+class LoadGenerator:
+    """Sends /generate requests from a pool of worker threads"""
+
+    def __init__(self, gateway_url: str, concurrency: int, prompt: str, payload: Optional[Dict[str, Any]] = None):
+        """Initialize the generator"""
+        self.gateway_url = gateway_url.rstrip("/")
+        self.concurrency = concurrency
+        self.payload = dict(payload or {}, prompt=prompt)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.samples: List[Dict[str, Any]] = []
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _one_request(self) -> None:
+        start = time.perf_counter()
+        sample: Dict[str, Any] = {"status": 0, "latency": 0.0, "upstream_latency": None}
+        try:
+            response = self._session().post(f"{self.gateway_url}/generate", json=self.payload, timeout=60)
+            sample["status"] = response.status_code
+            if response.status_code == 200:
+                sample["upstream_latency"] = response.json().get("latency")
+        except requests.RequestException:
+            sample["status"] = -1
+        sample["latency"] = time.perf_counter() - start
+        with self._lock:
+            self.samples.append(sample)
+
+    def run(self, total_requests: int) -> float:
+        """Send the requests and return the wall-clock duration"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(total_requests):
+                pool.submit(self._one_request)
+        return time.perf_counter() - start
+
+
+def summarize(samples: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    """Compute throughput, latency percentiles and gateway overhead"""
+    ok = [s for s in samples if s["status"] == 200]
+    latencies = [s["latency"] for s in ok]
+    overheads = [s["latency"] - s["upstream_latency"] for s in ok if s["upstream_latency"] is not None]
+
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+
+    return {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "duration": duration,
+        "throughput": len(ok) / duration if duration > 0 else 0.0,
+        "statuses": statuses,
+        "latency": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99)},
+        "overhead": {"p50": percentile(overheads, 50), "p95": percentile(overheads, 95), "p99": percentile(overheads, 99)}
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Compare results against a baseline, returning regressions beyond the threshold (percent)"""
+    regressions = []
+    base, cur = baseline["summary"], current["summary"]
+    if base["throughput"] and cur["throughput"] < base["throughput"] * (1 - threshold / 100):
+        regressions.append(f"throughput {cur['throughput']:.1f} < baseline {base['throughput']:.1f} req/s")
+    for group in ("latency", "overhead"):
+        for pct in ("p50", "p95", "p99"):
+            if base[group][pct] and cur[group][pct] > base[group][pct] * (1 + threshold / 100):
+                regressions.append(f"{group} {pct} {cur[group][pct] * 1000:.1f}ms > baseline {base[group][pct] * 1000:.1f}ms")
+    return regressions
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """Print a human-readable summary"""
+    print("\n=== Load Test Summary ===")
+    print(f"Requests:   {summary['requests']} ({summary['succeeded']} succeeded) in {summary['duration']:.2f}s")
+    print(f"Throughput: {summary['throughput']:.1f} req/s")
+    print(f"Statuses:   {summary['statuses']}")
+    for group in ("latency", "overhead"):
+        values = summary[group]
+        print(f"{group.title():<11} p50={values['p50'] * 1000:.1f}ms p95={values['p95'] * 1000:.1f}ms p99={values['p99'] * 1000:.1f}ms")
+
+
+def main():
+    """Main entry point for the load test"""
+    parser = argparse.ArgumentParser(description="II-Agent MCP Server load test")
+    parser.add_argument("--gateway-url", help="Use an already running gateway instead of starting one")
+    parser.add_argument("--providers", default="gemini,deepseek,mistral", help="Providers to configure on the spawned gateway")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--prompt-words", type=int, default=200, help="Prompt size in words")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Mock upstream latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock upstream 500 rate")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Mock upstream 429 rate")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="Mock completion length in tokens")
+    parser.add_argument("--name", default="load_test", help="Name used for the results file")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    upstream = None
+    gateway = None
+    try:
+        if args.gateway_url:
+            gateway_url = args.gateway_url
+        else:
+            behaviour = UpstreamBehaviour(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.completion_tokens, seed=0)
+            upstream = MockUpstream(behaviour).start()
+            gateway = GatewayProcess(upstream.url, [p.strip() for p in args.providers.split(",") if p.strip()])
+            gateway.start()
+            gateway_url = gateway.url
+
+        prompt = " ".join(["word"] * args.prompt_words)
+        generator = LoadGenerator(gateway_url, args.concurrency, prompt)
+        # Warm up connections before measuring
+        generator.run(min(args.concurrency, args.requests))
+        generator.samples = []
+        duration = generator.run(args.requests)
+    finally:
+        if gateway:
+            gateway.stop()
+        if upstream:
+            upstream.stop()
+
+    summary = summarize(generator.samples, duration)
+    print_summary(summary)
+
+    results = {"name": args.name, "timestamp": time.time(), "parameters": vars(args), "summary": summary}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_file = os.path.join(RESULTS_DIR, f"{args.name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(results_file, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {results_file}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+II-Agent MCP Server Add-On - Mock Upstream Server
+Local fake Gemini and OpenAI-compatible API with configurable latency and failures
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.compression import CompressionError, decompress
+
+GEMINI_GENERATE = re.compile(r"^/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+GEMINI_EMBED = re.compile(r"^/v1beta/models/(?P<model>[^:/]+):batchEmbedContents$")
+
+# Length of the vectors returned by the embedding endpoints
+EMBEDDING_DIMENSIONS = 8
+
+DEFAULT_MODELS = {
+    "gemini": ["gemini-1.5-pro", "gemini-1.5-flash"],
+    "openai": ["deepseek-chat", "deepseek-coder", "mistral-large", "mistral-small"]
+}
+
+
+def mock_embedding(text: str) -> List[float]:
+    """The vector the mock returns for a text, derived from its hash so tests can check ordering"""
+    digest = hashlib.sha256(text.encode()).digest()
+    return [round(byte / 255 * 2 - 1, 4) for byte in digest[:EMBEDDING_DIMENSIONS]]
+
+
+class UpstreamBehaviour:
+    """Tunable behaviour of the mock upstream"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, completion_tokens: int = 64, stream_chunks: int = 8,
+                 seed: Optional[int] = None):
+        """Initialize the behaviour"""
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.completion_tokens = completion_tokens
+        self.stream_chunks = max(1, stream_chunks)
+        # Status returned by the model-listing endpoints, to simulate outages seen by health checks
+        self.list_models_status = 200
+        # API keys answered with 429, to simulate one exhausted key in a pool
+        self.limited_keys = set()
+        # API keys rejected as invalid, the way each API does it: Gemini with a 400, the others with a 401
+        self.invalid_keys = set()
+        self.key_requests: Dict[str, int] = {}
+        # traceparent header of each POST, to check trace context is propagated upstream
+        self.traceparents: List[Optional[str]] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "compressed_requests": 0, "compressed_bytes": 0,
+                      "connections": 0, "head_requests": 0, "embedding_requests": 0, "embedded_texts": 0}
+
+    def record(self, stat: str) -> None:
+        """Increment a counter in stats"""
+        with self._lock:
+            self.stats[stat] += 1
+
+    def record_embedding(self, texts: int) -> None:
+        """Count an embedding request and the texts in it"""
+        with self._lock:
+            self.stats["embedding_requests"] += 1
+            self.stats["embedded_texts"] += texts
+
+    def record_key(self, key: str, traceparent: Optional[str] = None) -> None:
+        """Count a generation request made with an API key, keeping its trace context"""
+        with self._lock:
+            self.key_requests[key] = self.key_requests.get(key, 0) + 1
+            self.traceparents.append(traceparent)
+
+    def record_compressed(self, size: int) -> None:
+        """Count a compressed request body"""
+        with self._lock:
+            self.stats["compressed_requests"] += 1
+            self.stats["compressed_bytes"] += size
+
+    def next_outcome(self) -> str:
+        """Pick the outcome of the next generation request"""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return "rate_limited"
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.stats["errors"] += 1
+                return "error"
+            return "ok"
+
+    def delay(self) -> float:
+        """Sample a response delay"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter)
+
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    """Request handler emulating the Gemini and OpenAI chat completion and embedding APIs"""
+
+    protocol_version = "HTTP/1.1"
+    MAX_BODY_SIZE = 64 * 1024 * 1024
+    behaviour: UpstreamBehaviour = UpstreamBehaviour()
+
+    def log_message(self, format: str, *args) -> None:
+        """Silence per-request logging"""
+        pass
+
+    def setup(self) -> None:
+        """Count accepted connections, so tests can check connection reuse"""
+        super().setup()
+        self.behaviour.record("connections")
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = self.rfile.read(length)
+        encoding = self.headers.get("Content-Encoding", "identity").lower()
+        if encoding != "identity":
+            self.behaviour.record_compressed(len(body))
+            body = decompress(body, encoding, self.MAX_BODY_SIZE, direction="mock_upstream")
+        return json.loads(body or b"{}")
+
+    def _api_key(self) -> str:
+        """The key from a Bearer header or Gemini's key query parameter"""
+        authorization = self.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            return authorization[len("Bearer "):]
+        return parse_qs(urlsplit(self.path).query).get("key", [""])[0]
+
+    def _completion_text(self) -> str:
+        return " ".join(["token"] * self.behaviour.completion_tokens)
+
+    def _fail_if_needed(self) -> bool:
+        """Apply the sampled outcome, returning True if an error was sent"""
+        outcome = self.behaviour.next_outcome()
+        time.sleep(self.behaviour.delay())
+        if outcome == "rate_limited":
+            self._send_json(429, {"error": {"code": 429, "message": "Rate limit exceeded"}},
+                            {"Retry-After": "1", "x-ratelimit-remaining": "0"})
+            return True
+        if outcome == "error":
+            self._send_json(500, {"error": {"code": 500, "message": "Internal error"}})
+            return True
+        return False
+
+    def _start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _stream_pieces(self):
+        """Split the completion into the configured number of chunks"""
+        words = self._completion_text().split(" ")
+        chunks = self.behaviour.stream_chunks
+        size = max(1, len(words) // chunks)
+        for i in range(0, len(words), size):
+            yield " ".join(words[i:i + size]) + " "
+
+    def do_GET(self) -> None:
+        """List models"""
+        if self.behaviour.list_models_status != 200:
+            self._send_json(self.behaviour.list_models_status, {"error": "unavailable"})
+        elif self.path.startswith("/v1beta/models"):
+            self._send_json(200, {"models": [{"name": f"models/{m}"} for m in DEFAULT_MODELS["gemini"]]})
+        elif self.path.startswith("/v1/models"):
+            self._send_json(200, {"data": [{"id": m} for m in DEFAULT_MODELS["openai"]]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_HEAD(self) -> None:
+        """Answer connection warm-up and keep-alive pings"""
+        self.behaviour.record("head_requests")
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self) -> None:
+        """Serve generation and embedding requests"""
+        path = self.path.split("?", 1)[0]
+        try:
+            body = self._read_body()
+        except CompressionError as e:
+            self._send_json(400, {"error": {"code": 400, "message": str(e)}})
+            return
+
+        key = self._api_key()
+        self.behaviour.record_key(key, self.headers.get("traceparent"))
+        if key in self.behaviour.limited_keys:
+            self._send_json(429, {"error": {"code": 429, "message": "Quota exceeded for key"}},
+                            {"Retry-After": "1", "x-ratelimit-remaining": "0"})
+            return
+        if key in self.behaviour.invalid_keys:
+            if path.startswith("/v1beta/"):
+                self._send_json(400, {"error": {"code": 400, "message": "API key not valid. Please pass a valid API key.",
+                                                "status": "INVALID_ARGUMENT",
+                                                "details": [{"@type": "type.googleapis.com/google.rpc.ErrorInfo",
+                                                             "reason": "API_KEY_INVALID"}]}})
+            else:
+                self._send_json(401, {"error": {"message": "Invalid API key", "type": "invalid_request_error"}})
+            return
+
+        match = GEMINI_GENERATE.match(path)
+        if match:
+            if self._fail_if_needed():
+                return
+            self._serve_gemini(body, match.group("method") == "streamGenerateContent")
+        elif path == "/v1/chat/completions":
+            if self._fail_if_needed():
+                return
+            self._serve_openai(body)
+        elif GEMINI_EMBED.match(path):
+            if self._fail_if_needed():
+                return
+            texts = [p.get("text", "") for r in body.get("requests", []) for p in r.get("content", {}).get("parts", [])]
+            self.behaviour.record_embedding(len(texts))
+            self._send_json(200, {"embeddings": [{"values": mock_embedding(text)} for text in texts]})
+        elif path == "/v1/embeddings":
+            if self._fail_if_needed():
+                return
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self.behaviour.record_embedding(len(texts))
+            tokens = sum(len(text.split()) for text in texts)
+            # Answered out of order, as the index field allows
+            data = [{"object": "embedding", "index": i, "embedding": mock_embedding(text)} for i, text in enumerate(texts)]
+            self._send_json(200, {"object": "list", "data": data[::-1], "model": body.get("model", "mock"),
+                                  "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _serve_gemini(self, body: Dict[str, Any], stream: bool) -> None:
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        usage = {
+            "promptTokenCount": len(prompt.split()),
+            "candidatesTokenCount": self.behaviour.completion_tokens,
+            "totalTokenCount": len(prompt.split()) + self.behaviour.completion_tokens
+        }
+        if not stream:
+            self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": self._completion_text()}], "role": "model"}}],
+                "usageMetadata": usage
+            })
+            return
+
+        self._start_stream()
+        for piece in self._stream_pieces():
+            event = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}], "usageMetadata": usage}
+            self._write_chunk(f"data: {json.dumps(event)}\r\n\r\n".encode())
+        self._end_stream()
+
+    def _serve_openai(self, body: Dict[str, Any]) -> None:
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        model = body.get("model", "mock")
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": self.behaviour.completion_tokens,
+            "total_tokens": len(prompt.split()) + self.behaviour.completion_tokens
+        }
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "mock-completion",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self._completion_text()}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+
+        self._start_stream()
+        for piece in self._stream_pieces():
+            event = {"id": "mock-completion", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_stream()
+
+
+class MockUpstreamServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients hanging up mid-response, as cancelled gateway calls do"""
+
+    def handle_error(self, request, client_address) -> None:
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockUpstream:
+    """Runs the mock upstream server in a background thread"""
+
+    def __init__(self, behaviour: Optional[UpstreamBehaviour] = None, host: str = "127.0.0.1", port: int = 0):
+        """Initialize the server; port 0 picks a free port"""
+        self.behaviour = behaviour or UpstreamBehaviour()
+        handler = type("BoundMockUpstreamHandler", (MockUpstreamHandler,), {"behaviour": self.behaviour})
+        self.server = MockUpstreamServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockUpstream":
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    """Run the mock upstream in the foreground"""
+    parser = argparse.ArgumentParser(description="Mock Gemini/OpenAI-compatible upstream")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind")
+    parser.add_argument("--port", type=int, default=9100, help="Port to bind")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="Tokens per completion")
+    args = parser.parse_args()
+
+    behaviour = UpstreamBehaviour(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.completion_tokens)
+    upstream = MockUpstream(behaviour, args.host, args.port)
+    print(f"Mock upstream listening on {upstream.url}")
+    print(f"  Gemini base_url:  {upstream.url}/v1beta")
+    print(f"  OpenAI base_url:  {upstream.url}/v1")
+    try:
+        upstream.server.serve_forever()
+    except KeyboardInterrupt:
+        upstream.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+"""
+II-Agent MCP Server Add-On - Admission Control Module
+Prioritized, bounded admission of generation requests with load shedding
+and weighted fair scheduling between clients
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Priority classes, highest priority first
+PRIORITY_CLASSES = ("interactive", "default", "batch")
+DEFAULT_PRIORITY = "default"
+
+DEFAULT_QUEUE_SIZES = {"interactive": 64, "default": 32, "batch": 256}
+
+DEFAULT_CLIENT = "anonymous"
+
+# Prune per-client finish tags once this many clients have been seen
+MAX_TRACKED_CLIENTS = 1024
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        """Initialize with the HTTP status, detail message and Retry-After seconds"""
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class WeightedFairQueue:
+    """Self-clocked weighted fair queue of waiters keyed by client"""
+
+    def __init__(self):
+        """Initialize an empty queue"""
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Any, client: str = DEFAULT_CLIENT, weight: float = 1.0) -> None:
+        """Queue an item; clients with higher weight get proportionally more turns"""
+        start = max(self._virtual_time, self._last_finish.get(client, 0.0))
+        finish = start + 1.0 / max(weight, 1e-6)
+        self._last_finish[client] = finish
+        heapq.heappush(self._heap, (finish, next(self._seq), item))
+
+    def pop(self) -> Any:
+        """Remove and return the item with the earliest finish tag"""
+        finish, _, item = heapq.heappop(self._heap)
+        self._virtual_time = finish
+        if len(self._last_finish) > MAX_TRACKED_CLIENTS:
+            # Clients whose tags are behind virtual time have no backlog left
+            self._last_finish = {c: f for c, f in self._last_finish.items() if f > self._virtual_time}
+        return item
+
+    def remove(self, item: Any) -> bool:
+        """Remove a specific item, returning whether it was queued"""
+        for i, entry in enumerate(self._heap):
+            if entry[2] is item:
+                self._heap[i] = self._heap[-1]
+                self._heap.pop()
+                heapq.heapify(self._heap)
+                return True
+        return False
+
+
+class AdmissionController:
+    """Admits requests into a bounded number of execution slots by priority class"""
+
+    def __init__(self, max_concurrent: int = 16, queue_sizes: Optional[Dict[str, int]] = None,
+                 queue_timeout: float = 30.0, registry: Optional[MetricsRegistry] = None):
+        """Initialize the controller with slot and queue limits"""
+        self.max_concurrent = max_concurrent
+        self.queue_sizes = dict(DEFAULT_QUEUE_SIZES)
+        self.queue_sizes.update(queue_sizes or {})
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queues: Dict[str, WeightedFairQueue] = {p: WeightedFairQueue() for p in PRIORITY_CLASSES}
+        # Moving average of slot hold time, used to estimate Retry-After
+        self._avg_service_time = 1.0
+
+        registry = registry or get_registry()
+        self._queue_depth = registry.gauge("mcp_admission_queue_depth", "Requests waiting for admission")
+        self._active_gauge = registry.gauge("mcp_admission_active", "Requests holding an execution slot")
+        self._wait_time = registry.histogram("mcp_admission_wait_seconds", "Time spent waiting for admission")
+        self._rejected = registry.counter("mcp_admission_rejected_total", "Requests shed by admission control")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "AdmissionController":
+        """Create a controller from the `admission` section of providers.yaml"""
+        config = config or {}
+        return cls(
+            max_concurrent=int(config.get("max_concurrent", 16)),
+            queue_sizes=config.get("queues"),
+            queue_timeout=float(config.get("queue_timeout", 30.0))
+        )
+
+    def normalize_priority(self, priority: Optional[str]) -> str:
+        """Validate a priority class name, defaulting when unset"""
+        if not priority:
+            return DEFAULT_PRIORITY
+        priority = priority.lower()
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+        return priority
+
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        """Get the number of waiting requests, for one class or in total"""
+        if priority:
+            return len(self._queues[priority])
+        return sum(len(q) for q in self._queues.values())
+
+    def _estimate_retry_after(self) -> int:
+        """Estimate how long until a slot frees up for a new request"""
+        backlog = self.queue_depth() + 1
+        return max(1, math.ceil(self._avg_service_time * backlog / max(self.max_concurrent, 1)))
+
+    def _reject(self, priority: str, status_code: int, reason: str, detail: str) -> AdmissionRejected:
+        """Record and build a rejection"""
+        self._rejected.inc(1, {"priority": priority, "reason": reason})
+        logger.warning(f"Shedding {priority} request: {detail}")
+        return AdmissionRejected(status_code, detail, self._estimate_retry_after())
+
+    def _update_gauges(self, priority: str) -> None:
+        self._queue_depth.set(len(self._queues[priority]), {"priority": priority})
+        self._active_gauge.set(self.active)
+
+    async def acquire(self, priority: str, client: str = DEFAULT_CLIENT, weight: float = 1.0) -> float:
+        """Wait for an execution slot and return the time spent waiting"""
+        start_time = time.time()
+
+        # Fast path: a slot is free and nobody is waiting ahead of us
+        if self.active < self.max_concurrent and self.queue_depth() == 0:
+            self.active += 1
+            self._update_gauges(priority)
+            self._wait_time.observe(0.0, {"priority": priority})
+            return 0.0
+
+        queue = self._queues[priority]
+        if len(queue) >= self.queue_sizes.get(priority, 0):
+            raise self._reject(priority, 429, "queue_full", f"{priority} queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        queue.push(future, client, weight)
+        self._update_gauges(priority)
+
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(priority, future)
+            raise
+
+        if not done:
+            self._abandon(priority, future)
+            raise self._reject(priority, 503, "queue_timeout", f"Timed out waiting for admission after {self.queue_timeout}s")
+
+        waited = time.time() - start_time
+        self._wait_time.observe(waited, {"priority": priority})
+        return waited
+
+    def _abandon(self, priority: str, future: asyncio.Future) -> None:
+        """Withdraw a waiter, handing back the slot if it was already granted"""
+        if future.done() and not future.cancelled():
+            self.release()
+            return
+        future.cancel()
+        self._queues[priority].remove(future)
+        self._update_gauges(priority)
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Release a slot and hand it to the highest-priority waiter"""
+        if service_time is not None:
+            self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+
+        for priority in PRIORITY_CLASSES:
+            queue = self._queues[priority]
+            while queue:
+                future = queue.pop()
+                if future.done():
+                    continue
+                # Transfer the slot directly to the waiter
+                future.set_result(None)
+                self._update_gauges(priority)
+                return
+
+        self.active -= 1
+        self._active_gauge.set(self.active)
+
+    @asynccontextmanager
+    async def admit(self, priority: str, client: str = DEFAULT_CLIENT, weight: float = 1.0):
+        """Hold an execution slot for the duration of the block"""
+        await self.acquire(priority, client, weight)
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.release(time.time() - start_time)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the current admission state"""
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queues": {
+                p: {"depth": len(self._queues[p]), "max": self.queue_sizes.get(p, 0)} for p in PRIORITY_CLASSES
+            }
+        }
+
+
+class FairSemaphore:
+    """Thread semaphore that grants freed permits to waiters in weighted fair order"""
+
+    def __init__(self, limit: int):
+        """Initialize with the number of permits"""
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+        self._waiters = WeightedFairQueue()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, client: str = DEFAULT_CLIENT, weight: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Acquire a permit, returning False if none was granted within the timeout"""
+        with self._lock:
+            if self.active < self.limit and not len(self._waiters):
+                self.active += 1
+                return True
+            event = threading.Event()
+            self._waiters.push(event, client, weight)
+
+        if event.wait(timeout):
+            return True
+
+        with self._lock:
+            # The permit may have been handed over just as the wait timed out
+            if event.is_set():
+                return True
+            self._waiters.remove(event)
+            return False
+
+    def release(self) -> None:
+        """Release a permit, handing it directly to the next fair waiter"""
+        with self._lock:
+            # After the limit was lowered, permits are retired until active is back under it
+            if len(self._waiters) and self.active <= self.limit:
+                self._waiters.pop().set()
+                return
+            self.active -= 1
+
+    def set_limit(self, limit: int) -> None:
+        """Change the number of permits, admitting waiters at once if it grew"""
+        with self._lock:
+            self.limit = limit
+            while self.active < self.limit and len(self._waiters):
+                self.active += 1
+                self._waiters.pop().set()
+
+
+# Adaptive concurrency algorithms
+ADAPTIVE_ALGORITHMS = ("gradient", "aimd")
+
+# Starting limit for providers without a static max_concurrent_per_provider
+DEFAULT_ADAPTIVE_LIMIT = 8
+
+# Weights of new latency samples in the short and long-term averages
+SHORT_LATENCY_WEIGHT = 0.5
+LONG_LATENCY_WEIGHT = 0.05
+
+
+class AdaptiveLimit:
+    """Concurrency limit that grows while upstream latency holds steady and backs off when it climbs or calls fail
+
+    The gradient algorithm compares short and long-term latency averages and moves the limit towards
+    limit * gradient plus headroom for queueing; aimd adds one slot per window of healthy calls and
+    multiplies the limit by backoff when a call is slower than tolerance times the long-term average.
+    Both multiply the limit by backoff when a call is rate limited or fails transiently.
+    """
+
+    def __init__(self, initial_limit: int = DEFAULT_ADAPTIVE_LIMIT, min_limit: int = 1, max_limit: int = 64,
+                 algorithm: str = "gradient", tolerance: float = 1.5, backoff: float = 0.9, smoothing: float = 0.2):
+        """Initialize the limit and its bounds"""
+        if algorithm not in ADAPTIVE_ALGORITHMS:
+            raise ValueError(f"Unknown adaptive concurrency algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], initial_limit: int = DEFAULT_ADAPTIVE_LIMIT) -> "AdaptiveLimit":
+        """Create a limit from the `admission.adaptive_concurrency` section of providers.yaml"""
+        return cls(
+            initial_limit=int(config.get("initial_limit", initial_limit)),
+            min_limit=int(config.get("min_limit", 1)),
+            max_limit=int(config.get("max_limit", 64)),
+            algorithm=str(config.get("algorithm", "gradient")).lower(),
+            tolerance=float(config.get("tolerance", 1.5)),
+            backoff=float(config.get("backoff", 0.9)),
+            smoothing=float(config.get("smoothing", 0.2))
+        )
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def update(self, latency: float, inflight: int, dropped: bool = False) -> int:
+        """Adjust the limit from a finished call and return the new limit
+
+        inflight is the number of calls in flight when this one finished; the limit only grows while
+        it is being used, so an idle provider does not build up a limit it was never tested at.
+        """
+        with self._lock:
+            if dropped:
+                self._limit *= self.backoff
+            else:
+                self._observe(latency)
+                if self.algorithm == "aimd":
+                    self._aimd(latency, inflight)
+                else:
+                    self._gradient(inflight)
+            self._limit = min(max(self._limit, self.min_limit), self.max_limit)
+            return self.limit
+
+    def _observe(self, latency: float) -> None:
+        if self._long_latency is None:
+            self._short_latency = self._long_latency = latency
+            return
+        self._short_latency += SHORT_LATENCY_WEIGHT * (latency - self._short_latency)
+        self._long_latency += LONG_LATENCY_WEIGHT * (latency - self._long_latency)
+        # Let the baseline recover quickly once a period of high latency is over
+        if self._long_latency > 2 * self._short_latency:
+            self._long_latency *= 0.95
+
+    def _aimd(self, latency: float, inflight: int) -> None:
+        if latency > self.tolerance * self._long_latency:
+            self._limit *= self.backoff
+        elif inflight * 2 >= self._limit:
+            self._limit += 1.0 / self._limit
+
+    def _gradient(self, inflight: int) -> None:
+        gradient = 1.0
+        if self._short_latency > 0:
+            gradient = max(0.5, min(1.0, self.tolerance * self._long_latency / self._short_latency))
+        target = self._limit * gradient + math.sqrt(self._limit)
+        if inflight * 2 < self._limit:
+            target = min(target, self._limit)
+        self._limit += self.smoothing * (target - self._limit)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the limit and the latency averages it is derived from"""
+        return {
+            "algorithm": self.algorithm,
+            "limit": self.limit,
+            "short_latency": self._short_latency,
+            "long_latency": self._long_latency
+        }
+
+
+class ProviderSlots:
+    """Caps concurrent upstream calls per provider, shared fairly between clients"""
+
+    def __init__(self, limits: Optional[Union[int, Dict[str, int]]] = None, wait_timeout: float = 5.0,
+                 registry: Optional[MetricsRegistry] = None, adaptive: Optional[Dict[str, Any]] = None):
+        """Initialize with a global or per-provider limit (None or 0 means unlimited)
+
+        With adaptive settings every provider gets an AdaptiveLimit, starting from its static limit.
+        """
+        self.limits = limits
+        self.wait_timeout = wait_timeout
+        self.adaptive = adaptive
+        self._semaphores: Dict[str, FairSemaphore] = {}
+        self._controllers: Dict[str, AdaptiveLimit] = {}
+        self._lock = threading.Lock()
+
+        registry = registry or get_registry()
+        self._inflight = registry.gauge("mcp_provider_inflight", "Upstream calls in flight per provider")
+        self._limit_gauge = registry.gauge("mcp_provider_concurrency_limit", "Concurrent upstream calls allowed per provider")
+        self._queued = registry.gauge("mcp_provider_queue_length", "Calls waiting for an upstream slot per provider")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ProviderSlots":
+        """Create provider slots from the `admission` section of providers.yaml"""
+        config = config or {}
+        adaptive = config.get("adaptive_concurrency") or {}
+        return cls(
+            config.get("max_concurrent_per_provider"),
+            float(config.get("provider_wait_timeout", 5.0)),
+            adaptive=adaptive if adaptive.get("enabled", False) else None
+        )
+
+    def _get_limit(self, provider_name: str) -> Optional[int]:
+        if isinstance(self.limits, dict):
+            return self.limits.get(provider_name)
+        return self.limits
+
+    def _get_semaphore(self, provider_name: str) -> Optional[FairSemaphore]:
+        limit = self._get_limit(provider_name)
+        if not limit and self.adaptive is None:
+            return None
+        with self._lock:
+            semaphore = self._semaphores.get(provider_name)
+            if semaphore is None:
+                if self.adaptive is not None:
+                    controller = AdaptiveLimit.from_config(self.adaptive, int(limit or DEFAULT_ADAPTIVE_LIMIT))
+                    self._controllers[provider_name] = controller
+                    limit = controller.limit
+                semaphore = FairSemaphore(int(limit))
+                self._semaphores[provider_name] = semaphore
+                self._limit_gauge.set(float(semaphore.limit), {"provider": provider_name})
+            return semaphore
+
+    @contextmanager
+    def slot(self, provider_name: str, client: str = DEFAULT_CLIENT, weight: float = 1.0):
+        """Hold an upstream slot, yielding False if the provider stayed saturated"""
+        labels = {"provider": provider_name}
+        semaphore = self._get_semaphore(provider_name)
+        if semaphore is not None:
+            self._queued.inc(1, labels)
+            try:
+                acquired = semaphore.acquire(client, weight, self.wait_timeout)
+            finally:
+                self._queued.dec(1, labels)
+            if not acquired:
+                yield False
+                return
+
+        self._inflight.inc(1, labels)
+        try:
+            yield True
+        finally:
+            self._inflight.dec(1, labels)
+            if semaphore is not None:
+                semaphore.release()
+
+    def queue_length(self, provider_name: str) -> int:
+        """Get the number of calls waiting for one of the provider's slots"""
+        semaphore = self._semaphores.get(provider_name)
+        return semaphore.waiting if semaphore is not None else 0
+
+    def record(self, provider_name: str, latency: float, dropped: bool = False) -> None:
+        """Feed a finished upstream call to the provider's adaptive limit, if it has one
+
+        dropped marks calls that failed from overload (rate limits, server errors, timeouts);
+        call this while still holding the slot so the call counts as in flight.
+        """
+        controller = self._controllers.get(provider_name)
+        if controller is None:
+            return
+        semaphore = self._semaphores[provider_name]
+        limit = controller.update(latency, semaphore.active, dropped)
+        if limit != semaphore.limit:
+            logger.debug(f"Concurrency limit for {provider_name} {'lowered' if limit < semaphore.limit else 'raised'} to {limit}")
+            semaphore.set_limit(limit)
+            self._limit_gauge.set(float(limit), {"provider": provider_name})
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the limit, calls in flight and queue length per limited provider"""
+        with self._lock:
+            semaphores = dict(self._semaphores)
+        status = {}
+        for name, semaphore in semaphores.items():
+            status[name] = {"limit": semaphore.limit, "active": semaphore.active, "queued": semaphore.waiting}
+            controller = self._controllers.get(name)
+            if controller is not None:
+                status[name]["adaptive"] = controller.get_status()
+        return status
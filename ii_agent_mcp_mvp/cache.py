@@ -0,0 +1,275 @@
+"""
+II-Agent MCP Server Add-On - Semantic Cache Module
+Serves cached completions for near-duplicate prompts using hashed embeddings
+and an in-process locality-sensitive hashing index
+"""
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Volatile fragments replaced before embedding so they do not affect similarity
+_VOLATILE_PATTERNS = (
+    re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"),
+    re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?\b"),
+    re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?(?:\s?[ap]m)?\b"),
+    re.compile(r"\b1\d{9}(?:\d{3})?\b"),
+)
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, mask UUIDs, dates, times and epoch timestamps, and collapse whitespace"""
+    text = prompt.lower()
+    for pattern in _VOLATILE_PATTERNS:
+        text = pattern.sub(" _volatile_ ", text)
+    return " ".join(text.split())
+
+
+class HashingVectorizer:
+    """Embeds text as an L2-normalized signed hash of word unigrams and bigrams"""
+
+    def __init__(self, dimensions: int = 512):
+        """Initialize the vectorizer with the embedding size"""
+        self.dimensions = dimensions
+
+    def embed(self, normalized: str) -> "np.ndarray":
+        """Embed normalized text"""
+        tokens = _TOKEN_PATTERN.findall(normalized)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if not features:
+            return vector
+
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+        # The top bit picks the sign so collisions tend to cancel rather than add up
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, (hashes & 0x7FFFFFFF) % self.dimensions, signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """Fixed-capacity vector store with random-hyperplane LSH buckets"""
+
+    def __init__(self, dimensions: int, capacity: int, num_tables: int = 8, num_bits: int = 8,
+                 exact_search_limit: int = 4096, seed: int = 0):
+        """Initialize storage; indexes up to exact_search_limit entries are searched exhaustively"""
+        self.capacity = capacity
+        self.exact_search_limit = exact_search_limit
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.occupied = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+        self._planes = np.random.default_rng(seed).standard_normal((num_tables, num_bits, dimensions)).astype(np.float32)
+        self._powers = 1 << np.arange(num_bits, dtype=np.int64)
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(num_tables)]
+        self._signatures: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.capacity - len(self._free)
+
+    def _signature(self, vector: "np.ndarray") -> "np.ndarray":
+        return ((self._planes @ vector) > 0).astype(np.int64) @ self._powers
+
+    def add(self, vector: "np.ndarray") -> int:
+        """Store a vector, returning its slot; the caller must evict first when full"""
+        slot = self._free.pop()
+        self.vectors[slot] = vector
+        self.occupied[slot] = True
+        signature = self._signature(vector)
+        self._signatures[slot] = signature
+        for table, key in zip(self._buckets, signature.tolist()):
+            table.setdefault(key, set()).add(slot)
+        return slot
+
+    def remove(self, slot: int) -> None:
+        """Free a slot"""
+        signature = self._signatures.pop(slot)
+        for table, key in zip(self._buckets, signature.tolist()):
+            bucket = table.get(key)
+            bucket.discard(slot)
+            if not bucket:
+                del table[key]
+        self.occupied[slot] = False
+        self._free.append(slot)
+
+    def search(self, vector: "np.ndarray", k: int = 8, slots: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """Find up to k stored vectors most similar to a query, as (slot, cosine similarity)
+
+        slots limits the search to those slots, so entries outside them cannot crowd out the top k.
+        """
+        if slots is not None and len(slots) <= self.exact_search_limit:
+            candidates = np.fromiter(slots, dtype=np.int64, count=len(slots))
+        elif len(self) <= self.exact_search_limit:
+            candidates = np.flatnonzero(self.occupied)
+        else:
+            found = set()
+            for table, key in zip(self._buckets, self._signature(vector).tolist()):
+                found.update(table.get(key, ()))
+            if slots is not None:
+                found &= slots
+            candidates = np.fromiter(found, dtype=np.int64, count=len(found))
+        if candidates.size == 0:
+            return []
+
+        scores = self.vectors[candidates] @ vector
+        top = np.argsort(scores)[::-1][:k]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class _CacheEntry:
+    """A cached completion"""
+
+    def __init__(self, namespace: str, normalized: str, result: Dict[str, Any]):
+        self.namespace = namespace
+        self.normalized = normalized
+        self.result = result
+        self.created = time.time()
+        self.hits = 0
+
+
+class SemanticCache:
+    """Bounded cache of completions looked up by prompt similarity"""
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 10000, ttl: float = 3600.0,
+                 dimensions: int = 512, registry: Optional[MetricsRegistry] = None):
+        """Initialize the cache; requires numpy"""
+        if np is None:
+            raise RuntimeError("The semantic cache requires numpy")
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectorizer = HashingVectorizer(dimensions)
+        self.index = VectorIndex(dimensions, max_entries)
+        self._lock = threading.Lock()
+        # slot -> entry, least recently used first
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], int] = {}
+        # namespace -> slots, so similarity searches only rank entries the caller may be served
+        self._namespace_slots: Dict[str, Set[int]] = {}
+
+        registry = registry or get_registry()
+        self._requests = registry.counter("mcp_cache_requests_total", "Semantic cache lookups by result")
+        self._evictions = registry.counter("mcp_cache_evictions_total", "Semantic cache evictions by reason")
+        self._size = registry.gauge("mcp_cache_entries", "Entries in the semantic cache")
+        self._similarity = registry.histogram(
+            "mcp_cache_hit_similarity", "Similarity of prompts served from the cache",
+            (0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)
+        )
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["SemanticCache"]:
+        """Create a cache from the `cache` section of providers.yaml, or None if disabled"""
+        config = config or {}
+        if not config.get("enabled", False):
+            return None
+        if np is None:
+            logger.warning("Semantic cache enabled but numpy is not installed, cache disabled")
+            return None
+        return cls(
+            float(config.get("similarity_threshold", 0.95)),
+            int(config.get("max_entries", 10000)),
+            float(config.get("ttl_seconds", 3600.0)),
+            int(config.get("dimensions", 512))
+        )
+
+    def _remove(self, slot: int, reason: str) -> None:
+        """Remove an entry; the lock must be held"""
+        entry = self._entries.pop(slot)
+        self._exact.pop((entry.namespace, entry.normalized), None)
+        slots = self._namespace_slots[entry.namespace]
+        slots.discard(slot)
+        if not slots:
+            del self._namespace_slots[entry.namespace]
+        self.index.remove(slot)
+        self._evictions.inc(1, {"reason": reason})
+
+    def lookup(self, prompt: str, namespace: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Find a cached result for a similar prompt in the same namespace, with its similarity"""
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+
+        # Each search reads and returns its entry under one lock, so a concurrent store or eviction
+        # cannot replace the slot between finding it and reading it
+        with self._lock:
+            slot = self._exact.get((namespace, normalized))
+            hit = self._hit([(slot, 1.0)], namespace, now) if slot is not None else None
+            searchable = namespace in self._namespace_slots
+        if hit is None and searchable:
+            vector = self.vectorizer.embed(normalized)
+            with self._lock:
+                slots = self._namespace_slots.get(namespace)
+                if slots:
+                    hit = self._hit(self.index.search(vector, slots=slots), namespace, now)
+
+        if hit is None:
+            self._requests.inc(1, {"result": "miss"})
+            return None
+        self._requests.inc(1, {"result": "hit"})
+        self._similarity.observe(hit[1])
+        return hit
+
+    def _hit(self, matches: List[Tuple[int, float]], namespace: str,
+             now: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Get the first live entry among matches in the namespace, dropping expired ones; the lock must be held"""
+        for slot, similarity in matches:
+            if similarity < self.similarity_threshold:
+                break
+            entry = self._entries.get(slot)
+            if entry is None or entry.namespace != namespace:
+                continue
+            if now - entry.created > self.ttl:
+                self._remove(slot, "expired")
+                self._size.set(len(self._entries))
+                continue
+            self._entries.move_to_end(slot)
+            entry.hits += 1
+            return entry.result, similarity
+        return None
+
+    def store(self, prompt: str, namespace: str, result: Dict[str, Any]) -> None:
+        """Cache a successful result, evicting the least recently used entry when full"""
+        normalized = normalize_prompt(prompt)
+        vector = self.vectorizer.embed(normalized)
+
+        with self._lock:
+            existing = self._exact.get((namespace, normalized))
+            if existing is not None:
+                self._remove(existing, "replaced")
+            if len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)), "capacity")
+            slot = self.index.add(vector)
+            self._entries[slot] = _CacheEntry(namespace, normalized, result)
+            self._exact[(namespace, normalized)] = slot
+            self._namespace_slots.setdefault(namespace, set()).add(slot)
+            self._size.set(len(self._entries))
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock:
+            for slot in list(self._entries):
+                self._remove(slot, "cleared")
+            self._size.set(0)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get cache size and settings"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+                "ttl_seconds": self.ttl,
+                "hits": sum(entry.hits for entry in self._entries.values())
+            }
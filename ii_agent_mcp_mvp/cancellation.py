@@ -0,0 +1,159 @@
+"""
+II-Agent MCP Server Add-On - Request Cancellation
+Stops work for requests whose client has disconnected, aborting in-flight
+upstream calls instead of waiting for answers nobody will read
+"""
+import asyncio
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Optional, Set
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .utils.metrics import get_registry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Thread-local holder of the token for upstream calls made by the current thread
+_scope = threading.local()
+
+
+class RequestCancelled(Exception):
+    """Raised when work is attempted for a cancelled request"""
+
+
+class CancellationToken:
+    """Cancellation flag shared by a request's event loop task and worker thread"""
+
+    def __init__(self):
+        """Initialize an uncancelled token"""
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._connections: Set[Any] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the request, shutting down the sockets of its in-flight upstream calls"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            connections = list(self._connections)
+        for conn in connections:
+            _abort(conn)
+        if connections:
+            logger.info(f"Aborted {len(connections)} upstream calls: {reason}")
+
+    def raise_if_cancelled(self) -> None:
+        """Raise RequestCancelled if the request was cancelled"""
+        if self._event.is_set():
+            raise RequestCancelled(self.reason)
+
+    def _track(self, conn) -> None:
+        with self._lock:
+            self.raise_if_cancelled()
+            self._connections.add(conn)
+
+    def _untrack(self, conn) -> None:
+        with self._lock:
+            self._connections.discard(conn)
+
+
+def _abort(conn) -> None:
+    """Unblock a thread waiting on a connection; the pool discards the connection after the error"""
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+@contextmanager
+def cancellation_scope(token: Optional[CancellationToken]):
+    """Tie upstream calls made by this thread inside the block to token"""
+    previous = getattr(_scope, "token", None)
+    _scope.token = token
+    try:
+        yield
+    finally:
+        _scope.token = previous
+
+
+class _CancellablePoolMixin:
+    """Tracks connections from checkout to release, so a cancelled token can abort them mid-request"""
+
+    def _make_request(self, conn, *args, **kwargs):
+        token = getattr(_scope, "token", None)
+        if token is not None:
+            token._track(conn)
+            # Responses are read after this returns, so the connection stays tracked until it is released
+            conn._cancellation_token = token
+        return super()._make_request(conn, *args, **kwargs)
+
+    def _put_conn(self, conn) -> None:
+        token = getattr(conn, "_cancellation_token", None)
+        if token is not None:
+            token._untrack(conn)
+            conn._cancellation_token = None
+        super()._put_conn(conn)
+
+
+class CancellableHTTPConnectionPool(_CancellablePoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CancellableHTTPSConnectionPool(_CancellablePoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class CancellableHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose requests can be aborted from another thread through a cancellation scope"""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CancellableHTTPConnectionPool,
+            "https": CancellableHTTPSConnectionPool
+        }
+
+
+async def wait_for_disconnect(request, poll_interval: float = 0.1) -> None:
+    """Return once the client of a Starlette request has disconnected"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+
+
+async def run_cancellable(work: Awaitable, request, token: CancellationToken, poll_interval: float = 0.1) -> Any:
+    """Await work, cancelling token and raising RequestCancelled if the client disconnects first"""
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request, poll_interval))
+    try:
+        await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+
+        token.cancel("client disconnected")
+        task.cancel()
+        # Worker threads cannot be interrupted; wait for the aborted call to unwind so its slots are released
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        get_registry().counter(
+            "mcp_requests_cancelled_total", "Requests abandoned because the client disconnected"
+        ).inc(1, {"path": request.url.path})
+        raise RequestCancelled(token.reason)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,204 @@
+"""
+II-Agent MCP Server Add-On - Client Quota Module
+Identifies API clients by key and enforces per-client request and token quotas
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Mapping, Optional
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Quota windows in seconds
+QUOTA_WINDOWS = {"minute": 60, "day": 86400}
+
+# Quota keys accepted on a client entry
+QUOTA_KEYS = ("requests_per_minute", "requests_per_day", "tokens_per_minute", "tokens_per_day")
+
+
+class QuotaExceeded(Exception):
+    """Raised when a client has used up one of its quotas"""
+
+    def __init__(self, client: str, quota: str, retry_after: int):
+        """Initialize with the client, the exhausted quota and seconds until it resets"""
+        super().__init__(f"Quota {quota} exceeded for client {client}")
+        self.client = client
+        self.quota = quota
+        self.retry_after = retry_after
+
+
+class Client:
+    """An API client allowed to call the server"""
+
+    def __init__(self, name: str, weight: float = 1.0, quotas: Optional[Dict[str, int]] = None):
+        """Initialize the client with a scheduling weight and optional quotas"""
+        self.name = name
+        self.weight = weight
+        self.quotas = quotas or {}
+
+
+def _hash_key(api_key: str) -> str:
+    """Hash an API key so raw keys are never used as lookup values"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class ClientRegistry:
+    """Maps API keys presented by callers to configured clients"""
+
+    def __init__(self, clients: Optional[List[Dict[str, Any]]] = None, require_api_key: bool = False):
+        """Initialize the registry from decrypted `clients` entries"""
+        self.require_api_key = require_api_key
+        self.clients: Dict[str, Client] = {}
+        self._by_key: Dict[str, Client] = {}
+
+        for entry in clients or []:
+            name = entry.get("name")
+            if not name:
+                continue
+            quotas = {k: int(entry[k]) for k in QUOTA_KEYS if entry.get(k)}
+            client = Client(name, float(entry.get("weight", 1.0)), quotas)
+            self.clients[name] = client
+            if entry.get("api_key"):
+                self._by_key[_hash_key(entry["api_key"])] = client
+
+    @staticmethod
+    def extract_api_key(headers: Mapping[str, str]) -> Optional[str]:
+        """Get the API key from the X-API-Key or Authorization header"""
+        api_key = headers.get("x-api-key")
+        if api_key:
+            return api_key.strip()
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            return authorization[7:].strip()
+        return None
+
+    def identify(self, headers: Mapping[str, str]) -> Optional[Client]:
+        """Identify the client presenting a request, or None if the key is unknown"""
+        api_key = self.extract_api_key(headers)
+        if not api_key:
+            return None
+        return self._by_key.get(_hash_key(api_key))
+
+
+class QuotaTracker:
+    """Fixed-window request and token counters per client, optionally persisted"""
+
+    def __init__(self, state_file: Optional[str] = None, persist_interval: float = 30.0,
+                 registry: Optional[MetricsRegistry] = None):
+        """Initialize counters, restoring persisted state when available"""
+        self.state_file = Path(state_file) if state_file else None
+        self.persist_interval = persist_interval
+        self._lock = threading.Lock()
+        self._last_persist = time.time()
+        # client -> window -> {"start", "requests", "tokens"}
+        self._counters: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+        registry = registry or get_registry()
+        self._exceeded = registry.counter("mcp_quota_exceeded_total", "Requests rejected by client quotas")
+
+        self.load_state()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "QuotaTracker":
+        """Create a tracker from the `quotas` section of providers.yaml"""
+        config = config or {}
+        return cls(config.get("state_file"), float(config.get("persist_interval", 30.0)))
+
+    def _window(self, client: str, window: str, now: float) -> Dict[str, float]:
+        """Get the current counters for a window, starting a new one if expired"""
+        windows = self._counters.setdefault(client, {})
+        length = QUOTA_WINDOWS[window]
+        start = now - now % length
+        counters = windows.get(window)
+        if counters is None or counters["start"] != start:
+            counters = {"start": start, "requests": 0, "tokens": 0}
+            windows[window] = counters
+        return counters
+
+    def consume_request(self, client: Client, count: int = 1) -> None:
+        """Count count requests against the client's quotas, raising without counting any if they do not all fit"""
+        if not client.quotas:
+            return
+
+        now = time.time()
+        with self._lock:
+            windows = {w: self._window(client.name, w, now) for w in QUOTA_WINDOWS}
+            for window, counters in windows.items():
+                for unit in ("requests", "tokens"):
+                    limit = client.quotas.get(f"{unit}_per_{window}")
+                    # Tokens are only known after the fact, so only an already exhausted token quota rejects
+                    needed = count if unit == "requests" else 1
+                    if limit and counters[unit] + needed > limit:
+                        retry_after = math.ceil(counters["start"] + QUOTA_WINDOWS[window] - now)
+                        self._exceeded.inc(1, {"client": client.name, "quota": f"{unit}_per_{window}"})
+                        raise QuotaExceeded(client.name, f"{unit}_per_{window}", max(1, retry_after))
+            for counters in windows.values():
+                counters["requests"] += count
+
+        self._maybe_persist()
+
+    def record_tokens(self, client: Client, tokens: int) -> None:
+        """Add tokens used by a completed request to the client's counters"""
+        if not client.quotas or not tokens:
+            return
+
+        now = time.time()
+        with self._lock:
+            for window in QUOTA_WINDOWS:
+                self._window(client.name, window, now)["tokens"] += tokens
+
+        self._maybe_persist()
+
+    def get_usage(self, client: Client) -> Dict[str, Any]:
+        """Get current window usage and limits for a client"""
+        now = time.time()
+        with self._lock:
+            usage = {}
+            for window in QUOTA_WINDOWS:
+                counters = self._window(client.name, window, now)
+                for unit in ("requests", "tokens"):
+                    key = f"{unit}_per_{window}"
+                    usage[key] = {"used": counters[unit], "limit": client.quotas.get(key)}
+            return usage
+
+    def _maybe_persist(self) -> None:
+        """Persist counters if the persist interval has elapsed"""
+        if self.state_file and time.time() - self._last_persist >= self.persist_interval:
+            self.save_state()
+
+    def save_state(self) -> bool:
+        """Write counters to the state file atomically"""
+        if not self.state_file:
+            return False
+
+        try:
+            with self._lock:
+                data = json.dumps(self._counters)
+                self._last_persist = time.time()
+            tmp_file = self.state_file.with_suffix(self.state_file.suffix + ".tmp")
+            with open(tmp_file, 'w') as f:
+                f.write(data)
+            os.replace(tmp_file, self.state_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving quota state: {e}")
+            return False
+
+    def load_state(self) -> None:
+        """Restore counters from the state file if it exists"""
+        if not self.state_file or not self.state_file.exists():
+            return
+
+        try:
+            with open(self.state_file, 'r') as f:
+                self._counters = json.load(f)
+            logger.info(f"Restored quota counters for {len(self._counters)} clients")
+        except Exception as e:
+            logger.error(f"Error loading quota state: {e}")
@@ -0,0 +1,301 @@
+"""
+II-Agent MCP Server Add-On - Compression Module
+Negotiated gzip/brotli/zstd compression for request and response bodies
+"""
+import io
+import time
+import zlib
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import PlainTextResponse
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Brotli before 1.2 cannot cap the output of a decompression call, so a small request body could
+# expand without limit; brotli request bodies are only accepted when it can
+BROTLI_BOUNDED = brotli is not None and hasattr(brotli.Decompressor, "can_accept_more_data")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Server preference when a client accepts several encodings
+ENCODING_PREFERENCE = ("zstd", "br", "gzip")
+
+DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+# Bodies larger than this are compressed off the event loop
+OFFLOAD_SIZE = 256 * 1024
+
+
+class CompressionError(ValueError):
+    """Raised when a body cannot be decompressed"""
+    pass
+
+
+class DecompressedTooLarge(CompressionError):
+    """Raised when a body decompresses beyond the allowed size"""
+    pass
+
+
+def available_encodings() -> List[str]:
+    """Get the encodings supported with the installed packages, in preference order"""
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in ENCODING_PREFERENCE if installed[encoding]]
+
+
+def request_encodings() -> List[str]:
+    """Get the encodings request bodies can be decompressed from within a size limit"""
+    return [encoding for encoding in available_encodings() if encoding != "br" or BROTLI_BOUNDED]
+
+
+def _compress_raw(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise CompressionError(f"Unsupported encoding: {encoding}")
+
+
+def _decompress_raw(data: bytes, encoding: str, max_size: int) -> bytes:
+    """Decompress, reading at most max_size + 1 bytes so oversized bodies are caught early"""
+    try:
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            result = decompressor.decompress(data, max_size + 1)
+            if len(result) <= max_size and not decompressor.eof:
+                raise CompressionError("Truncated gzip body")
+        elif encoding == "br":
+            if not BROTLI_BOUNDED:
+                raise CompressionError("Decompressing brotli bodies within a size limit needs brotli 1.2 or later")
+            decompressor = brotli.Decompressor()
+            result = decompressor.process(data, output_buffer_limit=max_size + 1)
+            # Output held back by the limit is drained until the body ends or passes max_size
+            while len(result) <= max_size and not decompressor.is_finished() and not decompressor.can_accept_more_data():
+                result += decompressor.process(b"", output_buffer_limit=max_size + 1 - len(result))
+            if len(result) <= max_size and not decompressor.is_finished():
+                raise CompressionError("Truncated brotli body")
+        elif encoding == "zstd":
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+                result = reader.read(max_size + 1)
+        else:
+            raise CompressionError(f"Unsupported encoding: {encoding}")
+    except CompressionError:
+        raise
+    except Exception as e:
+        raise CompressionError(f"Invalid {encoding} body: {e}")
+
+    if len(result) > max_size:
+        raise DecompressedTooLarge(f"Body exceeds {max_size} bytes once decompressed")
+    return result
+
+
+class CompressionStats:
+    """Records bytes saved and CPU time spent on compression"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """Initialize metrics"""
+        registry = registry or get_registry()
+        self._uncompressed = registry.counter("mcp_compression_uncompressed_bytes_total", "Uncompressed bytes handled by compression")
+        self._saved = registry.counter("mcp_compression_saved_bytes_total", "Bytes saved by compression")
+        self._cpu = registry.counter("mcp_compression_cpu_seconds_total", "CPU time spent compressing and decompressing")
+
+    def timed(self, direction: str, encoding: str, func: Callable[[], bytes], uncompressed_size: Optional[int] = None,
+              compressed_size: Optional[int] = None) -> bytes:
+        """Run a (de)compression call on the current thread, recording its CPU time and savings"""
+        start = time.thread_time()
+        result = func()
+        cpu = time.thread_time() - start
+
+        uncompressed = uncompressed_size if uncompressed_size is not None else len(result)
+        compressed = compressed_size if compressed_size is not None else len(result)
+        labels = {"direction": direction, "encoding": encoding}
+        self._uncompressed.inc(uncompressed, labels)
+        self._saved.inc(max(0, uncompressed - compressed), labels)
+        self._cpu.inc(cpu, labels)
+        return result
+
+
+_stats: Optional[CompressionStats] = None
+
+
+def get_stats() -> CompressionStats:
+    """Get the process-wide compression statistics"""
+    global _stats
+    if _stats is None:
+        _stats = CompressionStats()
+    return _stats
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None, direction: str = "response") -> bytes:
+    """Compress a body, recording metrics under the given direction"""
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    return get_stats().timed(direction, encoding, lambda: _compress_raw(data, encoding, level), uncompressed_size=len(data))
+
+
+def decompress(data: bytes, encoding: str, max_size: int, direction: str = "request") -> bytes:
+    """Decompress a body, raising CompressionError if invalid or larger than max_size"""
+    return get_stats().timed(direction, encoding, lambda: _decompress_raw(data, encoding, max_size), compressed_size=len(data))
+
+
+def choose_encoding(accept_encoding: str, encodings: Optional[List[str]] = None) -> Optional[str]:
+    """Pick the preferred supported encoding allowed by an Accept-Encoding header"""
+    encodings = encodings if encodings is not None else available_encodings()
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    best = None
+    best_quality = 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware decompressing request bodies and compressing responses"""
+
+    def __init__(self, app, minimum_size: int = 1024, paths: Optional[List[str]] = None,
+                 levels: Optional[Dict[str, int]] = None, max_request_size: int = 10 * 1024 * 1024):
+        """Initialize the middleware; paths limits it to the given routes, None covers all"""
+        self.app = app
+        self.minimum_size = minimum_size
+        self.paths = set(paths) if paths else None
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.max_request_size = max_request_size
+        self.encodings = available_encodings()
+        self.request_encodings = request_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.paths is not None and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if request_encoding != "identity":
+            scope, receive, error = await self._decompress_request(scope, receive, request_encoding)
+            if error is not None:
+                await error(scope, receive, send)
+                return
+
+        encoding = choose_encoding(headers.get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(send, encoding, self))
+
+    async def _decompress_request(self, scope, receive, encoding: str) -> Tuple[Dict[str, Any], Callable, Optional[PlainTextResponse]]:
+        """Read and decompress the request body, replaying it to the app"""
+        if encoding not in self.request_encodings:
+            return scope, receive, PlainTextResponse(f"Unsupported Content-Encoding: {encoding}", status_code=415)
+
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_request_size:
+                return scope, receive, PlainTextResponse("Request body too large", status_code=413)
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        compressed = b"".join(chunks)
+        try:
+            if len(compressed) > OFFLOAD_SIZE:
+                body = await run_in_threadpool(decompress, compressed, encoding, self.max_request_size)
+            else:
+                body = decompress(compressed, encoding, self.max_request_size)
+        except DecompressedTooLarge as e:
+            return scope, receive, PlainTextResponse(str(e), status_code=413)
+        except CompressionError as e:
+            return scope, receive, PlainTextResponse(str(e), status_code=400)
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value) for name, value in scope["headers"] if name not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode())]
+
+        sent = False
+
+        async def replay_receive():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return scope, replay_receive, None
+
+
+class _CompressingSender:
+    """Wraps an ASGI send callable, compressing single-message response bodies"""
+
+    def __init__(self, send, encoding: str, middleware: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.middleware = middleware
+        self.start_message: Optional[Dict[str, Any]] = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the body shows whether to compress
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        body = message.get("body", b"")
+
+        # Streamed, already encoded or small bodies are sent as they are
+        if message.get("more_body", False) or "content-encoding" in headers or len(body) < self.middleware.minimum_size:
+            self.passthrough = True
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        level = self.middleware.levels[self.encoding]
+        if len(body) > OFFLOAD_SIZE:
+            compressed = await run_in_threadpool(compress, body, self.encoding, level)
+        else:
+            compressed = compress(body, self.encoding, level)
+
+        if len(compressed) < len(body):
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(compressed))
+            body = compressed
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
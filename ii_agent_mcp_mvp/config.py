@@ -12,6 +12,9 @@ from .utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Sections whose entries carry an encrypted api_key
+ENCRYPTED_SECTIONS = ("providers", "clients")
+
 class ConfigManager:
     """Manages configuration for the MCP server"""
     
@@ -32,17 +35,27 @@ class ConfigManager:
                 config = yaml.safe_load(f)
             
             # Decrypt API keys
-            if "providers" in config:
-                for provider in config["providers"]:
-                    if "api_key" in provider:
-                        encrypted_key = provider["api_key"]
-                        provider["api_key"] = self.security.decrypt(encrypted_key)
+            for section in ENCRYPTED_SECTIONS:
+                for entry in config.get(section) or []:
+                    if "api_key" in entry:
+                        encrypted_key = entry["api_key"]
+                        entry["api_key"] = self.security.decrypt(encrypted_key)
+                    if "api_keys" in entry:
+                        entry["api_keys"] = self._map_key_pool(entry["api_keys"], self.security.decrypt)
             
             return config
         except Exception as e:
             logger.error(f"Error loading configuration: {e}")
             return self._get_default_config()
     
+    @staticmethod
+    def _map_key_pool(api_keys: List[Any], transform) -> List[Any]:
+        """Encrypt or decrypt a key pool, whose entries are keys or {key, weight, name} dicts"""
+        return [
+            {**entry, "key": transform(entry["key"])} if isinstance(entry, dict) else transform(entry)
+            for entry in api_keys or []
+        ]
+    
     def _get_default_config(self) -> Dict[str, Any]:
         """Get default configuration"""
         return {
@@ -69,14 +82,24 @@ class ConfigManager:
                 "server": config.get("server", {})
             }
             
+            # Preserve additional sections (pricing, limits, ...)
+            for key, value in config.items():
+                if key not in config_to_save:
+                    config_to_save[key] = value
+            
             # Encrypt API keys
-            if "providers" in config:
-                for provider in config["providers"]:
-                    provider_copy = provider.copy()
-                    if "api_key" in provider_copy:
-                        api_key = provider_copy["api_key"]
-                        provider_copy["api_key"] = self.security.encrypt(api_key)
-                    config_to_save["providers"].append(provider_copy)
+            for section in ENCRYPTED_SECTIONS:
+                if section not in config:
+                    continue
+                config_to_save[section] = []
+                for entry in config[section] or []:
+                    entry_copy = entry.copy()
+                    if "api_key" in entry_copy:
+                        api_key = entry_copy["api_key"]
+                        entry_copy["api_key"] = self.security.encrypt(api_key)
+                    if "api_keys" in entry_copy:
+                        entry_copy["api_keys"] = self._map_key_pool(entry_copy["api_keys"], self.security.encrypt)
+                    config_to_save[section].append(entry_copy)
             
             # Save to file
             with open(self.config_file, 'w') as f:
@@ -93,6 +116,17 @@ class ConfigManager:
             logger.error(f"Error saving configuration: {e}")
             return False
     
+    def reload(self) -> Dict[str, Any]:
+        """Re-read the configuration file, keeping the current configuration if it is missing or invalid"""
+        try:
+            with open(self.config_file, 'r') as f:
+                if not isinstance(yaml.safe_load(f), dict):
+                    raise ValueError("expected a mapping")
+        except (OSError, yaml.YAMLError, ValueError) as e:
+            raise ValueError(f"Cannot reload {self.config_file}: {e}")
+        self.config = self._load_config()
+        return self.config
+    
     def get_provider_config(self, provider_name: str) -> Optional[Dict[str, Any]]:
         """Get configuration for a specific provider"""
         if "providers" not in self.config:
@@ -104,12 +138,16 @@ class ConfigManager:
         
         return None
     
+    def get_pricing(self) -> Dict[str, Any]:
+        """Get the per-model price table (USD per million tokens)"""
+        return self.config.get("pricing") or {}
+    
     def get_provider_order(self) -> List[str]:
-        """Get the order of providers for fallback"""
+        """Get the order of providers for fallback; shadow-only providers are left out"""
         if "providers" not in self.config:
             return []
         
-        return [p.get("name", "").lower() for p in self.config["providers"]]
+        return [p.get("name", "").lower() for p in self.config["providers"] if not p.get("shadow_only", False)]
     
     def add_provider(self, name: str, api_key: str, models: Optional[List[str]] = None) -> bool:
         """Add or update a provider in the configuration"""
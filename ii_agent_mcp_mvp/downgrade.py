@@ -0,0 +1,150 @@
+"""
+II-Agent MCP Server Add-On - Model Downgrade
+Serves a lighter model tier while the requested model's first target is slow,
+queueing or close to its rate limit, instead of queueing or failing the request
+"""
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from .admission import ProviderSlots
+from .routing import Route, RoutingTable
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Weight of a new sample in the per-target latency average
+LATENCY_WEIGHT = 0.2
+
+# Downgrade reasons, used as metric labels
+LATENCY = "latency"
+QUEUE = "queue"
+RATE_LIMIT = "rate_limit"
+
+
+class DowngradePolicy:
+    """Picks the model tier to route a request to from the load on each tier's first target"""
+
+    def __init__(self, tiers: Dict[str, List[str]], provider_factory, provider_slots: Optional[ProviderSlots] = None,
+                 max_latency: Optional[float] = None, max_queue_length: Optional[int] = None,
+                 min_rate_limit_remaining: Optional[int] = None, recover_after: float = 30.0,
+                 registry: Optional[MetricsRegistry] = None):
+        """Initialize with lighter tiers per model or alias, in order; unset thresholds are not checked
+
+        Latency averages older than recover_after seconds are ignored, so a model that stopped
+        receiving traffic after being downgraded is tried again once that time has passed.
+        """
+        self.tiers = {model: list(lighter) for model, lighter in tiers.items() if lighter}
+        self.provider_factory = provider_factory
+        self.provider_slots = provider_slots
+        self.max_latency = max_latency
+        self.max_queue_length = max_queue_length
+        self.min_rate_limit_remaining = min_rate_limit_remaining
+        self.recover_after = recover_after
+        # (provider, model) -> (average latency, time of last sample)
+        self._latency: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+        registry = registry or get_registry()
+        self._downgrades = registry.counter("mcp_model_downgrades_total", "Requests routed to a lighter model under load")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], provider_factory,
+                    provider_slots: Optional[ProviderSlots] = None) -> Optional["DowngradePolicy"]:
+        """Create a policy from the `routing.downgrade` section of providers.yaml, or None if disabled"""
+        config = config or {}
+        if not config.get("enabled", False) or not config.get("tiers"):
+            return None
+
+        def optional(key, cast):
+            return cast(config[key]) if config.get(key) is not None else None
+
+        return cls(
+            {model: [lighter] if isinstance(lighter, str) else lighter for model, lighter in config["tiers"].items()},
+            provider_factory,
+            provider_slots,
+            max_latency=optional("max_latency", float),
+            max_queue_length=optional("max_queue_length", int),
+            min_rate_limit_remaining=optional("min_rate_limit_remaining", int),
+            recover_after=float(config.get("recover_after", 30.0))
+        )
+
+    def observe(self, provider_name: str, model: str, latency: float) -> None:
+        """Record the latency of a successful generation"""
+        if self.max_latency is None:
+            return
+        key = (provider_name, model)
+        now = time.time()
+        with self._lock:
+            previous = self._latency.get(key)
+            if previous is None or now - previous[1] > self.recover_after:
+                average = latency
+            else:
+                average = previous[0] + LATENCY_WEIGHT * (latency - previous[0])
+            self._latency[key] = (average, now)
+
+    def _latency_of(self, provider_name: str, model: str) -> Optional[float]:
+        with self._lock:
+            sample = self._latency.get((provider_name, model))
+        if sample is None or time.time() - sample[1] > self.recover_after:
+            return None
+        return sample[0]
+
+    def overload(self, route: Route) -> Optional[str]:
+        """Get the reason a route's first target is overloaded, or None if it can take the request"""
+        if not route.providers:
+            return None
+        provider_name = route.providers[0]
+        model = route.models.get(provider_name)
+
+        if self.max_latency is not None and model is not None:
+            latency = self._latency_of(provider_name, model)
+            if latency is not None and latency > self.max_latency:
+                return LATENCY
+        if self.max_queue_length is not None and self.provider_slots is not None:
+            if self.provider_slots.queue_length(provider_name) >= self.max_queue_length:
+                return QUEUE
+        if self.min_rate_limit_remaining is not None:
+            provider = self.provider_factory.get_provider(provider_name)
+            remaining = getattr(provider, "rate_limit_remaining", None)
+            if isinstance(remaining, int) and remaining < self.min_rate_limit_remaining:
+                return RATE_LIMIT
+        return None
+
+    def select(self, model: str, route: Route, routing_table: RoutingTable,
+               provider: Optional[str] = None) -> Tuple[str, Route]:
+        """Get the model and route to serve a request for model with, given its normal route
+
+        Tiers are tried in order and the first whose target is not overloaded is used; if every
+        tier is overloaded too, the last and lightest one is.
+        """
+        lighter = self.tiers.get(model)
+        if not lighter:
+            return model, route
+        reason = self.overload(route)
+        if reason is None:
+            return model, route
+
+        for tier in lighter:
+            tier_route = routing_table.route(tier, provider)
+            if self.overload(tier_route) is None:
+                break
+        logger.info(f"Downgrading {model} to {tier} ({reason} threshold crossed on {route.providers[0]})")
+        self._downgrades.inc(1, {"model": model, "to": tier, "reason": reason})
+        return tier, tier_route
+
+    def get_status(self) -> Dict[str, Any]:
+        """Describe tiers, thresholds and current per-target latency averages"""
+        now = time.time()
+        with self._lock:
+            latency = {f"{provider}/{model}": round(average, 3) for (provider, model), (average, at) in self._latency.items()
+                       if now - at <= self.recover_after}
+        return {
+            "tiers": self.tiers,
+            "max_latency": self.max_latency,
+            "max_queue_length": self.max_queue_length,
+            "min_rate_limit_remaining": self.min_rate_limit_remaining,
+            "recover_after": self.recover_after,
+            "latency": latency
+        }
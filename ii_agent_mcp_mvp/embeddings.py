@@ -0,0 +1,193 @@
+"""
+II-Agent MCP Server Add-On - Embeddings
+Coalesces concurrent embedding requests for the same provider and model into
+batched upstream calls, and encodes the resulting vectors for responses
+"""
+import asyncio
+import base64
+import sys
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .providers.errors import UpstreamError, TRANSIENT
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Response encodings for vectors: JSON floats, or base64 of little-endian float32 values
+ENCODING_FORMATS = ("float", "base64")
+
+# Buckets for the number of texts per upstream call
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def encode_embedding(vector: List[float], encoding_format: str = "float") -> Any:
+    """Encode a vector for a response; base64 is about a quarter of the size of the JSON floats"""
+    if encoding_format == "float":
+        return vector
+    values = array("f", vector)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def decode_embedding(data: str) -> List[float]:
+    """Decode a base64 vector produced by encode_embedding"""
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+class EmbeddingBatcher:
+    """Holds embedding requests for a few milliseconds so concurrent ones share an upstream call
+
+    Requests are only coalesced with others for the same provider and model, and are never
+    retried on another provider: vectors from different models are not comparable.
+    """
+
+    def __init__(self, provider_factory, max_wait: float = 0.005, max_batch_size: int = 64, provider_slots=None,
+                 registry: Optional[MetricsRegistry] = None):
+        """Initialize the batcher; batches are sent after max_wait seconds or once max_batch_size texts are waiting"""
+        self.provider_factory = provider_factory
+        self.max_wait = max(0.0, max_wait)
+        self.max_batch_size = max(1, max_batch_size)
+        self.provider_slots = provider_slots
+        # Requests waiting to be sent, and the timer that sends them, per (provider, model)
+        self._pending: Dict[Tuple[str, str], List[Tuple[List[str], asyncio.Future]]] = {}
+        self._pending_texts: Dict[Tuple[str, str], int] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self.requests = 0
+        self.upstream_calls = 0
+        self.texts = 0
+
+        registry = registry or get_registry()
+        self._batch_size = registry.histogram("mcp_embedding_batch_size", "Texts per upstream embedding call",
+                                              BATCH_SIZE_BUCKETS)
+        self._requests = registry.counter("mcp_embedding_requests_total", "Embedding requests by outcome")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], provider_factory,
+                    provider_slots=None) -> Optional["EmbeddingBatcher"]:
+        """Create a batcher from the `embeddings` section of providers.yaml, or None if disabled"""
+        config = config or {}
+        if not config.get("enabled", True):
+            return None
+        return cls(
+            provider_factory,
+            max_wait=float(config.get("max_wait_ms", 5)) / 1000,
+            max_batch_size=int(config.get("max_batch_size", 64)),
+            provider_slots=provider_slots
+        )
+
+    def batch_limit(self, provider) -> int:
+        """Get the most texts sent to a provider in one call"""
+        return max(1, min(self.max_batch_size, provider.max_embedding_batch))
+
+    async def embed(self, provider_name: str, texts: List[str], model: Optional[str] = None) -> Dict[str, Any]:
+        """Embed texts with a provider, sharing upstream calls with concurrent requests"""
+        provider = self.provider_factory.get_provider(provider_name)
+        if provider is None or not provider.supports_embeddings:
+            raise ValueError(f"Provider {provider_name} does not support embeddings")
+
+        key = (provider_name, model or provider.EMBEDDING_MODEL)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, []).append((texts, future))
+        self._pending_texts[key] = self._pending_texts.get(key, 0) + len(texts)
+        self.requests += 1
+
+        if self._pending_texts[key] >= self.batch_limit(provider) or not self.max_wait:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, key)
+
+        result = await future
+        self._requests.inc(1, {"provider": provider_name, "outcome": "success" if result["success"] else "error"})
+        return result
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        """Send the requests waiting for a provider and model"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        entries = self._pending.pop(key, [])
+        self._pending_texts.pop(key, None)
+        if not entries:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(key, entries))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key: Tuple[str, str], entries: List[Tuple[List[str], asyncio.Future]]) -> None:
+        """Embed every waiting text in as few upstream calls as the batch limit allows, then answer each request"""
+        provider_name, model = key
+        provider = self.provider_factory.get_provider(provider_name)
+        texts = [text for entry_texts, _ in entries for text in entry_texts]
+        try:
+            limit = self.batch_limit(provider)
+            chunks = [texts[i:i + limit] for i in range(0, len(texts), limit)]
+            for chunk in chunks:
+                self._batch_size.observe(len(chunk), {"provider": provider_name})
+            self.upstream_calls += len(chunks)
+            self.texts += len(texts)
+            results = await asyncio.gather(*(run_in_threadpool(self._call, provider, provider_name, model, chunk)
+                                             for chunk in chunks))
+        except Exception as e:
+            logger.error(f"Embedding batch for {provider_name} failed: {e}")
+            results = [{"success": False, "error": f"Exception: {e}", "upstream_error": UpstreamError(TRANSIENT, message=str(e))}]
+            chunks = [texts]
+
+        # Split the vectors back into requests; a request fails if any of its texts was in a failed call
+        vectors: List[Optional[List[float]]] = []
+        failures: List[Optional[Dict[str, Any]]] = []
+        for chunk, result in zip(chunks, results):
+            embeddings = result.get("embeddings") if result.get("success", False) else None
+            if embeddings is not None and len(embeddings) != len(chunk):
+                result = {"success": False, "error": f"Expected {len(chunk)} embeddings, got {len(embeddings)}"}
+                embeddings = None
+            if embeddings is None:
+                vectors.extend([None] * len(chunk))
+                failures.extend([result] * len(chunk))
+            else:
+                vectors.extend(embeddings)
+                failures.extend([None] * len(chunk))
+
+        latency = max(result.get("latency", 0.0) for result in results)
+        offset = 0
+        for entry_texts, future in entries:
+            end = offset + len(entry_texts)
+            failure = next((f for f in failures[offset:end] if f is not None), None)
+            if failure is not None:
+                answer = failure
+            else:
+                answer = {"success": True, "embeddings": vectors[offset:end], "model": model,
+                          "provider": provider_name, "latency": latency, "batch_size": len(texts)}
+            offset = end
+            if not future.done():
+                future.set_result(answer)
+
+    def _call(self, provider, provider_name: str, model: str, texts: List[str]) -> Dict[str, Any]:
+        """Make one upstream call, holding one of the provider's slots like a generation would"""
+        if self.provider_slots is None:
+            return provider.embed(texts, model)
+        with self.provider_slots.slot(provider_name) as acquired:
+            if not acquired:
+                return {"success": False, "error": f"{provider_name}: concurrency limit reached",
+                        "upstream_error": UpstreamError(TRANSIENT, message="concurrency limit reached")}
+            return provider.embed(texts, model)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get how well requests were coalesced"""
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "texts": self.texts,
+            "texts_per_call": self.texts / self.upstream_calls if self.upstream_calls else 0.0
+        }
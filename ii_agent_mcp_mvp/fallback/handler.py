@@ -3,25 +3,153 @@ II-Agent MCP Server Add-On - Fallback Handler
 Implements fallback logic for provider failures
 """
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
+from ..admission import ProviderSlots, DEFAULT_CLIENT
+from ..cancellation import CancellationToken, cancellation_scope
+from ..health import HealthChecker
+from ..providers.errors import UpstreamError, QUOTA, TRANSIENT
 from ..providers.factory import ProviderFactory
+from ..tokens import ContextLimits
 from ..utils.logging import get_logger
+from ..utils.tracing import get_tracer
 
 logger = get_logger(__name__)
 
 class FallbackHandler:
     """Handles fallback logic when providers fail"""
     
-    def __init__(self, provider_factory: ProviderFactory, max_retries: int = 2):
+    def __init__(self, provider_factory: ProviderFactory, max_retries: int = 2,
+                 context_limits: Optional[ContextLimits] = None,
+                 provider_slots: Optional[ProviderSlots] = None,
+                 health_checker: Optional[HealthChecker] = None):
         """Initialize the fallback handler"""
         self.provider_factory = provider_factory
         self.max_retries = max_retries
+        self.context_limits = context_limits or ContextLimits()
+        self.provider_slots = provider_slots or ProviderSlots()
+        self.health_checker = health_checker
+    
+    def _resolve_model(self, provider, model: str) -> str:
+        """Resolve the concrete model a provider would use for a request"""
+        resolved = provider.resolve_model(model)
+        # Mocked providers may not return a string
+        return resolved if isinstance(resolved, str) else model
+    
+    def _fit_to_context(self, provider, provider_name: str, model: str, prompt_tokens: int,
+                        max_tokens: int) -> Optional[Tuple[str, int]]:
+        """Pick a model whose context fits the prompt and clamp max_tokens, or None if none fits"""
+        fits, clamped = self.context_limits.fit(model, prompt_tokens, max_tokens)
+        if not fits and self.context_limits.route_to_larger_context:
+            larger = self.context_limits.find_larger_model(provider.models or [], prompt_tokens)
+            if larger:
+                logger.info(f"Prompt (~{prompt_tokens} tokens) exceeds {model} context, routing to {larger} on {provider_name}")
+                model = larger
+                fits, clamped = self.context_limits.fit(model, prompt_tokens, max_tokens)
+        
+        if not fits:
+            return None
+        
+        if clamped < max_tokens:
+            logger.info(f"Clamping max_tokens from {max_tokens} to {clamped} for {provider_name}/{model}")
+        return model, clamped
+        
+    def _attempt(self, provider, provider_name: str, prompt: str, model: str,
+                 kwargs: Dict[str, Any], errors: List[str], stream: bool = False) -> Optional[Dict[str, Any]]:
+        """Make a single generation call, recording any failure in errors"""
+        try:
+            if stream:
+                result = provider.generate_stream(prompt, model, **kwargs)
+            else:
+                result = provider.generate(prompt, model, **kwargs)
+        except Exception as e:
+            logger.error(f"Exception during generation with {provider_name}: {str(e)}")
+            errors.append(f"{provider_name}: {str(e)}")
+            return None
+        
+        if not result.get("success", False):
+            # If failed, log the error and try again or move to next provider
+            error_msg = result.get("error", "Unknown error")
+            logger.error(f"Generation failed with {provider_name}: {error_msg}")
+            errors.append(f"{provider_name}: {error_msg}")
+        return result
+        
+    @staticmethod
+    def _cancelled(cancel_token: CancellationToken, attempts: int, errors: List[str]) -> Dict[str, Any]:
+        """Build the result of a request abandoned after cancellation"""
+        logger.info(f"Request cancelled after {attempts} attempts: {cancel_token.reason}")
+        return {
+            "success": False,
+            "error": f"Request cancelled: {cancel_token.reason}",
+            "error_type": "cancelled",
+            "details": errors,
+            "attempts": attempts,
+            "fallback_used": attempts > 1
+        }
+        
+    def _record_sample(self, provider_name: str, latency: float, result: Optional[Dict[str, Any]],
+                       cancel_token: Optional[CancellationToken]) -> None:
+        """Report a call to the provider's adaptive concurrency limit; only overload failures count against it"""
+        if cancel_token is not None and cancel_token.cancelled:
+            return
+        if result is None:
+            dropped = True
+        elif result.get("success", False):
+            dropped = False
+        elif UpstreamError.from_result(result).category in (QUOTA, TRANSIENT):
+            dropped = True
+        else:
+            # Bad keys and invalid requests say nothing about the provider's load
+            return
+        self.provider_slots.record(provider_name, latency, dropped)
         
-    def process_request(self, prompt: str, model: str, provider_order: List[str], **kwargs) -> Dict[str, Any]:
-        """Process a generation request with fallback logic"""
+    @staticmethod
+    def _outcome(result: Optional[Dict[str, Any]]) -> str:
+        """Summarize an attempt result for tracing"""
+        if result is None:
+            return "exception"
+        if result.get("success", False):
+            return "success"
+        return result.get("error", "error")
+        
+    def process_request(self, prompt: str, model: str, provider_order: List[str],
+                        client_id: str = DEFAULT_CLIENT, client_weight: float = 1.0,
+                        provider_models: Optional[Dict[str, str]] = None,
+                        cancel_token: Optional[CancellationToken] = None, stream: bool = False, **kwargs) -> Dict[str, Any]:
+        """Process a generation request with fallback logic; provider_models holds models already resolved by routing,
+        and cancelling cancel_token aborts the upstream call in flight and stops further attempts
+
+        With stream, the result of the first provider to start answering carries a `stream` of events;
+        fallback only covers failures before the stream starts.
+        """
+        attributes = {"model": model, "provider_order": ",".join(provider_order), "client": client_id}
+        with get_tracer().span("fallback.process_request", attributes) as span, cancellation_scope(cancel_token):
+            result = self._process_request(prompt, model, provider_order, client_id, client_weight,
+                                           provider_models or {}, cancel_token, stream, **kwargs)
+            span.set_attributes({
+                "attempts": result.get("attempts", 0),
+                "fallback_used": result.get("fallback_used", False),
+                "provider": result.get("provider", "")
+            })
+            span.set_status(result.get("success", False), result.get("error", ""))
+            return result
+        
+    def _process_request(self, prompt: str, model: str, provider_order: List[str],
+                         client_id: str, client_weight: float, provider_models: Dict[str, str],
+                         cancel_token: Optional[CancellationToken], stream: bool = False, **kwargs) -> Dict[str, Any]:
+        """Try each provider in order, retrying and falling back on failures"""
         attempts = 0
         errors = []
+        failures: List[UpstreamError] = []
+        context_skips = 0
+        
+        # Estimate the prompt size once, locally
+        prompt_tokens = self.context_limits.estimate_prompt(prompt)
+        max_tokens = kwargs.get("max_tokens", 1024)
+        
+        # Try providers known to be down last
+        if self.health_checker is not None:
+            provider_order = self.health_checker.order(provider_order)
         
         # Try each provider in order
         for provider_name in provider_order:
@@ -29,15 +157,29 @@ class FallbackHandler:
             if not provider:
                 logger.warning(f"Provider {provider_name} not found, skipping")
                 continue
+            
+            # Reject oversized prompts before any upstream call
+            routed_model = provider_models.get(provider_name) or self._resolve_model(provider, model)
+            fitted = self._fit_to_context(provider, provider_name, routed_model, prompt_tokens, max_tokens)
+            if fitted is None:
+                logger.warning(f"Prompt (~{prompt_tokens} tokens) exceeds context window for {provider_name}, skipping")
+                errors.append(f"{provider_name}: context length exceeded")
+                context_skips += 1
+                continue
+            provider_model, provider_max_tokens = fitted
+            provider_kwargs = {**kwargs, "max_tokens": provider_max_tokens}
                 
             # Try the current provider up to max_retries times
             for retry in range(self.max_retries):
+                if cancel_token is not None and cancel_token.cancelled:
+                    return self._cancelled(cancel_token, attempts, errors)
                 attempts += 1
                 
                 # Check if we're approaching rate limits
                 try:
                     if provider.rate_limit_remaining is not None and provider.rate_limit_remaining < 5:
                         logger.warning(f"Provider {provider_name} approaching rate limit ({provider.rate_limit_remaining} remaining), trying next provider")
+                        failures.append(UpstreamError(QUOTA, message="approaching rate limit"))
                         break
                 except (TypeError, AttributeError):
                     # Handle case where rate_limit_remaining is a mock or not comparable
@@ -47,30 +189,48 @@ class FallbackHandler:
                 logger.info(f"Attempting generation with {provider_name} (attempt {attempts}, retry {retry})")
                 start_time = time.time()
                 
-                try:
-                    result = provider.generate(prompt, model, **kwargs)
-                    
-                    # If successful, return the result
+                attributes = {"provider": provider_name, "model": provider_model, "attempt": attempts, "retry": retry}
+                with get_tracer().span("fallback.attempt", attributes) as span:
+                    with self.provider_slots.slot(provider_name, client_id, client_weight) as acquired:
+                        if not acquired:
+                            logger.warning(f"Provider {provider_name} at its concurrency limit, trying next provider")
+                            errors.append(f"{provider_name}: concurrency limit reached")
+                            span.set_status(False, "concurrency limit reached")
+                            attempts -= 1
+                            break
+                        # A streamed call holds the slot, and is timed, until its first response bytes
+                        call_start = time.time()
+                        result = self._attempt(provider, provider_name, prompt, provider_model, provider_kwargs, errors, stream)
+                        self._record_sample(provider_name, time.time() - call_start, result, cancel_token)
+                    outcome = self._outcome(result)
+                    span.set_attribute("outcome", outcome)
+                    span.set_status(outcome == "success", "" if outcome == "success" else outcome)
+                
+                if result is not None:
                     if result.get("success", False):
                         logger.info(f"Generation successful with {provider_name} after {attempts} attempts")
                         result["attempts"] = attempts
                         result["fallback_used"] = attempts > 1
                         return result
                     
-                    # If failed, log the error and try again or move to next provider
-                    error_msg = result.get("error", "Unknown error")
-                    logger.error(f"Generation failed with {provider_name}: {error_msg}")
-                    errors.append(f"{provider_name}: {error_msg}")
-                    
-                    # Check for specific error conditions that should trigger immediate fallback
-                    response_text = result.get("response", "").lower()
-                    if "rate limit" in response_text or "429" in response_text:
-                        logger.warning(f"Rate limit detected for {provider_name}, moving to next provider")
+                    # Decide from the error's class: retry, fall back, or give up
+                    error = UpstreamError.from_result(result)
+                    failures.append(error)
+                    if not error.fallback:
+                        logger.warning(f"{provider_name} rejected the request ({error}), not trying other providers")
+                        return {
+                            "success": False,
+                            "error": f"Request rejected by {provider_name}: {error}",
+                            "error_type": "invalid_request",
+                            "status_code": error.status_code,
+                            "message": error.message,
+                            "details": errors,
+                            "attempts": attempts,
+                            "fallback_used": attempts > 1
+                        }
+                    if not error.retryable:
+                        logger.warning(f"{error.category.capitalize()} error from {provider_name} ({error}), moving to next provider")
                         break
-                        
-                except Exception as e:
-                    logger.error(f"Exception during generation with {provider_name}: {str(e)}")
-                    errors.append(f"{provider_name}: {str(e)}")
                 
                 # Check for timeout
                 elapsed = time.time() - start_time
@@ -78,12 +238,34 @@ class FallbackHandler:
                     logger.warning(f"Timeout detected for {provider_name} ({elapsed:.2f}s), moving to next provider")
                     break
         
+        # If every available provider was skipped for size, report it as a client error
+        if context_skips and attempts == 0:
+            logger.error(f"Prompt (~{prompt_tokens} tokens) exceeds the context window of all providers")
+            return {
+                "success": False,
+                "error": "Prompt exceeds the context window of all providers",
+                "error_type": "context_length_exceeded",
+                "prompt_tokens": prompt_tokens,
+                "details": errors,
+                "attempts": 0,
+                "fallback_used": False
+            }
+        
+        if cancel_token is not None and cancel_token.cancelled:
+            return self._cancelled(cancel_token, attempts, errors)
+        
         # If all providers failed, return error
         logger.error(f"All providers failed after {attempts} attempts")
-        return {
+        result = {
             "success": False,
             "error": "All providers failed",
             "details": errors,
             "attempts": attempts,
             "fallback_used": attempts > 1
         }
+        if failures and all(error.category == QUOTA for error in failures):
+            # Every provider is rate limited; tell the caller when the first one frees up
+            retry_afters = [error.retry_after for error in failures if error.retry_after is not None]
+            result["error_type"] = "rate_limited"
+            result["retry_after"] = min(retry_afters) if retry_afters else None
+        return result
@@ -0,0 +1,187 @@
+"""
+II-Agent MCP Server Add-On - Provider Health Checks
+Periodically checks each provider's model-listing endpoint in the background so
+requests avoid providers known to be down
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+HEALTH_CHECK_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Health states; providers start unknown and are treated as healthy until checked
+UNKNOWN = "unknown"
+HEALTHY = "healthy"
+UNHEALTHY = "unhealthy"
+
+
+class ProviderHealth:
+    """Health check history of one provider"""
+
+    def __init__(self):
+        self.state = UNKNOWN
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_check: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checks = 0
+        self.failures = 0
+        self.next_check = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "last_check": self.last_check,
+            "last_latency": self.last_latency,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "availability": (self.checks - self.failures) / self.checks * 100 if self.checks else None
+        }
+
+
+class HealthChecker:
+    """Checks providers on a jittered schedule and orders providers by health"""
+
+    def __init__(self, provider_factory, interval: float = 30.0, jitter: float = 0.2, timeout: float = 5.0,
+                 unhealthy_threshold: int = 2, healthy_threshold: int = 1, registry: Optional[MetricsRegistry] = None):
+        """Initialize the checker; a provider changes state after the given number of consecutive results"""
+        self.provider_factory = provider_factory
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.unhealthy_threshold = max(1, unhealthy_threshold)
+        self.healthy_threshold = max(1, healthy_threshold)
+        self._health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._random = random.Random()
+
+        registry = registry or get_registry()
+        self._healthy = registry.gauge("mcp_provider_healthy", "Whether the last health checks found the provider up")
+        self._checks = registry.counter("mcp_health_checks_total", "Provider health checks by result")
+        self._latency = registry.histogram("mcp_health_check_seconds", "Provider health check latency", HEALTH_CHECK_BUCKETS)
+
+    @classmethod
+    def from_config(cls, provider_factory, config: Optional[Dict[str, Any]]) -> Optional["HealthChecker"]:
+        """Create a checker from the `health_check` section of providers.yaml, or None unless enabled
+
+        Checks are opt-in: with some providers even model listing counts against the API key's quota.
+        """
+        config = config or {}
+        if not config.get("enabled", False):
+            return None
+        return cls(
+            provider_factory,
+            float(config.get("interval", 30.0)),
+            float(config.get("jitter", 0.2)),
+            float(config.get("timeout", 5.0)),
+            int(config.get("unhealthy_threshold", 2)),
+            int(config.get("healthy_threshold", 1))
+        )
+
+    def _next_delay(self) -> float:
+        """Interval with jitter, so replicas and providers do not check in lockstep"""
+        return self.interval * self._random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def check(self, provider) -> ProviderHealth:
+        """Check one provider now and update its state"""
+        result = provider.check_health(self.timeout)
+        name = provider.name
+        self._latency.observe(result["latency"], {"provider": name})
+        self._checks.inc(1, {"provider": name, "result": "ok" if result["healthy"] else "error"})
+
+        with self._lock:
+            health = self._health.setdefault(name, ProviderHealth())
+            health.checks += 1
+            health.last_check = time.time()
+            health.last_latency = result["latency"]
+            health.last_error = result["error"]
+            health.next_check = time.monotonic() + self._next_delay()
+            if result["healthy"]:
+                health.consecutive_successes += 1
+                health.consecutive_failures = 0
+                if health.state != HEALTHY and (health.state == UNKNOWN or health.consecutive_successes >= self.healthy_threshold):
+                    if health.state == UNHEALTHY:
+                        logger.info(f"Provider {name} is healthy again")
+                    health.state = HEALTHY
+            else:
+                health.failures += 1
+                health.consecutive_failures += 1
+                health.consecutive_successes = 0
+                if health.state != UNHEALTHY and health.consecutive_failures >= self.unhealthy_threshold:
+                    logger.warning(f"Provider {name} marked unhealthy: {result['error']}")
+                    health.state = UNHEALTHY
+            self._healthy.set(0 if health.state == UNHEALTHY else 1, {"provider": name})
+            return health
+
+    def is_healthy(self, provider_name: str) -> bool:
+        """Whether a provider is not known to be down"""
+        health = self._health.get(provider_name)
+        return health is None or health.state != UNHEALTHY
+
+    def order(self, provider_order: List[str]) -> List[str]:
+        """Move providers known to be down to the end, keeping the configured order otherwise"""
+        healthy = [name for name in provider_order if self.is_healthy(name)]
+        if len(healthy) == len(provider_order):
+            return provider_order
+        return healthy + [name for name in provider_order if not self.is_healthy(name)]
+
+    def check_due(self) -> None:
+        """Check every provider whose next check is due, in parallel"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for provider in self.provider_factory.get_all_providers():
+                health = self._health.setdefault(provider.name, ProviderHealth())
+                if health.next_check <= now:
+                    # Claim the check so a slow one is not started twice
+                    health.next_check = now + self.timeout + self.interval
+                    due.append(provider)
+        if not due:
+            return
+        with ThreadPoolExecutor(max_workers=len(due)) as pool:
+            for provider, future in [(p, pool.submit(self.check, p)) for p in due]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Health check of {provider.name} failed: {e}")
+
+    def start(self) -> None:
+        """Start checking in the background, staggering the first checks across the jitter window"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for provider in self.provider_factory.get_all_providers():
+                health = self._health.setdefault(provider.name, ProviderHealth())
+                health.next_check = now + self._random.uniform(0.0, self.interval * self.jitter)
+        self._thread = threading.Thread(target=self._run, name="health-checker", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check_due()
+            with self._lock:
+                upcoming = min((h.next_check for h in self._health.values()), default=time.monotonic() + self.interval)
+            self._stop.wait(max(0.05, upcoming - time.monotonic()))
+
+    def stop(self) -> None:
+        """Stop background checks"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout)
+            self._thread = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the health of every checked provider"""
+        with self._lock:
+            return {name: health.to_dict() for name, health in self._health.items()}
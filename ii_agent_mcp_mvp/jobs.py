@@ -0,0 +1,435 @@
+"""
+II-Agent MCP Server Add-On - Batch Jobs
+Runs large sets of prompts submitted to /jobs in the background at a throttled
+rate, yielding to interactive traffic, with job state persisted in SQLite and
+webhook notification on completion
+"""
+import hashlib
+import hmac
+import ipaddress
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from .utils.jsonlib import dumps, loads
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+JOB_STATES = (QUEUED, RUNNING, COMPLETED, CANCELLED)
+
+# Item states
+PENDING = "pending"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Header carrying the HMAC-SHA256 of a webhook body when a secret is configured
+SIGNATURE_HEADER = "X-MCP-Signature"
+
+WEBHOOK_ATTEMPTS = 3
+
+
+def check_webhook_url(url: str, allowed_hosts: Optional[List[str]] = None) -> None:
+    """Raise ValueError unless a webhook URL may be called by the server
+
+    With allowed_hosts set, only those hosts are accepted. Otherwise any host is, as long as
+    none of its addresses is loopback, link-local, private or otherwise not publicly routable,
+    so callers cannot use webhooks to reach services next to the gateway.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("webhook_url must be an http or https URL")
+    host = parts.hostname.lower()
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError(f"Webhook host {host} is not allowed")
+        return
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 80, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"Webhook host {host} could not be resolved: {e}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"Webhook host {host} resolves to a non-public address")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    client TEXT NOT NULL,
+    status TEXT NOT NULL,
+    model TEXT NOT NULL,
+    provider TEXT,
+    parameters TEXT NOT NULL,
+    webhook_url TEXT,
+    webhook_status TEXT,
+    total INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    prompt TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, job_id, idx);
+CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client, created_at);
+"""
+
+_JOB_COLUMNS = ("id", "client", "status", "model", "provider", "parameters", "webhook_url", "webhook_status",
+                "total", "succeeded", "failed", "created_at", "started_at", "finished_at")
+
+
+class JobStore:
+    """SQLite-backed store of jobs and their prompts, safe to share between threads"""
+
+    def __init__(self, path: str = "jobs.db"):
+        """Open or create the database; items left running by a previous process are queued again"""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        with self._lock:
+            self._conn.execute("UPDATE job_items SET status = ? WHERE status = ?", (PENDING, RUNNING))
+
+    @staticmethod
+    def _job(row) -> Dict[str, Any]:
+        job = dict(zip(_JOB_COLUMNS, row))
+        job["parameters"] = loads(job["parameters"])
+        return job
+
+    def create(self, client: str, prompts: List[str], model: str, provider: Optional[str] = None,
+               parameters: Optional[Dict[str, Any]] = None, webhook_url: Optional[str] = None) -> Dict[str, Any]:
+        """Persist a new queued job and its prompts"""
+        job_id = f"job_{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, client, status, model, provider, parameters, webhook_url, total, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, client, QUEUED, model, provider, dumps(parameters or {}).decode(), webhook_url,
+                     len(prompts), now)
+                )
+                self._conn.executemany(
+                    "INSERT INTO job_items (job_id, idx, prompt, status) VALUES (?, ?, ?, ?)",
+                    ((job_id, idx, prompt, PENDING) for idx, prompt in enumerate(prompts))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id)
+
+    def get(self, job_id: str, client: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a job, or None if it does not exist or belongs to another client"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._job(row)
+        if client is not None and job["client"] != client:
+            return None
+        return job
+
+    def list_jobs(self, client: str, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get a client's most recent jobs"""
+        query = f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE client = ?"
+        args: List[Any] = [client]
+        if status:
+            query += " AND status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [self._job(row) for row in rows]
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get the outcome of a job's items in submission order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, status, result FROM job_items WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        return [{"index": idx, "status": status, **(loads(result) if result else {})} for idx, status, result in rows]
+
+    def pending_items(self) -> int:
+        """Count items still waiting to run in active jobs"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                "WHERE i.status = ? AND j.status IN (?, ?)", (PENDING, QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the next pending item of the oldest active job as running and return it with its job"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT j.id, i.idx, i.prompt FROM jobs j JOIN job_items i ON i.job_id = j.id "
+                    "WHERE j.status IN (?, ?) AND i.status = ? ORDER BY j.created_at, i.idx LIMIT 1",
+                    (QUEUED, RUNNING, PENDING)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, idx, prompt = row
+                self._conn.execute("UPDATE job_items SET status = ? WHERE job_id = ? AND idx = ?", (RUNNING, job_id, idx))
+                self._conn.execute("UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                                   (RUNNING, time.time(), job_id))
+                job = self._conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"job": self._job(job), "index": idx, "prompt": prompt}
+
+    def finish_item(self, job_id: str, idx: int, succeeded: bool, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Record an item's outcome, returning the job if this completed it"""
+        column = "succeeded" if succeeded else "failed"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("UPDATE job_items SET status = ?, result = ? WHERE job_id = ? AND idx = ?",
+                                   (SUCCEEDED if succeeded else FAILED, dumps(result).decode(), job_id, idx))
+                self._conn.execute(f"UPDATE jobs SET {column} = {column} + 1 WHERE id = ?", (job_id,))
+                updated = self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ? AND succeeded + failed = total",
+                    (COMPLETED, time.time(), job_id, RUNNING)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id) if updated else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not finished; items already running still complete"""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            ).rowcount
+        return bool(updated)
+
+    def set_webhook_status(self, job_id: str, status: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (status, job_id))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def describe(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job, for the API and webhooks"""
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "model": job["model"],
+        "provider": job["provider"],
+        "total": job["total"],
+        "succeeded": job["succeeded"],
+        "failed": job["failed"],
+        "pending": job["total"] - job["succeeded"] - job["failed"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "webhook_status": job["webhook_status"]
+    }
+
+
+class JobRunner:
+    """Worker threads that run job items one upstream call at a time, throttled and behind interactive traffic"""
+
+    def __init__(self, store: JobStore, generate: Callable[[Dict[str, Any], str], Dict[str, Any]],
+                 max_concurrent: int = 2, requests_per_minute: float = 0.0,
+                 should_yield: Optional[Callable[[], bool]] = None, poll_interval: float = 1.0,
+                 webhook_secret: Optional[str] = None, webhook_timeout: float = 10.0,
+                 webhook_hosts: Optional[List[str]] = None, registry: Optional[MetricsRegistry] = None):
+        """Initialize the runner
+
+        generate(job, prompt) makes the call and returns a generation result. While should_yield()
+        is true, for example because interactive requests are queueing, no new items are started.
+        requests_per_minute of 0 leaves items unthrottled. webhook_hosts limits webhooks to the listed
+        hosts; see check_webhook_url.
+        """
+        self.store = store
+        self.generate = generate
+        self.max_concurrent = max_concurrent
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.should_yield = should_yield
+        self.poll_interval = poll_interval
+        self.webhook_secret = webhook_secret
+        self.webhook_timeout = webhook_timeout
+        self.webhook_hosts = [host.lower() for host in webhook_hosts or []]
+        self._next_start = 0.0
+        self._throttle_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._session = requests.Session()
+
+        registry = registry or get_registry()
+        self._jobs = registry.counter("mcp_jobs_total", "Jobs finished by final status")
+        self._items = registry.counter("mcp_job_items_total", "Job items run by outcome")
+        self._webhooks = registry.counter("mcp_job_webhooks_total", "Job webhook deliveries by outcome")
+
+    def start(self) -> None:
+        """Start the worker threads"""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.max_concurrent):
+            thread = threading.Thread(target=self._run, name=f"job-runner-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the workers; items interrupted by shutdown are run again on the next start"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was submitted"""
+        self._wake.set()
+
+    def _throttle(self) -> Optional[float]:
+        """Wait for the next start time allowed by the rate limit, returning the start taken or None if stopping"""
+        now = time.monotonic()
+        if not self.interval:
+            return now
+        with self._throttle_lock:
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now and self._stop.wait(start - now):
+            return None
+        return start
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self.should_yield is not None and self.should_yield():
+                self._stop.wait(self.poll_interval)
+                continue
+            start = self._throttle()
+            if start is None:
+                return
+            try:
+                claimed = self.store.claim()
+            except sqlite3.Error as e:
+                logger.error(f"Could not claim a job item: {e}")
+                claimed = None
+            if claimed is None:
+                # Give back the unused start so an idle runner does not build up a backlog of them, unless
+                # another worker already took the one after it
+                with self._throttle_lock:
+                    if self.interval and self._next_start == start + self.interval:
+                        self._next_start = start
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.run_item(claimed["job"], claimed["index"], claimed["prompt"])
+
+    def run_item(self, job: Dict[str, Any], index: int, prompt: str) -> None:
+        """Run one item and record its outcome, notifying the webhook if it completed the job"""
+        try:
+            result = self.generate(job, prompt)
+        except Exception as e:
+            logger.error(f"Job {job['id']} item {index} raised: {e}")
+            result = {"success": False, "error": str(e)}
+
+        succeeded = bool(result.get("success", False))
+        if succeeded:
+            outcome = {key: result.get(key) for key in ("text", "provider", "model", "usage", "latency", "cost")}
+        else:
+            outcome = {"error": result.get("error", "Unknown error"), "error_type": result.get("error_type")}
+        self._items.inc(1, {"outcome": SUCCEEDED if succeeded else FAILED})
+
+        finished = self.store.finish_item(job["id"], index, succeeded, outcome)
+        if finished is not None:
+            self.finished(finished)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job, delivering its webhook in the background"""
+        if not self.store.cancel(job_id):
+            return False
+        threading.Thread(target=self.finished, args=(self.store.get(job_id),), name="job-webhook", daemon=True).start()
+        return True
+
+    def finished(self, job: Dict[str, Any]) -> None:
+        """Count a job that reached a final state and deliver its webhook"""
+        self._jobs.inc(1, {"status": job["status"]})
+        logger.info(f"Job {job['id']} {job['status']}: {job['succeeded']} succeeded, {job['failed']} failed")
+        if job["webhook_url"]:
+            self.deliver_webhook(job)
+
+    def deliver_webhook(self, job: Dict[str, Any]) -> bool:
+        """POST the job's final state to its webhook, retrying failed deliveries with backoff"""
+        body = dumps({"event": f"job.{job['status']}", "job": describe(job)})
+        headers = {"Content-Type": "application/json"}
+        if self.webhook_secret:
+            signature = hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+            headers[SIGNATURE_HEADER] = f"sha256={signature}"
+
+        for attempt in range(WEBHOOK_ATTEMPTS):
+            try:
+                # Checked again before every attempt, as the host's addresses may have changed since submission
+                check_webhook_url(job["webhook_url"], self.webhook_hosts)
+            except ValueError as e:
+                logger.warning(f"Webhook for job {job['id']} refused: {e}")
+                break
+            try:
+                # Redirects are not followed, as they could lead to a host that was never checked
+                response = self._session.post(job["webhook_url"], data=body, headers=headers,
+                                              timeout=self.webhook_timeout, allow_redirects=False)
+                if response.status_code < 300:
+                    self.store.set_webhook_status(job["id"], "delivered")
+                    self._webhooks.inc(1, {"outcome": "delivered"})
+                    return True
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            logger.warning(f"Webhook for job {job['id']} failed (attempt {attempt + 1}): {error}")
+            if self._stop.wait(2 ** attempt):
+                break
+
+        self.store.set_webhook_status(job["id"], "failed")
+        self._webhooks.inc(1, {"outcome": "failed"})
+        return False
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the runner's settings and backlog"""
+        return {
+            "workers": len(self._threads),
+            "requests_per_minute": 60.0 / self.interval if self.interval else None,
+            "pending_items": self.store.pending_items()
+        }
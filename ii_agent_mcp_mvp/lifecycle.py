@@ -0,0 +1,180 @@
+"""
+II-Agent MCP Server Add-On - Lifecycle Module
+Readiness reporting and connection draining for graceful shutdown
+"""
+import asyncio
+import time
+from typing import Dict, Any, Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Endpoints that keep answering while draining, so orchestrators can watch the shutdown
+DEFAULT_EXEMPT_PATHS = ("/ready", "/status", "/metrics")
+
+# Lifecycle states, in order
+STARTING = "starting"
+READY = "ready"
+STOPPING = "stopping"
+DRAINING = "draining"
+STOPPED = "stopped"
+
+
+class ShutdownController:
+    """Tracks in-flight requests and drains them before the server exits"""
+
+    def __init__(self, drain_timeout: float = 30.0, readiness_delay: float = 0.0,
+                 exempt_paths: Iterable[str] = DEFAULT_EXEMPT_PATHS, registry: Optional[MetricsRegistry] = None):
+        """Initialize the controller; readiness_delay keeps serving after turning not-ready so load balancers can react"""
+        self.drain_timeout = drain_timeout
+        self.readiness_delay = readiness_delay
+        self.exempt_paths = set(exempt_paths)
+        self.state = STARTING
+        self.in_flight = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+        registry = registry or get_registry()
+        self._in_flight_gauge = registry.gauge("mcp_requests_in_flight", "Requests currently being handled")
+        self._rejected = registry.counter("mcp_drain_rejected_total", "Requests rejected because the server was draining")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ShutdownController":
+        """Create a controller from the `shutdown` section of providers.yaml"""
+        config = config or {}
+        return cls(
+            float(config.get("drain_timeout", 30.0)),
+            float(config.get("readiness_delay", 0.0)),
+            config.get("exempt_paths", DEFAULT_EXEMPT_PATHS)
+        )
+
+    @property
+    def ready(self) -> bool:
+        """Whether the server should receive new traffic"""
+        return self.state == READY
+
+    @property
+    def accepting(self) -> bool:
+        """Whether new requests are handled rather than rejected"""
+        return self.state in (STARTING, READY, STOPPING)
+
+    def mark_ready(self) -> None:
+        """Report ready once startup has finished"""
+        if self.state == STARTING:
+            self.state = READY
+
+    def mark_stopped(self) -> None:
+        """Record that shutdown has finished"""
+        self.state = STOPPED
+
+    def _enter(self) -> None:
+        self.in_flight += 1
+        self._in_flight_gauge.set(self.in_flight)
+        if self._idle is not None:
+            self._idle.clear()
+
+    def _exit(self) -> None:
+        self.in_flight -= 1
+        self._in_flight_gauge.set(self.in_flight)
+        if self.in_flight == 0 and self._idle is not None:
+            self._idle.set()
+
+    async def drain(self, readiness_delay: Optional[float] = None) -> int:
+        """Stop taking traffic and wait for in-flight requests, returning how many were still running at the deadline"""
+        if self._drain_task is None:
+            delay = self.readiness_delay if readiness_delay is None else readiness_delay
+            self._drain_task = asyncio.get_running_loop().create_task(self._drain(delay))
+        return await asyncio.shield(self._drain_task)
+
+    async def _drain(self, readiness_delay: float) -> int:
+        self.state = STOPPING
+        if readiness_delay > 0:
+            logger.info(f"Reporting not ready, serving for another {readiness_delay:.1f}s before draining")
+            await asyncio.sleep(readiness_delay)
+
+        self.state = DRAINING
+        logger.info(f"Draining {self.in_flight} in-flight requests (timeout {self.drain_timeout:.0f}s)")
+        self._idle = asyncio.Event()
+        if self.in_flight == 0:
+            self._idle.set()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+            logger.info(f"Drained in {time.monotonic() - start:.2f}s")
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timeout reached with {self.in_flight} requests still in flight")
+        return self.in_flight
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the lifecycle state"""
+        return {"state": self.state, "ready": self.ready, "in_flight": self.in_flight}
+
+
+class DrainMiddleware:
+    """ASGI middleware counting in-flight requests and rejecting new ones while draining"""
+
+    def __init__(self, app, controller: ShutdownController):
+        """Initialize the middleware"""
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or scope["path"] in controller.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not controller.accepting:
+            controller._rejected.inc()
+            response = JSONResponse({"detail": "Server is shutting down"}, status_code=503,
+                                    headers={"Retry-After": "1", "Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            # Ask keep-alive clients to reconnect, which lands them on another instance
+            if message["type"] == "http.response.start" and controller.state in (STOPPING, DRAINING):
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"connection", b"close")]}
+            await send(message)
+
+        controller._enter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            controller._exit()
+
+
+def serve(app, controller: ShutdownController, **options) -> None:
+    """Run uvicorn, draining requests through the controller before exiting on SIGTERM or SIGINT"""
+    import uvicorn
+
+    class GracefulServer(uvicorn.Server):
+        """uvicorn server that keeps its listening socket open until requests have drained"""
+
+        _loop: Optional[asyncio.AbstractEventLoop] = None
+        _drain_task: Optional[asyncio.Task] = None
+
+        async def startup(self, sockets=None) -> None:
+            self._loop = asyncio.get_running_loop()
+            await super().startup(sockets)
+
+        def handle_exit(self, sig, frame) -> None:
+            # A second signal, or one before startup, exits right away
+            if self._loop is None or self._drain_task is not None:
+                super().handle_exit(sig, frame)
+                return
+            logger.info("Shutdown requested, draining before exit")
+            self._loop.call_soon_threadsafe(self._start_drain)
+
+        def _start_drain(self) -> None:
+            self._drain_task = self._loop.create_task(self._drain_and_exit())
+
+        async def _drain_and_exit(self) -> None:
+            await controller.drain()
+            self.should_exit = True
+
+    GracefulServer(uvicorn.Config(app, timeout_graceful_shutdown=int(controller.drain_timeout) or None, **options)).run()
@@ -1,19 +1,51 @@
 """
 II-Agent MCP Server Add-On - Main FastAPI Server
-Implements the FastAPI server with /generate and /status endpoints
+Implements the FastAPI server with /generate, /status and /metrics endpoints,
+and OpenAI-compatible /v1/chat/completions and /v1/models endpoints
 """
 import os
+import hmac
+import math
+import threading
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from pydantic import BaseModel, Field
 
+from .admission import AdmissionController, AdmissionRejected, ProviderSlots
+from .cache import SemanticCache
+from .cancellation import CancellationToken, RequestCancelled, run_cancellable
+from .clients import Client, ClientRegistry, QuotaTracker, QuotaExceeded
+from .compression import CompressionMiddleware, available_encodings
 from .config import ConfigManager
 from .providers.factory import ProviderFactory
+from .replay import ReplayLogWriter
+from .routing import RoutingTable
+from .downgrade import DowngradePolicy
+from .embeddings import ENCODING_FORMATS, EmbeddingBatcher, encode_embedding
+from .shadow import ShadowMirror
+from .providers.chaos import ChaosController, FaultProfile
+from .providers.errors import CLIENT, QUOTA, UpstreamError
 from .fallback.handler import FallbackHandler
+from .health import HealthChecker
+from .jobs import JOB_STATES, JobRunner, JobStore, check_webhook_url, describe as describe_job
+from .lifecycle import DrainMiddleware, ShutdownController, serve
+from .openai_compat import (completion_response, error_body, messages_to_prompt, model_list, new_completion_id,
+                            normalize_messages, stream_chunks)
+from .tokens import ContextLimits, estimate_tokens
+from .usage import UsageTracker
+from .warmup import ConnectionWarmer
 from .utils.logging import get_logger
+from .utils.jsonlib import BACKEND as JSON_BACKEND, FastJSONResponse
+from .utils.metrics import get_registry
+from .utils.profiling import ProfilerBusy, configure_profiling, run_profile, stage
+from .utils.tracing import configure_tracing, get_tracer, TracingMiddleware
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -22,7 +54,8 @@ logger = get_logger(__name__)
 app = FastAPI(
     title="II-Agent MCP Server",
     description="Multi-Cloud Provider server for II-Agent",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -34,10 +67,91 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record a server span per request; a plain ASGI middleware, so endpoints still see client disconnects
+app.add_middleware(TracingMiddleware)
+
 # Initialize configuration, provider factory, and fallback handler
 config_manager = ConfigManager()
 provider_factory = ProviderFactory()
 fallback_handler = None
+routing_table: Optional[RoutingTable] = None
+downgrade_policy: Optional[DowngradePolicy] = None
+usage_tracker = UsageTracker(config_manager.get_pricing())
+admission_controller = AdmissionController.from_config(config_manager.config.get("admission"))
+quota_config = config_manager.config.get("quotas") or {}
+client_registry = ClientRegistry(config_manager.config.get("clients"), quota_config.get("require_api_key", False))
+quota_tracker = QuotaTracker.from_config(quota_config)
+chaos_controller = ChaosController(provider_factory)
+semantic_cache = SemanticCache.from_config(config_manager.config.get("cache"))
+replay_log = ReplayLogWriter.from_config(config_manager.config.get("replay_log"))
+connection_warmer = ConnectionWarmer.from_config(provider_factory, config_manager.config.get("warmup"))
+health_checker = HealthChecker.from_config(provider_factory, config_manager.config.get("health_check"))
+cancellation_config = config_manager.config.get("cancellation") or {}
+shadow_mirror = ShadowMirror.from_config(config_manager.config.get("shadow"), provider_factory)
+jobs_config = config_manager.config.get("jobs") or {}
+job_store: Optional[JobStore] = None
+job_runner: Optional[JobRunner] = None
+embeddings_config = config_manager.config.get("embeddings") or {}
+embedding_batcher: Optional[EmbeddingBatcher] = None
+
+# Compress large request and response bodies when the client negotiates it
+compression_config = config_manager.config.get("compression") or {}
+if compression_config.get("enabled", False):
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(compression_config.get("minimum_size", 1024)),
+        paths=compression_config.get("paths", ["/generate"]),
+        levels=compression_config.get("levels"),
+        max_request_size=int(compression_config.get("max_request_size", 10 * 1024 * 1024))
+    )
+
+# Track in-flight requests and turn new ones away while draining for shutdown
+shutdown_controller = ShutdownController.from_config(config_manager.config.get("shutdown"))
+app.add_middleware(DrainMiddleware, controller=shutdown_controller)
+
+# Header used by callers without an API key to identify themselves for usage accounting
+CLIENT_ID_HEADER = "X-Client-ID"
+DEFAULT_CLIENT_ID = "anonymous"
+
+# Response status for each kind of generation failure; anything else is a 500
+FAILURE_STATUS_CODES = {"context_length_exceeded": 413, "invalid_request": 400, "rate_limited": 429, "cancelled": 499}
+
+# Header used to select a priority class when the request body does not
+PRIORITY_HEADER = "X-Priority"
+
+# Header carrying the admin token for /admin endpoints
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Placeholder from the example providers.yaml, which is public and so never a valid token
+ADMIN_TOKEN_PLACEHOLDER = "CHANGE_ME"
+
+def require_admin(request: Request):
+    """Allow access only with the admin token configured in providers.yaml"""
+    admin_token = config_manager.config.get("server", {}).get("admin_token")
+    if not admin_token or str(admin_token) == ADMIN_TOKEN_PLACEHOLDER:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    provided = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    if not hmac.compare_digest(provided.encode(), str(admin_token).encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+# Paths answered in the OpenAI API's shapes, including errors
+OPENAI_PATH_PREFIX = "/v1/"
+
+@app.exception_handler(HTTPException)
+async def openai_http_exception_handler(request: Request, exc: HTTPException):
+    """Render errors on the OpenAI-compatible endpoints as OpenAI error bodies"""
+    if not request.url.path.startswith(OPENAI_PATH_PREFIX):
+        return await http_exception_handler(request, exc)
+    return FastJSONResponse(error_body(exc.status_code, str(exc.detail)), status_code=exc.status_code,
+                            headers=exc.headers)
+
+@app.exception_handler(RequestValidationError)
+async def openai_validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Render invalid request bodies on the OpenAI-compatible endpoints as OpenAI error bodies"""
+    if not request.url.path.startswith(OPENAI_PATH_PREFIX):
+        return await request_validation_exception_handler(request, exc)
+    message = "; ".join(f"{'.'.join(str(part) for part in error['loc'][1:])}: {error['msg']}" for error in exc.errors())
+    return FastJSONResponse(error_body(400, message), status_code=400)
 
 # Request and response models
 class GenerateRequest(BaseModel):
@@ -49,6 +163,7 @@ class GenerateRequest(BaseModel):
     max_tokens: int = Field(1024, description="Maximum tokens to generate")
     top_p: float = Field(0.95, description="Top-p sampling parameter")
     top_k: int = Field(40, description="Top-k sampling parameter")
+    priority: Optional[str] = Field(None, description="Priority class: interactive, default or batch")
 
 class GenerateResponse(BaseModel):
     """Model for generation response"""
@@ -57,48 +172,234 @@ class GenerateResponse(BaseModel):
     provider: str = Field(..., description="Provider used for generation")
     latency: float = Field(..., description="Generation latency in seconds")
     fallback_used: bool = Field(False, description="Whether fallback was used")
+    usage: Optional[Dict[str, int]] = Field(None, description="Token counts reported by the provider")
+    cost: Optional[float] = Field(None, description="Estimated cost in USD")
+    cached: bool = Field(False, description="Whether the response was served from the semantic cache")
+    downgraded_from: Optional[str] = Field(None, description="Requested model or alias, when a lighter tier served the request")
+
+class JobRequest(BaseModel):
+    """Model for a batch job submission"""
+    prompts: List[str] = Field(..., min_length=1, description="Prompts to generate from, each run as one request")
+    model: str = Field("default", description="The model or alias to use for every prompt")
+    provider: Optional[str] = Field(None, description="The provider to try first (optional)")
+    temperature: float = Field(0.7, description="Temperature for generation")
+    max_tokens: int = Field(1024, description="Maximum tokens to generate per prompt")
+    top_p: float = Field(0.95, description="Top-p sampling parameter")
+    top_k: int = Field(40, description="Top-k sampling parameter")
+    webhook_url: Optional[str] = Field(None, description="URL to POST the job to once it completes or is cancelled")
+
+class EmbeddingRequest(BaseModel):
+    """Model for an embedding request, in the OpenAI embeddings shape"""
+    input: Union[str, List[str]] = Field(..., description="Text or list of texts to embed")
+    model: Optional[str] = Field(None, description="Embedding model (defaults to the provider's embedding model)")
+    provider: Optional[str] = Field(None, description="The provider to use (optional)")
+    encoding_format: str = Field("float", description="float for JSON arrays, base64 for little-endian float32 bytes")
+
+class ChatMessage(BaseModel):
+    """Model for one message of a chat completion request"""
+    role: str = Field(..., description="system, developer, user or assistant")
+    content: Optional[Union[str, List[Dict[str, Any]]]] = Field(None, description="Text or a list of text content parts")
+
+class ChatCompletionRequest(BaseModel):
+    """Model for an OpenAI chat completion request; fields the gateway does not use are ignored"""
+    model: str = Field("default", description="The model or alias to use")
+    messages: List[ChatMessage] = Field(..., min_length=1, description="The conversation so far")
+    temperature: float = Field(0.7, description="Temperature for generation")
+    top_p: float = Field(0.95, description="Top-p sampling parameter")
+    max_tokens: Optional[int] = Field(None, description="Maximum tokens to generate")
+    max_completion_tokens: Optional[int] = Field(None, description="Maximum tokens to generate; takes precedence over max_tokens")
+    stream: bool = Field(False, description="Stream the completion as server-sent events")
+    stream_options: Optional[Dict[str, Any]] = Field(None, description="include_usage adds a final usage chunk")
 
 class StatusResponse(BaseModel):
     """Model for status response"""
     status: str = Field("ok", description="Server status")
     uptime: float = Field(..., description="Server uptime in seconds")
     providers: Dict[str, Any] = Field(..., description="Provider status")
+    usage: Dict[str, Any] = Field(default_factory=dict, description="Aggregated usage by provider, model and client")
+    admission: Dict[str, Any] = Field(default_factory=dict, description="Admission queue state")
+    clients: Dict[str, Any] = Field(default_factory=dict, description="Quota usage per configured client")
+    cache: Dict[str, Any] = Field(default_factory=dict, description="Semantic cache state")
+    warmup: Dict[str, Any] = Field(default_factory=dict, description="Connection warm-up and keep-alive state")
+    health: Dict[str, Any] = Field(default_factory=dict, description="Background health check state per provider")
+    shadow: Dict[str, Any] = Field(default_factory=dict, description="Shadow traffic comparison per candidate")
+    jobs: Dict[str, Any] = Field(default_factory=dict, description="Background job runner state")
+    embeddings: Dict[str, Any] = Field(default_factory=dict, description="Embedding request coalescing state")
+    json_backend: str = Field(JSON_BACKEND, description="JSON encoding backend, orjson or json")
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize providers on startup"""
-    global fallback_handler
+    global fallback_handler, routing_table, downgrade_policy, job_store, job_runner, embedding_batcher
     
     # Load configuration
     config = config_manager.config
     
+    # Configure tracing before any spans are recorded
+    configure_tracing(config.get("tracing"))
+    configure_profiling(config.get("profiling"))
+    
     # Initialize providers
     if "providers" in config:
         for provider_config in config["providers"]:
             name = provider_config.get("name")
             api_key = provider_config.get("api_key")
             models = provider_config.get("models")
+            base_url = provider_config.get("base_url")
+            
+            api_keys = provider_config.get("api_keys")
+            if not api_key and api_keys:
+                # Model discovery and health checks use the first key of the pool
+                first = api_keys[0]
+                api_key = first.get("key") if isinstance(first, dict) else first
             
             if name and api_key:
                 logger.info(f"Initializing provider: {name}")
-                provider_factory.create_provider(name, api_key, models)
+                provider = provider_factory.create_provider(name, api_key, models, base_url)
+                if provider and api_keys:
+                    provider.set_api_keys(
+                        api_keys,
+                        provider_config.get("key_strategy", "weighted_round_robin"),
+                        float(provider_config.get("key_park_seconds", 30.0))
+                    )
+                    logger.info(f"Using {len(provider.key_pool)} API keys for {name}")
+                request_compression = provider_config.get("request_compression")
+                if provider and request_compression:
+                    if request_compression in available_encodings():
+                        provider.request_compression = request_compression
+                        provider.request_compression_min_size = int(compression_config.get("minimum_size", 1024))
+                    else:
+                        logger.warning(f"Request compression {request_compression} unavailable for {name}, sending uncompressed")
     
     # Initialize fallback handler
     fallback_config = config.get("fallback", {})
     max_retries = fallback_config.get("max_retries", 2)
-    fallback_handler = FallbackHandler(provider_factory, max_retries)
+    context_limits = ContextLimits.from_config(config.get("limits"))
+    admission_config = config.get("admission", {})
+    provider_slots = ProviderSlots.from_config(admission_config)
+    if provider_slots.adaptive is not None:
+        logger.info(f"Adaptive concurrency enabled ({provider_slots.adaptive.get('algorithm', 'gradient')})")
+    fallback_handler = FallbackHandler(provider_factory, max_retries, context_limits, provider_slots, health_checker)
+    
+    # Compile provider order and model aliases once, so routing a request is a single lookup
+    routing_table = RoutingTable.from_config(provider_factory, config_manager.get_provider_order(), config.get("routing"))
+    logger.info(f"Routing {len(routing_table.provider_order)} providers, aliases: {', '.join(routing_table.aliases) or 'none'}")
+    downgrade_policy = DowngradePolicy.from_config((config.get("routing") or {}).get("downgrade"), provider_factory, provider_slots)
+    if downgrade_policy is not None:
+        logger.info(f"Model downgrade enabled for {', '.join(downgrade_policy.tiers)}")
+    
+    # Embedding calls share the providers' concurrency limits with generations
+    embedding_batcher = EmbeddingBatcher.from_config(embeddings_config, provider_factory, provider_slots)
     
+    # Apply fault injection from configuration (testing only)
+    chaos_controller.apply_config(config.get("chaos"))
+    
+    # Pre-connect to providers so the first requests do not pay DNS and TLS setup
+    if connection_warmer is not None:
+        if connection_warmer.wait_on_startup:
+            await run_in_threadpool(connection_warmer.warm_up)
+        else:
+            threading.Thread(target=connection_warmer.warm_up, name="connection-warmup", daemon=True).start()
+        connection_warmer.start()
+    
+    # Check provider health in the background so requests avoid providers known to be down
+    if health_checker is not None:
+        health_checker.start()
+    
+    # Run submitted jobs in the background, resuming the ones left unfinished by a previous run
+    if jobs_config.get("enabled", False):
+        job_store = JobStore(jobs_config.get("database", "jobs.db"))
+        yield_to_interactive = jobs_config.get("yield_to_interactive", True)
+        job_runner = JobRunner(
+            job_store,
+            run_job_item,
+            max_concurrent=int(jobs_config.get("max_concurrent", 2)),
+            requests_per_minute=float(jobs_config.get("requests_per_minute", 60)),
+            should_yield=(lambda: admission_controller.queue_depth() > 0) if yield_to_interactive else None,
+            webhook_secret=jobs_config.get("webhook_secret"),
+            webhook_timeout=float(jobs_config.get("webhook_timeout", 10.0)),
+            webhook_hosts=jobs_config.get("webhook_hosts")
+        )
+        job_runner.start()
+        logger.info(f"Job runner started, {job_store.pending_items()} items pending")
+    
+    logger.info(f"JSON backend: {JSON_BACKEND}")
     logger.info("MCP Server initialized successfully")
+    shutdown_controller.mark_ready()
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain in-flight requests, flush buffered state and close upstream connections"""
+    # Normally already drained by the server before it stops; this covers other servers
+    remaining = await shutdown_controller.drain(readiness_delay=0)
+    if remaining:
+        logger.warning(f"Shutting down with {remaining} requests still in flight")
+    
+    # Stop background threads before closing the connections they use
+    if health_checker is not None:
+        health_checker.stop()
+    if connection_warmer is not None:
+        connection_warmer.stop()
+    if shadow_mirror is not None:
+        shadow_mirror.close()
+    if job_runner is not None:
+        job_runner.stop()
+        job_store.close()
+    
+    # Flush buffered logs, spans and quota counters
+    if replay_log is not None:
+        replay_log.close()
+    get_tracer().shutdown()
+    quota_tracker.save_state()
+    
+    for provider in provider_factory.get_all_providers():
+        provider.close()
+    shutdown_controller.mark_stopped()
+    logger.info("MCP Server stopped")
+
+def identify_client(http_request: Request) -> Tuple[Optional[Client], str, float]:
+    """Identify the caller by API key, returning the client, its name for accounting and its weight"""
+    client = client_registry.identify(http_request.headers)
+    if client is None and client_registry.require_api_key:
+        raise HTTPException(status_code=401, detail="Invalid or missing API key")
+    client_id = client.name if client else (http_request.headers.get(CLIENT_ID_HEADER) or DEFAULT_CLIENT_ID)
+    return client, client_id, client.weight if client else 1.0
+
+def generation_error(result: Dict[str, Any]) -> HTTPException:
+    """Build the error returned for a failed generation result"""
+    error_msg = result.get("error", "Unknown error")
+    error_type = result.get("error_type")
+    if error_type == "context_length_exceeded":
+        return HTTPException(status_code=413, detail=f"{error_msg} (~{result.get('prompt_tokens')} tokens)")
+    if error_type == "invalid_request":
+        return HTTPException(status_code=failure_status(result), detail=f"{error_msg}: {result.get('message', '')}")
+    if error_type == "rate_limited":
+        retry_after = math.ceil(result.get("retry_after") or 1)
+        return HTTPException(status_code=429, detail="All providers are rate limited", headers={"Retry-After": str(retry_after)})
+    return HTTPException(status_code=500, detail=f"Generation failed: {error_msg}")
+
+def failure_status(result: Dict[str, Any]) -> int:
+    """Get the response status for a failed generation result"""
+    status_code = FAILURE_STATUS_CODES.get(result.get("error_type"), 500)
+    if result.get("error_type") == "invalid_request" and result.get("status_code") in (413, 422):
+        status_code = result["status_code"]
+    return status_code
 
 # Generate endpoint
 @app.post("/generate", response_model=GenerateResponse)
-async def generate(request: GenerateRequest):
+async def generate(request: GenerateRequest, http_request: Request):
     """Generate text from the specified model"""
     start_time = time.time()
     
+    # Identify the client by API key
+    with stage("client_identification"):
+        client, client_id, client_weight = identify_client(http_request)
+    
     # Log the request (sanitized)
-    logger.info(f"Generation request: model={request.model}, length={len(request.prompt)}")
+    with stage("logging"):
+        logger.info(f"Generation request: model={request.model}, length={len(request.prompt)}")
     
     # Check if providers are available
     providers = provider_factory.get_all_providers()
@@ -106,47 +407,424 @@ async def generate(request: GenerateRequest):
         logger.error("No providers available")
         raise HTTPException(status_code=503, detail="No providers available")
     
-    # Determine provider order
-    if request.provider:
-        # If specific provider requested, use it first
-        provider_order = [request.provider.lower()]
-        # Add other providers for fallback
-        for p in config_manager.get_provider_order():
-            if p.lower() != request.provider.lower():
-                provider_order.append(p.lower())
-    else:
-        # Use default provider order from config
-        provider_order = config_manager.get_provider_order()
+    # Look up the provider order and concrete models for the requested model or alias
+    with stage("provider_order"):
+        requested_provider = request.provider.lower() if request.provider else None
+        route = routing_table.route(request.model, requested_provider)
     
-    # Process the request with fallback logic
-    result = fallback_handler.process_request(
-        prompt=request.prompt,
-        model=request.model,
-        provider_order=provider_order,
-        temperature=request.temperature,
-        max_tokens=request.max_tokens,
-        top_p=request.top_p,
-        top_k=request.top_k
-    )
+    # Switch to a lighter model tier while the requested one is overloaded
+    model = request.model
+    if downgrade_policy is not None:
+        with stage("downgrade"):
+            model, route = downgrade_policy.select(request.model, route, routing_table, requested_provider)
+    
+    # Enforce per-client quotas
+    if client:
+        try:
+            quota_tracker.consume_request(client)
+        except QuotaExceeded as e:
+            logger.warning(str(e))
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    # Determine priority class
+    try:
+        priority = admission_controller.normalize_priority(
+            request.priority or http_request.headers.get(PRIORITY_HEADER)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Annotate the request span
+    current_span = get_tracer().current_span()
+    if current_span is not None:
+        current_span.set_attributes({"client": client_id, "priority": priority, "model": request.model})
+        if model != request.model:
+            current_span.set_attribute("downgraded_to", model)
+    
+    # Serve near-duplicate prompts from the semantic cache, scoped to the client and the generation parameters
+    cache_namespace = (f"{client_id}|{model}|{request.provider or ''}|{request.temperature}|"
+                       f"{request.max_tokens}|{request.top_p}|{request.top_k}")
+    replay_request = request.model_dump() if replay_log is not None else None
+    if semantic_cache is not None:
+        cached = await run_in_threadpool(semantic_cache.lookup, request.prompt, cache_namespace)
+        if cached is not None:
+            cached_result, similarity = cached
+            logger.info(f"Semantic cache hit: similarity={similarity:.3f}, provider={cached_result['provider']}")
+            if replay_log is not None:
+                replay_log.record_request(replay_request, client_id, priority, 200, cached_result,
+                                          time.time() - start_time, 0.0, cached=True)
+            return FastJSONResponse({
+                "text": cached_result["text"],
+                "model": cached_result["model"],
+                "provider": cached_result["provider"],
+                "latency": time.time() - start_time,
+                "fallback_used": False,
+                "usage": cached_result.get("usage"),
+                "cost": 0.0,
+                "cached": True,
+                "downgraded_from": request.model if model != request.model else None
+            })
+    
+    # Process the request with fallback logic once admitted, off the event loop
+    cancel_token = CancellationToken()
+    
+    async def admit_and_generate():
+        async with admission_controller.admit(priority, client_id, client_weight):
+            return await run_in_threadpool(
+                fallback_handler.process_request,
+                prompt=request.prompt,
+                model=model,
+                provider_order=route.providers,
+                provider_models=route.models,
+                client_id=client_id,
+                client_weight=client_weight,
+                cancel_token=cancel_token,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                top_p=request.top_p,
+                top_k=request.top_k
+            )
+    
+    try:
+        if cancellation_config.get("enabled", True):
+            # Stop queueing, retrying and waiting on upstreams once the client has gone away
+            result = await run_cancellable(admit_and_generate(), http_request, cancel_token,
+                                           float(cancellation_config.get("poll_interval", 0.1)))
+        else:
+            result = await admit_and_generate()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except RequestCancelled:
+        logger.info(f"Client disconnected after {time.time() - start_time:.2f}s, generation cancelled")
+        if replay_log is not None:
+            replay_log.record_request(replay_request, client_id, priority, 499, {"error": "Client disconnected"},
+                                      time.time() - start_time)
+        raise HTTPException(status_code=499, detail="Client closed request")
     
     # Check for success
     if not result.get("success", False):
         error_msg = result.get("error", "Unknown error")
         details = result.get("details", [])
         logger.error(f"Generation failed: {error_msg}, details: {details}")
-        raise HTTPException(status_code=500, detail=f"Generation failed: {error_msg}")
+        status_code = failure_status(result)
+        if replay_log is not None:
+            replay_log.record_request(replay_request, client_id, priority, status_code, result, time.time() - start_time)
+        raise generation_error(result)
+    
+    if downgrade_policy is not None:
+        downgrade_policy.observe(result["provider"], result["model"], result["latency"])
+    
+    # Record token usage and cost
+    with stage("usage_accounting"):
+        usage = result.get("usage")
+        cost = usage_tracker.record(result["provider"], result["model"], client_id, usage, result["latency"])
+        if client and usage:
+            quota_tracker.record_tokens(client, usage.get("total_tokens", 0))
+    
+    # Cache the completion for near-duplicate prompts
+    if semantic_cache is not None:
+        cache_entry = {"text": result["text"], "model": result["model"], "provider": result["provider"], "usage": usage}
+        await run_in_threadpool(semantic_cache.store, request.prompt, cache_namespace, cache_entry)
+    
+    # Mirror a sample of answered requests to candidate providers, off the request path
+    if shadow_mirror is not None:
+        shadow_mirror.mirror(request.prompt, {"temperature": request.temperature, "max_tokens": request.max_tokens,
+                                              "top_p": request.top_p, "top_k": request.top_k}, result)
+    
+    # Persist the exchange for offline analysis, written off the request path
+    if replay_log is not None:
+        replay_log.record_request(replay_request, client_id, priority, 200, result, result["latency"], cost)
     
     # Log success
-    logger.info(f"Generation successful: provider={result['provider']}, model={result['model']}, latency={result['latency']:.2f}s")
+    with stage("logging"):
+        logger.info(f"Generation successful: provider={result['provider']}, model={result['model']}, latency={result['latency']:.2f}s")
     
-    # Return response
-    return {
+    # Return response, rendered directly rather than re-validated against GenerateResponse
+    return FastJSONResponse({
         "text": result["text"],
         "model": result["model"],
         "provider": result["provider"],
         "latency": result["latency"],
-        "fallback_used": result.get("fallback_used", False)
-    }
+        "fallback_used": result.get("fallback_used", False),
+        "usage": usage,
+        "cost": cost,
+        "cached": False,
+        "downgraded_from": request.model if model != request.model else None
+    })
+
+# OpenAI-compatible chat completions endpoint
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest, http_request: Request):
+    """Generate a chat completion through routing, admission and fallback, answering in the OpenAI format"""
+    start_time = time.time()
+    client, client_id, client_weight = identify_client(http_request)
+    
+    try:
+        messages = normalize_messages([message.model_dump() for message in request.messages])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    prompt = messages_to_prompt(messages)
+    logger.info(f"Chat completion request: model={request.model}, messages={len(messages)}, stream={request.stream}")
+    
+    if not provider_factory.get_all_providers():
+        raise HTTPException(status_code=503, detail="No providers available")
+    
+    route = routing_table.route(request.model)
+    model = request.model
+    if downgrade_policy is not None:
+        model, route = downgrade_policy.select(request.model, route, routing_table, None)
+    
+    if client:
+        try:
+            quota_tracker.consume_request(client)
+        except QuotaExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    try:
+        priority = admission_controller.normalize_priority(http_request.headers.get(PRIORITY_HEADER))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    cancel_token = CancellationToken()
+    
+    # A streamed request holds its admission slot until the provider starts answering
+    async def admit_and_generate():
+        async with admission_controller.admit(priority, client_id, client_weight):
+            return await run_in_threadpool(
+                fallback_handler.process_request,
+                prompt=prompt,
+                model=model,
+                provider_order=route.providers,
+                provider_models=route.models,
+                client_id=client_id,
+                client_weight=client_weight,
+                cancel_token=cancel_token,
+                stream=request.stream,
+                messages=messages,
+                temperature=request.temperature,
+                max_tokens=request.max_completion_tokens or request.max_tokens or 1024,
+                top_p=request.top_p
+            )
+    
+    try:
+        if cancellation_config.get("enabled", True):
+            result = await run_cancellable(admit_and_generate(), http_request, cancel_token,
+                                           float(cancellation_config.get("poll_interval", 0.1)))
+        else:
+            result = await admit_and_generate()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except RequestCancelled:
+        logger.info(f"Client disconnected after {time.time() - start_time:.2f}s, chat completion cancelled")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    
+    if not result.get("success", False):
+        logger.error(f"Chat completion failed: {result.get('error', 'Unknown error')}, details: {result.get('details', [])}")
+        raise generation_error(result)
+    
+    def record_usage(usage: Optional[Dict[str, int]]) -> float:
+        latency = time.time() - start_time if request.stream else result["latency"]
+        if downgrade_policy is not None:
+            downgrade_policy.observe(result["provider"], result["model"], result["latency"])
+        cost = usage_tracker.record(result["provider"], result["model"], client_id, usage, latency)
+        if client and usage:
+            quota_tracker.record_tokens(client, usage.get("total_tokens", 0))
+        return cost
+    
+    if not request.stream:
+        record_usage(result.get("usage"))
+        logger.info(f"Chat completion successful: provider={result['provider']}, model={result['model']}, latency={result['latency']:.2f}s")
+        return FastJSONResponse(completion_response(result, prompt, new_completion_id()))
+    
+    chunks = stream_chunks(result, prompt, new_completion_id(), bool((request.stream_options or {}).get("include_usage")),
+                           on_finish=record_usage)
+    
+    async def stream_body():
+        finished = False
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                yield chunk
+            finished = True
+        finally:
+            if not finished:
+                # The client went away mid-stream; abort the upstream read
+                cancel_token.cancel("client disconnected")
+    
+    return StreamingResponse(stream_body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# OpenAI-compatible model listing
+@app.get("/v1/models")
+async def list_models():
+    """List provider models and routing aliases"""
+    return FastJSONResponse({"object": "list", "data": model_list(routing_table, provider_factory)})
+
+def embedding_provider(requested: Optional[str]) -> str:
+    """Pick the provider for an embedding request: the requested one, the configured one or the first that has embeddings"""
+    if requested:
+        name = requested.lower()
+    elif embeddings_config.get("provider"):
+        name = str(embeddings_config["provider"]).lower()
+    else:
+        name = next((name for name in routing_table.provider_order
+                     if getattr(provider_factory.get_provider(name), "supports_embeddings", False)), None)
+        if name is None:
+            raise HTTPException(status_code=503, detail="No provider supports embeddings")
+    provider = provider_factory.get_provider(name)
+    if provider is None:
+        raise HTTPException(status_code=400, detail=f"Provider {name} not found")
+    if not provider.supports_embeddings:
+        raise HTTPException(status_code=400, detail=f"Provider {name} does not support embeddings")
+    return name
+
+# Embeddings endpoint
+@app.post("/embeddings")
+async def embeddings(request: EmbeddingRequest, http_request: Request):
+    """Embed one or more texts, coalescing concurrent requests into batched upstream calls"""
+    if embedding_batcher is None:
+        raise HTTPException(status_code=404, detail="Embeddings are not enabled")
+    client, client_id, _ = identify_client(http_request)
+    
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    if not texts:
+        raise HTTPException(status_code=400, detail="input must not be empty")
+    max_inputs = int(embeddings_config.get("max_inputs", 2048))
+    if len(texts) > max_inputs:
+        raise HTTPException(status_code=413, detail=f"A request can hold at most {max_inputs} inputs")
+    if request.encoding_format not in ENCODING_FORMATS:
+        raise HTTPException(status_code=400, detail=f"encoding_format must be one of {', '.join(ENCODING_FORMATS)}")
+    provider_name = embedding_provider(request.provider)
+    
+    if client:
+        try:
+            quota_tracker.consume_request(client)
+        except QuotaExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    result = await embedding_batcher.embed(provider_name, texts, request.model)
+    if not result.get("success", False):
+        error = UpstreamError.from_result(result)
+        logger.error(f"Embedding failed with {provider_name}: {result.get('error')}")
+        if error.category == QUOTA:
+            retry_after = math.ceil(error.retry_after or 1)
+            raise HTTPException(status_code=429, detail=f"{provider_name} is rate limited", headers={"Retry-After": str(retry_after)})
+        if error.category == CLIENT:
+            raise HTTPException(status_code=400, detail=f"Request rejected by {provider_name}: {error}")
+        raise HTTPException(status_code=500, detail=f"Embedding failed: {result.get('error', 'Unknown error')}")
+    
+    # Upstream usage covers a whole coalesced batch, so each request's share is estimated locally
+    prompt_tokens = sum(estimate_tokens(text) for text in texts)
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": 0, "cached_tokens": 0, "total_tokens": prompt_tokens}
+    cost = usage_tracker.record(result["provider"], result["model"], client_id, usage, result["latency"])
+    if client:
+        quota_tracker.record_tokens(client, prompt_tokens)
+    
+    return FastJSONResponse({
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": index, "embedding": encode_embedding(vector, request.encoding_format)}
+            for index, vector in enumerate(result["embeddings"])
+        ],
+        "model": result["model"],
+        "provider": result["provider"],
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        "cost": cost,
+        "latency": result["latency"]
+    })
+
+def run_job_item(job: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+    """Generate one job prompt through routing and fallback, accounting usage to the job's client"""
+    route = routing_table.route(job["model"], job["provider"])
+    result = fallback_handler.process_request(
+        prompt=prompt,
+        model=job["model"],
+        provider_order=route.providers,
+        provider_models=route.models,
+        client_id=job["client"],
+        # Jobs get a small share of provider slots while interactive callers are waiting for them
+        client_weight=float(jobs_config.get("client_weight", 0.25)),
+        **job["parameters"]
+    )
+    if result.get("success", False):
+        usage = result.get("usage")
+        result["cost"] = usage_tracker.record(result["provider"], result["model"], job["client"], usage, result["latency"])
+        client = client_registry.clients.get(job["client"])
+        if client and usage:
+            quota_tracker.record_tokens(client, usage.get("total_tokens", 0))
+    return result
+
+def require_jobs() -> JobStore:
+    """Reject job requests unless the job runner is enabled"""
+    if job_store is None:
+        raise HTTPException(status_code=404, detail="Jobs are not enabled")
+    return job_store
+
+# Job endpoints
+@app.post("/jobs", status_code=202)
+async def submit_job(job_request: JobRequest, http_request: Request, store: JobStore = Depends(require_jobs)):
+    """Queue a set of prompts to be generated in the background"""
+    client, client_id, _ = identify_client(http_request)
+    max_prompts = int(jobs_config.get("max_prompts", 10000))
+    if len(job_request.prompts) > max_prompts:
+        raise HTTPException(status_code=413, detail=f"A job can hold at most {max_prompts} prompts")
+    if job_request.webhook_url:
+        try:
+            await run_in_threadpool(check_webhook_url, job_request.webhook_url, job_runner.webhook_hosts)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if client:
+        # Every prompt is a request against the client's quotas; items are not charged again when they run
+        try:
+            quota_tracker.consume_request(client, len(job_request.prompts))
+        except QuotaExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    parameters = {"temperature": job_request.temperature, "max_tokens": job_request.max_tokens,
+                  "top_p": job_request.top_p, "top_k": job_request.top_k}
+    job = await run_in_threadpool(
+        store.create, client_id, job_request.prompts, job_request.model,
+        job_request.provider.lower() if job_request.provider else None, parameters, job_request.webhook_url
+    )
+    job_runner.notify()
+    logger.info(f"Job {job['id']} queued for {client_id}: {job['total']} prompts")
+    return describe_job(job)
+
+@app.get("/jobs")
+async def list_jobs(http_request: Request, status: Optional[str] = None, limit: int = 100,
+                    store: JobStore = Depends(require_jobs)):
+    """List the caller's most recent jobs"""
+    _, client_id, _ = identify_client(http_request)
+    if status is not None and status not in JOB_STATES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(JOB_STATES)}")
+    jobs = await run_in_threadpool(store.list_jobs, client_id, status, max(1, min(limit, 1000)))
+    return {"jobs": [describe_job(job) for job in jobs]}
+
+def get_client_job(store: JobStore, job_id: str, http_request: Request) -> Dict[str, Any]:
+    """Get one of the caller's jobs, as a 404 if it belongs to someone else"""
+    _, client_id, _ = identify_client(http_request)
+    job = store.get(job_id, client_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, http_request: Request, store: JobStore = Depends(require_jobs)):
+    """Get a job's progress"""
+    return describe_job(get_client_job(store, job_id, http_request))
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, http_request: Request, offset: int = 0, limit: int = 100,
+                          store: JobStore = Depends(require_jobs)):
+    """Get a page of a job's item results in submission order"""
+    job = get_client_job(store, job_id, http_request)
+    results = await run_in_threadpool(store.results, job_id, max(0, offset), max(1, min(limit, 1000)))
+    return {"job": describe_job(job), "offset": offset, "results": results}
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, http_request: Request, store: JobStore = Depends(require_jobs)):
+    """Cancel a job; prompts already running still finish"""
+    get_client_job(store, job_id, http_request)
+    if not job_runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has already finished")
+    return describe_job(store.get(job_id))
 
 # Status endpoint
 @app.get("/status", response_model=StatusResponse)
@@ -161,9 +839,92 @@ async def status():
     return {
         "status": "ok",
         "uptime": uptime,
-        "providers": provider_status
+        "providers": provider_status,
+        "usage": usage_tracker.get_summary(),
+        "admission": {**admission_controller.get_status(), "providers": fallback_handler.provider_slots.get_status() if fallback_handler else {}},
+        "clients": {name: quota_tracker.get_usage(c) for name, c in client_registry.clients.items()},
+        "cache": semantic_cache.get_status() if semantic_cache else {},
+        "warmup": connection_warmer.get_status() if connection_warmer else {},
+        "health": health_checker.get_status() if health_checker else {},
+        "shadow": shadow_mirror.get_status() if shadow_mirror else {},
+        "jobs": job_runner.get_status() if job_runner else {},
+        "embeddings": embedding_batcher.get_status() if embedding_batcher else {},
+        "json_backend": JSON_BACKEND
     }
 
+# Readiness endpoint
+@app.get("/ready")
+async def ready():
+    """Report whether the server should receive traffic; not ready while starting or shutting down"""
+    status = shutdown_controller.get_status()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Metrics endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Get metrics in Prometheus text format"""
+    return PlainTextResponse(get_registry().render(), media_type="text/plain; version=0.0.4")
+
+# Chaos endpoints
+@app.get("/admin/chaos", dependencies=[Depends(require_admin)])
+async def get_chaos():
+    """Get active fault injection profiles"""
+    return chaos_controller.get_status()
+
+@app.put("/admin/chaos/{provider_name}", dependencies=[Depends(require_admin)])
+async def enable_chaos(provider_name: str, profile: Dict[str, Any]):
+    """Enable or update fault injection for a provider"""
+    try:
+        fault_profile = FaultProfile.from_dict(profile)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid fault profile: {e}")
+    if not chaos_controller.enable(provider_name, fault_profile):
+        raise HTTPException(status_code=404, detail=f"Provider {provider_name} not found")
+    return chaos_controller.get_status()
+
+@app.delete("/admin/chaos/{provider_name}", dependencies=[Depends(require_admin)])
+async def disable_chaos(provider_name: str):
+    """Disable fault injection for a provider"""
+    if not chaos_controller.disable(provider_name):
+        raise HTTPException(status_code=404, detail=f"Chaos mode is not enabled for {provider_name}")
+    return chaos_controller.get_status()
+
+# Routing endpoints
+@app.get("/admin/routing", dependencies=[Depends(require_admin)])
+async def get_routing():
+    """Get the compiled routing table and model downgrade policy"""
+    return {**routing_table.to_dict(), "downgrade": downgrade_policy.get_status() if downgrade_policy else None}
+
+@app.post("/admin/routing/reload", dependencies=[Depends(require_admin)])
+async def reload_routing():
+    """Recompile the routing table from the provider order and `routing` section of providers.yaml"""
+    global routing_table, downgrade_policy
+    try:
+        config = config_manager.reload()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    routing_table = RoutingTable.from_config(provider_factory, config_manager.get_provider_order(), config.get("routing"))
+    downgrade_policy = DowngradePolicy.from_config((config.get("routing") or {}).get("downgrade"), provider_factory,
+                                                   fallback_handler.provider_slots)
+    logger.info("Routing table reloaded")
+    return await get_routing()
+
+# Profiling endpoint
+@app.post("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 10.0, interval_ms: float = 5.0, include_idle: bool = False):
+    """Sample all server threads and return collapsed stacks for flamegraph tools"""
+    max_seconds = float(config_manager.config.get("profiling", {}).get("max_seconds", 60))
+    if not 0 < seconds <= max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {max_seconds}")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+    
+    try:
+        profiler = await run_in_threadpool(run_profile, seconds, interval_ms / 1000.0, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
+
 # Store startup time
 startup_time = time.time()
 
@@ -179,8 +940,11 @@ def main():
     port = server_config.get("port", 8000)
     log_level = server_config.get("log_level", "info")
     
-    # Run server
-    uvicorn.run("ii_agent_mcp_mvp.main:app", host=host, port=port, log_level=log_level, reload=True)
+    # Run server; the reloader restarts the process on code changes, so it cannot drain
+    if server_config.get("reload", False):
+        uvicorn.run("ii_agent_mcp_mvp.main:app", host=host, port=port, log_level=log_level, reload=True)
+        return
+    serve(app, shutdown_controller, host=host, port=port, log_level=log_level)
 
 if __name__ == "__main__":
     main()
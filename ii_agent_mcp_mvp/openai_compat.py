@@ -0,0 +1,160 @@
+"""
+II-Agent MCP Server Add-On - OpenAI-Compatible API
+Translates OpenAI chat completion requests into provider calls, and results
+and streams back into chat completion responses and server-sent events
+"""
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .tokens import estimate_tokens
+from .utils.jsonlib import dumps
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Roles passed to providers; OpenAI's "developer" role is a system message
+MESSAGE_ROLES = {"system": "system", "developer": "system", "user": "user", "assistant": "assistant"}
+
+# OpenAI error type for each response status; anything else is a server error
+ERROR_TYPES = {400: "invalid_request_error", 401: "authentication_error", 403: "permission_error",
+               404: "not_found_error", 413: "invalid_request_error", 422: "invalid_request_error",
+               429: "rate_limit_error"}
+
+# Owner shown by /v1/models for model aliases defined in routing
+ALIAS_OWNER = "ii-agent-mcp"
+
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Reduce chat messages to roles and text content, raising ValueError for what providers cannot take"""
+    normalized = []
+    for message in messages:
+        role = MESSAGE_ROLES.get(message.get("role"))
+        if role is None:
+            raise ValueError(f"Unsupported message role: {message.get('role')}")
+        content = message.get("content")
+        if isinstance(content, list):
+            # Content parts; only text parts can be translated for every provider
+            if any(part.get("type") != "text" for part in content):
+                raise ValueError("Only text content parts are supported")
+            content = "".join(part.get("text", "") for part in content)
+        normalized.append({"role": role, "content": content or ""})
+    if not any(message["role"] == "user" for message in normalized):
+        raise ValueError("messages must include a user message")
+    return normalized
+
+
+def messages_to_prompt(messages: List[Dict[str, str]]) -> str:
+    """Flatten messages into one text, for token estimates and logs"""
+    return "\n\n".join(message["content"] for message in messages)
+
+
+def new_completion_id() -> str:
+    return f"chatcmpl-{uuid.uuid4().hex}"
+
+
+def openai_usage(usage: Optional[Dict[str, int]], prompt: str, completion: str) -> Dict[str, int]:
+    """Get usage in OpenAI's shape, estimating the counts when the provider reported none"""
+    if usage:
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "prompt_tokens_details": {"cached_tokens": usage.get("cached_tokens", 0)}
+        }
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def completion_response(result: Dict[str, Any], prompt: str, completion_id: str,
+                        created: Optional[int] = None) -> Dict[str, Any]:
+    """Build a chat.completion response from a generation result"""
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created or int(time.time()),
+        "model": result["model"],
+        "provider": result["provider"],
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": result["text"]},
+            "finish_reason": result.get("finish_reason") or "stop"
+        }],
+        "usage": openai_usage(result.get("usage"), prompt, result["text"])
+    }
+
+
+def sse(payload: Any) -> bytes:
+    """Encode one server-sent event"""
+    return b"data: " + dumps(payload) + b"\n\n"
+
+
+def stream_chunks(result: Dict[str, Any], prompt: str, completion_id: str, include_usage: bool = False,
+                  on_finish: Optional[Callable[[Dict[str, int]], None]] = None) -> Iterator[bytes]:
+    """Translate a streamed generation result into chat.completion.chunk events
+
+    on_finish is called with the provider's usage, or an estimate, once the stream has ended;
+    a stream that fails midway ends with an error event and no [DONE].
+    """
+    created = int(time.time())
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": result["model"],
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    pieces = []
+    usage = None
+    finish_reason = "stop"
+    stream = result["stream"]
+    try:
+        yield sse(chunk({"role": "assistant", "content": ""}))
+        for event in stream:
+            if event.get("text"):
+                pieces.append(event["text"])
+                yield sse(chunk({"content": event["text"]}))
+            usage = event.get("usage") or usage
+            finish_reason = event.get("finish_reason") or finish_reason
+    except Exception as e:
+        logger.error(f"Stream from {result['provider']} failed: {e}")
+        yield sse({"error": {"message": f"Stream from {result['provider']} ended early", "type": "server_error"}})
+        return
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+    yield sse(chunk({}, finish_reason))
+    final_usage = openai_usage(usage, prompt, "".join(pieces))
+    if include_usage:
+        yield sse({**chunk({}), "choices": [], "usage": final_usage})
+    yield b"data: [DONE]\n\n"
+    if on_finish is not None:
+        on_finish(usage or {**final_usage, "cached_tokens": 0})
+
+
+def model_list(routing_table, provider_factory) -> List[Dict[str, Any]]:
+    """List every provider model and routing alias as OpenAI model objects"""
+    models = []
+    seen = set()
+    for provider_name in routing_table.provider_order:
+        provider = provider_factory.get_provider(provider_name)
+        for model in (provider.models if provider else []) or []:
+            if model not in seen:
+                seen.add(model)
+                models.append({"id": model, "object": "model", "created": 0, "owned_by": provider_name})
+    for alias in routing_table.aliases:
+        if alias not in seen:
+            seen.add(alias)
+            models.append({"id": alias, "object": "model", "created": 0, "owned_by": ALIAS_OWNER})
+    return models
+
+
+def error_body(status_code: int, message: str) -> Dict[str, Any]:
+    """Build an error response body in OpenAI's shape"""
+    return {"error": {"message": message, "type": ERROR_TYPES.get(status_code, "server_error"), "param": None,
+                      "code": status_code}}
@@ -2,22 +2,60 @@
 II-Agent MCP Server Add-On - Provider Base Module
 Defines the abstract base class for all providers
 """
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
+
+import requests
+
+from .errors import UpstreamError, TRANSIENT, parse_retry_after
+from .keys import ApiKey, KeyPool
+from ..cancellation import CancellableHTTPAdapter
+from ..compression import compress
+from ..utils.jsonlib import dumps, loads
+from ..utils.profiling import stage
+from ..utils.tracing import get_tracer
 
 
 class AbstractProvider(ABC):
     """Abstract base class for all model providers"""
     
-    def __init__(self, api_key: str, models: Optional[List[str]] = None):
-        """Initialize the provider with API key and optional model list"""
+    BASE_URL = ""
+    
+    # Content-Encoding for upstream request bodies, only for endpoints known to accept it
+    request_compression: Optional[str] = None
+    request_compression_min_size = 1024
+    
+    # Connections kept open per provider so concurrent requests reuse established TLS sessions
+    connection_pool_size = 32
+    
+    # Embedding model used when a request names none, and the most texts one upstream call accepts;
+    # providers without an embeddings API leave the model unset
+    EMBEDDING_MODEL: Optional[str] = None
+    max_embedding_batch = 1
+    
+    def __init__(self, api_key: str, models: Optional[List[str]] = None, base_url: Optional[str] = None):
+        """Initialize the provider with API key, optional model list and optional endpoint override"""
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/")
         self.api_key = api_key
         self.models = models or []
         self.name = self.__class__.__name__.lower().replace('provider', '')
         self.request_count = 0
         self.failure_count = 0
-        self.rate_limit_remaining = None
+        self.key_pool = KeyPool([ApiKey(api_key or "")])
+        self.last_request_time = 0.0
+        self.session = self._create_session()
         
+    def set_api_keys(self, api_keys: List[Any], strategy: str = "weighted_round_robin", park_seconds: float = 30.0) -> None:
+        """Spread requests across api_key and additional keys"""
+        self.key_pool = KeyPool.from_config(self.api_key, api_keys, strategy, park_seconds)
+    
+    @property
+    def rate_limit_remaining(self) -> Optional[int]:
+        """Requests left before the provider is rate limited, read live so parked keys count again once unparked"""
+        return self.key_pool.rate_limit_remaining
+    
     @abstractmethod
     def validate_api_key(self) -> bool:
         """Validate the API key with the provider"""
@@ -33,6 +71,48 @@ class AbstractProvider(ABC):
         """Generate text from the specified model"""
         pass
     
+    def generate_stream(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
+        """Start a streamed generation, returning a result whose stream yields events with text pieces,
+        usage and the finish reason; providers without a streaming API answer in a single event"""
+        result = self.generate(prompt, model, **kwargs)
+        if result.get("success", False):
+            result["stream"] = iter([{"text": result.get("text", ""), "usage": result.get("usage"), "finish_reason": "stop"}])
+        return result
+    
+    @property
+    def supports_embeddings(self) -> bool:
+        """Whether the provider has an embeddings API"""
+        return self.EMBEDDING_MODEL is not None
+    
+    def embed(self, texts: List[str], model: Optional[str] = None) -> Dict[str, Any]:
+        """Embed up to max_embedding_batch texts in one upstream call, returning a vector per text in order"""
+        raise NotImplementedError(f"{self.__class__.__name__} has no embeddings endpoint")
+    
+    def _list_models(self, timeout: float = 10) -> requests.Response:
+        """Call the provider's model-listing endpoint, used as a cheap health check"""
+        raise NotImplementedError(f"{self.__class__.__name__} has no model-listing endpoint")
+    
+    def check_health(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """Call the model-listing endpoint, returning availability, latency and any error"""
+        start = time.perf_counter()
+        try:
+            response = self._list_models(timeout)
+            # A rate-limited listing still shows the provider is up and the key is valid
+            healthy = response.status_code in (200, 429)
+            error = None if healthy else f"API Error: {response.status_code}"
+        except Exception as e:
+            # Connection errors quote the URL, which may carry the API key as a parameter
+            healthy, error = False, f"Exception: {self._redact(str(e))}"
+        return {"healthy": healthy, "latency": time.perf_counter() - start, "error": error}
+    
+    def resolve_model(self, model: str) -> str:
+        """Map a requested model name onto a concrete model for this provider"""
+        return model
+    
+    def close(self) -> None:
+        """Close pooled upstream connections"""
+        self.session.close()
+    
     def get_status(self) -> Dict[str, Any]:
         """Get the current status of the provider"""
         return {
@@ -41,7 +121,8 @@ class AbstractProvider(ABC):
             "request_count": self.request_count,
             "failure_count": self.failure_count,
             "success_rate": self._calculate_success_rate(),
-            "rate_limit_remaining": self.rate_limit_remaining
+            "rate_limit_remaining": self.rate_limit_remaining,
+            "api_keys": self.key_pool.get_status()
         }
     
     def _calculate_success_rate(self) -> float:
@@ -55,3 +136,105 @@ class AbstractProvider(ABC):
         self.request_count += 1
         if not success:
             self.failure_count += 1
+    
+    def _create_session(self) -> requests.Session:
+        """Create the HTTP session shared by every request to this provider"""
+        session = requests.Session()
+        # Requests made inside a cancellation scope are aborted when their client disconnects
+        adapter = CancellableHTTPAdapter(pool_connections=1, pool_maxsize=self.connection_pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def _redact(self, text: str) -> str:
+        """Hide every API key in the pool from a message"""
+        for key in self.key_pool.keys:
+            if key.value:
+                text = text.replace(key.value, "***")
+        return text
+    
+    def _record_rate_limit(self, key: ApiKey, response: requests.Response) -> None:
+        """Record a response's rate limit headers and 429s against the key that sent it"""
+        remaining = response.headers.get("x-ratelimit-remaining")
+        # Without a usable Retry-After the pool parks the key for its default time
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        self.key_pool.record(key, response.status_code, int(remaining) if remaining is not None else None, retry_after)
+    
+    def _upstream_error(self, response: requests.Response) -> UpstreamError:
+        """Classify a failed response; providers whose error bodies change the class override this"""
+        return UpstreamError.from_response(response)
+    
+    def _failure(self, error: UpstreamError, start_time: float) -> Dict[str, Any]:
+        """Build a failed generation result carrying the classified error"""
+        self._update_metrics(False)
+        return {
+            "success": False,
+            "error": str(error),
+            "upstream_error": error,
+            "response": error.message,
+            "latency": time.time() - start_time
+        }
+    
+    def _exception_failure(self, e: Exception, start_time: float) -> Dict[str, Any]:
+        """Build a failed generation result for a dropped connection, timeout or bad response"""
+        # Connection errors quote the URL, which may carry the API key as a parameter
+        return self._failure(UpstreamError(TRANSIENT, message=self._redact(str(e))), start_time)
+    
+    def _build_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int],
+                     cached_tokens: Optional[int] = None, total_tokens: Optional[int] = None) -> Dict[str, int]:
+        """Build a normalized token usage dict from upstream counts"""
+        prompt_tokens = int(prompt_tokens or 0)
+        completion_tokens = int(completion_tokens or 0)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": int(cached_tokens or 0),
+            "total_tokens": int(total_tokens or prompt_tokens + completion_tokens)
+        }
+    
+    def _post_json(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                   timeout: float = 30, stream: bool = False) -> requests.Response:
+        """POST a JSON payload upstream, recording an http.request span; with stream the body is left unread"""
+        with stage("payload_build"):
+            body = dumps(payload)
+        headers = {**(headers or {}), "Content-Type": "application/json"}
+        if self.request_compression and len(body) >= self.request_compression_min_size:
+            body = compress(body, self.request_compression, direction="upstream")
+            headers["Content-Encoding"] = self.request_compression
+        attributes = {
+            "provider": self.name,
+            "http.method": "POST",
+            # Drop the query string so API keys passed as parameters are never recorded
+            "http.url": url.split("?", 1)[0],
+            "http.request_bytes": len(body)
+        }
+        tracer = get_tracer()
+        with tracer.span("http.request", attributes, kind="client") as span:
+            # Continue the trace upstream, with this request's span as the parent
+            tracer.inject(headers)
+            with stage("upstream_wait"):
+                response = self.session.post(url, data=body, headers=headers, timeout=timeout, stream=stream)
+            self.last_request_time = time.monotonic()
+            span.set_attribute("http.status_code", response.status_code)
+            if not stream:
+                span.set_attribute("http.response_bytes", len(response.content))
+            span.set_status(response.status_code < 400)
+            return response
+    
+    def _decode_json(self, response: requests.Response) -> Any:
+        """Decode a JSON response body, recording a json.decode span"""
+        with get_tracer().span("json.decode", {"provider": self.name, "bytes": len(response.content)}), stage("response_parse"):
+            return loads(response.content)
+    
+    def _iter_events(self, response: requests.Response) -> Iterator[Dict[str, Any]]:
+        """Decode the JSON payloads of a server-sent event stream, closing the response when done"""
+        try:
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[len(b"data:"):].strip()
+                if data == b"[DONE]":
+                    break
+                yield loads(data)
+        finally:
+            response.close()
@@ -0,0 +1,321 @@
+"""
+II-Agent MCP Server Add-On - Fault Injection Provider
+Wraps any provider with configurable latency and failures for chaos testing
+"""
+import math
+import random
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .base import AbstractProvider
+from .errors import UpstreamError, TRANSIENT
+from ..utils.metrics import get_registry, MetricsRegistry
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Failure modes that can be injected, in the order they are rolled
+FAULT_TYPES = ("rate_limit", "error", "reset", "partial")
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class FaultProfile:
+    """Describes the latency and failures injected into a provider"""
+
+    def __init__(self, latency: Optional[Dict[str, Any]] = None, error_rate: float = 0.0,
+                 error_codes: Optional[List[int]] = None, reset_rate: float = 0.0, partial_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, rate_limit_remaining: int = 0, retry_after: float = 1.0):
+        """Initialize the profile; rates are probabilities per request"""
+        self.latency = latency or {}
+        self.error_rate = error_rate
+        self.error_codes = error_codes or [500, 502, 503]
+        self.reset_rate = reset_rate
+        self.partial_rate = partial_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_remaining = rate_limit_remaining
+        self.retry_after = retry_after
+
+        distribution = self.latency.get("distribution", "fixed")
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        total = error_rate + reset_rate + partial_rate + rate_limit_rate
+        if total > 1.0:
+            raise ValueError(f"Fault rates add up to {total}, which is more than 1")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FaultProfile":
+        """Create a profile from a config or request body dict"""
+        return cls(
+            latency=data.get("latency"),
+            error_rate=float(data.get("error_rate", 0.0)),
+            error_codes=data.get("error_codes"),
+            reset_rate=float(data.get("reset_rate", 0.0)),
+            partial_rate=float(data.get("partial_rate", 0.0)),
+            rate_limit_rate=float(data.get("rate_limit_rate", 0.0)),
+            rate_limit_remaining=int(data.get("rate_limit_remaining", 0)),
+            retry_after=float(data.get("retry_after", 1.0))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the profile as a dict"""
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "error_codes": self.error_codes,
+            "reset_rate": self.reset_rate,
+            "partial_rate": self.partial_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "rate_limit_remaining": self.rate_limit_remaining,
+            "retry_after": self.retry_after
+        }
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Sample an injected delay in seconds"""
+        latency = self.latency
+        if not latency:
+            return 0.0
+
+        distribution = latency.get("distribution", "fixed")
+        if distribution == "fixed":
+            delay = float(latency.get("value", 0.0))
+        elif distribution == "uniform":
+            delay = rng.uniform(float(latency.get("min", 0.0)), float(latency.get("max", 0.0)))
+        elif distribution == "exponential":
+            mean = float(latency.get("mean", 0.0))
+            delay = rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+        else:
+            median = float(latency.get("median", 0.0))
+            delay = rng.lognormvariate(math.log(median), float(latency.get("sigma", 0.5))) if median > 0 else 0.0
+
+        if "max_delay" in latency:
+            delay = min(delay, float(latency["max_delay"]))
+        return max(0.0, delay)
+
+    def sample_fault(self, rng: random.Random) -> Optional[str]:
+        """Pick the fault to inject for a request, or None"""
+        roll = rng.random()
+        for fault in FAULT_TYPES:
+            rate = getattr(self, f"{fault}_rate")
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+
+class FaultInjectingProvider(AbstractProvider):
+    """Provider wrapper that injects latency and failures before delegating"""
+
+    def __init__(self, inner: AbstractProvider, profile: FaultProfile, seed: Optional[int] = None,
+                 registry: Optional[MetricsRegistry] = None):
+        """Wrap a provider; state such as metrics and rate limits stays on the inner provider"""
+        # The base initializer is not called so counters are not duplicated
+        self.inner = inner
+        self.profile = profile
+        self.name = inner.name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        registry = registry or get_registry()
+        self._faults = registry.counter("mcp_chaos_faults_total", "Faults injected by chaos mode")
+        self._injected_delay = registry.counter("mcp_chaos_delay_seconds_total", "Latency injected by chaos mode")
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything not overridden to the wrapped provider"""
+        return getattr(self.inner, name)
+
+    # Class attributes defined on AbstractProvider are found before __getattr__, so they are forwarded explicitly
+    @property
+    def BASE_URL(self) -> str:
+        return self.inner.BASE_URL
+
+    @property
+    def EMBEDDING_MODEL(self) -> Optional[str]:
+        return self.inner.EMBEDDING_MODEL
+
+    @property
+    def max_embedding_batch(self) -> int:
+        return self.inner.max_embedding_batch
+
+    @property
+    def request_compression(self) -> Optional[str]:
+        return self.inner.request_compression
+
+    @property
+    def request_compression_min_size(self) -> int:
+        return self.inner.request_compression_min_size
+
+    @property
+    def connection_pool_size(self) -> int:
+        return self.inner.connection_pool_size
+
+    def validate_api_key(self) -> bool:
+        """Validate the API key with the wrapped provider"""
+        return self.inner.validate_api_key()
+
+    def discover_models(self) -> List[str]:
+        """Discover models with the wrapped provider"""
+        return self.inner.discover_models()
+
+    def resolve_model(self, model: str) -> str:
+        """Resolve models with the wrapped provider"""
+        return self.inner.resolve_model(model)
+
+    def check_health(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """Check health with the wrapped provider; faults only apply to generations"""
+        return self.inner.check_health(timeout)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the wrapped provider's status with the active fault profile"""
+        status = self.inner.get_status()
+        status["chaos"] = self.profile.to_dict()
+        return status
+
+    def _failure(self, error: UpstreamError, start_time: float, **extra) -> Dict[str, Any]:
+        """Build a failure result shaped like a real provider failure"""
+        return {**self.inner._failure(error, start_time), **extra}
+
+    def _inject(self, start_time: float) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Sleep for the sampled latency and pick a fault, returning it with the failure for faults that
+        never reach the upstream"""
+        with self._lock:
+            delay = self.profile.sample_latency(self._random)
+            fault = self.profile.sample_fault(self._random)
+            error_code = self._random.choice(self.profile.error_codes)
+
+        labels = {"provider": self.name}
+        if delay:
+            self._injected_delay.inc(delay, labels)
+            time.sleep(delay)
+
+        if fault is None:
+            return None, None
+
+        self._faults.inc(1, {**labels, "fault": fault})
+        logger.debug(f"Injecting {fault} fault into {self.name}")
+
+        if fault == "rate_limit":
+            # Record the limit against the inner provider's keys like a real 429, so the headroom recovers after Retry-After
+            key_pool = self.inner.key_pool
+            for key in key_pool.keys:
+                key_pool.record(key, 200 if self.profile.rate_limit_remaining else 429,
+                                self.profile.rate_limit_remaining, self.profile.retry_after)
+            return fault, self._failure(UpstreamError.from_status(429, self.profile.retry_after,
+                                                                  "Rate limit exceeded (injected)"),
+                                        start_time, retry_after=self.profile.retry_after)
+        if fault == "error":
+            return fault, self._failure(UpstreamError.from_status(error_code, message=f"Injected upstream error {error_code}"),
+                                        start_time)
+        if fault == "reset":
+            return fault, self._failure(UpstreamError(TRANSIENT, message="Connection reset by peer (injected)"), start_time)
+        return fault, None
+
+    def generate(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
+        """Generate text, injecting the sampled latency and fault"""
+        start_time = time.time()
+        fault, failure = self._inject(start_time)
+        if failure is not None:
+            return failure
+
+        result = self.inner.generate(prompt, model, **kwargs)
+        if fault is None or not result.get("success", False):
+            return result
+        # Partial stream: the upstream does the work but the body is cut off
+        return self._failure(UpstreamError(TRANSIENT, message="Response ended prematurely (injected)"), start_time,
+                             partial_text=result.get("text", "")[:len(result.get("text", "")) // 2])
+
+    def generate_stream(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
+        """Start a streamed generation, injecting the sampled latency and fault"""
+        start_time = time.time()
+        fault, failure = self._inject(start_time)
+        if failure is not None:
+            return failure
+
+        result = self.inner.generate_stream(prompt, model, **kwargs)
+        if fault is None or not result.get("success", False):
+            return result
+        # Partial stream: the connection drops after the first piece, once the response has already started
+        result["stream"] = self._drop_stream(result["stream"])
+        return result
+
+    @staticmethod
+    def _drop_stream(stream: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield the first event's text, then fail like a connection reset mid-response"""
+        try:
+            for event in stream:
+                if event.get("text"):
+                    yield {"text": event["text"]}
+                    break
+            raise ConnectionError("Connection reset mid-stream (injected)")
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+
+    def embed(self, texts: List[str], model: Optional[str] = None) -> Dict[str, Any]:
+        """Embed texts, injecting the sampled latency and fault"""
+        start_time = time.time()
+        fault, failure = self._inject(start_time)
+        if failure is not None:
+            return failure
+
+        result = self.inner.embed(texts, model)
+        if fault is None or not result.get("success", False):
+            return result
+        # A cut-off body holds no usable vectors, but the upstream still did the work
+        return self._failure(UpstreamError(TRANSIENT, message="Response ended prematurely (injected)"), start_time)
+
+
+class ChaosController:
+    """Enables and disables fault injection on a running provider factory"""
+
+    def __init__(self, provider_factory, seed: Optional[int] = None):
+        """Initialize the controller for a provider factory"""
+        self.provider_factory = provider_factory
+        self.seed = seed
+
+    def enable(self, provider_name: str, profile: FaultProfile) -> bool:
+        """Wrap a provider with a fault profile, or update the profile if already wrapped"""
+        provider_name = provider_name.lower()
+        provider = self.provider_factory.providers.get(provider_name)
+        if provider is None:
+            return False
+
+        if isinstance(provider, FaultInjectingProvider):
+            provider.profile = profile
+        else:
+            self.provider_factory.providers[provider_name] = FaultInjectingProvider(provider, profile, self.seed)
+        logger.warning(f"Chaos mode enabled for {provider_name}: {profile.to_dict()}")
+        return True
+
+    def disable(self, provider_name: str) -> bool:
+        """Remove fault injection from a provider"""
+        provider_name = provider_name.lower()
+        provider = self.provider_factory.providers.get(provider_name)
+        if not isinstance(provider, FaultInjectingProvider):
+            return False
+
+        self.provider_factory.providers[provider_name] = provider.inner
+        logger.warning(f"Chaos mode disabled for {provider_name}")
+        return True
+
+    def disable_all(self) -> None:
+        """Remove fault injection from every provider"""
+        for provider_name in list(self.provider_factory.providers):
+            self.disable(provider_name)
+
+    def apply_config(self, config: Optional[Dict[str, Any]]) -> None:
+        """Apply the `chaos` section of providers.yaml"""
+        config = config or {}
+        if not config.get("enabled", False):
+            return
+        for provider_name, profile in (config.get("providers") or {}).items():
+            self.enable(provider_name, FaultProfile.from_dict(profile))
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the active fault profiles by provider"""
+        return {
+            name: provider.profile.to_dict()
+            for name, provider in self.provider_factory.providers.items()
+            if isinstance(provider, FaultInjectingProvider)
+        }
@@ -4,9 +4,10 @@ Implements the DeepSeek API provider
 """
 import time
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 
 from .base import AbstractProvider
+from .errors import UpstreamError
 
 
 class DeepSeekProvider(AbstractProvider):
@@ -14,17 +15,21 @@ class DeepSeekProvider(AbstractProvider):
     
     BASE_URL = "https://api.deepseek.com/v1"
     
-    def __init__(self, api_key: str, models: Optional[List[str]] = None):
+    def __init__(self, api_key: str, models: Optional[List[str]] = None, base_url: Optional[str] = None):
         """Initialize the DeepSeek provider with API key and optional model list"""
-        super().__init__(api_key, models)
+        super().__init__(api_key, models, base_url)
         if not models:
             self.models = self.discover_models()
     
+    def _list_models(self, timeout: float = 10) -> requests.Response:
+        """Call the model-listing endpoint"""
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        return self.session.get(f"{self.BASE_URL}/models", headers=headers, timeout=timeout)
+    
     def validate_api_key(self) -> bool:
         """Validate the API key with DeepSeek API"""
         try:
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            response = requests.get(f"{self.BASE_URL}/models", headers=headers, timeout=10)
+            response = self._list_models()
             
             if response.status_code == 200:
                 return True
@@ -35,8 +40,7 @@ class DeepSeekProvider(AbstractProvider):
     def discover_models(self) -> List[str]:
         """Discover available models from DeepSeek API"""
         try:
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            response = requests.get(f"{self.BASE_URL}/models", headers=headers, timeout=10)
+            response = self._list_models()
             
             if response.status_code != 200:
                 return []
@@ -59,48 +63,37 @@ class DeepSeekProvider(AbstractProvider):
             # Return default models on error
             return ["deepseek-chat", "deepseek-coder"]
     
+    def resolve_model(self, model: str) -> str:
+        """Ensure model name is properly formatted"""
+        if not model.startswith("deepseek-") and model not in self.models:
+            model = "deepseek-chat"
+        return model
+    
     def generate(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
         """Generate text using DeepSeek API"""
         start_time = time.time()
         
         try:
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            
-            # Ensure model name is properly formatted
-            if not model.startswith("deepseek-") and model not in self.models:
-                model = "deepseek-chat"
+            model = self.resolve_model(model)
             
             payload = {
                 "model": model,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
+                "messages": self._messages(prompt, kwargs),
                 "temperature": kwargs.get("temperature", 0.7),
                 "top_p": kwargs.get("top_p", 0.95),
                 "max_tokens": kwargs.get("max_tokens", 1024)
             }
             
-            response = requests.post(
-                f"{self.BASE_URL}/chat/completions", 
-                headers=headers, 
-                json=payload, 
-                timeout=30
-            )
-            
-            # Check for rate limiting headers
-            if "x-ratelimit-remaining" in response.headers:
-                self.rate_limit_remaining = int(response.headers["x-ratelimit-remaining"])
+            # Send with the next key from the pool, recording its rate limit state
+            with self.key_pool.use() as key:
+                headers = {"Authorization": f"Bearer {key.value}"}
+                response = self._post_json(f"{self.BASE_URL}/chat/completions", payload, headers, timeout=30)
+                self._record_rate_limit(key, response)
             
             if response.status_code != 200:
-                self._update_metrics(False)
-                return {
-                    "success": False,
-                    "error": f"API Error: {response.status_code}",
-                    "response": response.text,
-                    "latency": time.time() - start_time
-                }
+                return self._failure(self._upstream_error(response), start_time)
             
-            data = response.json()
+            data = self._decode_json(response)
             
             # Extract the generated text from the response
             generated_text = ""
@@ -115,13 +108,78 @@ class DeepSeekProvider(AbstractProvider):
                 "text": generated_text,
                 "model": model,
                 "provider": "deepseek",
+                "usage": self._extract_usage(data),
                 "latency": time.time() - start_time
             }
             
         except Exception as e:
-            self._update_metrics(False)
+            return self._exception_failure(e, start_time)
+    
+    def generate_stream(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
+        """Start a streamed generation using DeepSeek API"""
+        start_time = time.time()
+        
+        try:
+            model = self.resolve_model(model)
+            
+            payload = {
+                "model": model,
+                "messages": self._messages(prompt, kwargs),
+                "temperature": kwargs.get("temperature", 0.7),
+                "top_p": kwargs.get("top_p", 0.95),
+                "max_tokens": kwargs.get("max_tokens", 1024),
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            }
+            
+            with self.key_pool.use() as key:
+                headers = {"Authorization": f"Bearer {key.value}"}
+                response = self._post_json(f"{self.BASE_URL}/chat/completions", payload, headers, timeout=30, stream=True)
+                self._record_rate_limit(key, response)
+            
+            if response.status_code != 200:
+                return self._failure(self._upstream_error(response), start_time)
+            
+            self._update_metrics(True)
             return {
-                "success": False,
-                "error": f"Exception: {str(e)}",
+                "success": True,
+                "text": "",
+                "stream": self._stream_events(response),
+                "model": model,
+                "provider": "deepseek",
+                "usage": None,
                 "latency": time.time() - start_time
             }
+            
+        except Exception as e:
+            return self._exception_failure(e, start_time)
+    
+    def _stream_events(self, response: requests.Response) -> Iterator[Dict[str, Any]]:
+        """Translate streamed chunks into text pieces, usage and the finish reason"""
+        for data in self._iter_events(response):
+            event = {}
+            for choice in data.get("choices") or []:
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    event["text"] = content
+                if choice.get("finish_reason"):
+                    event["finish_reason"] = choice["finish_reason"]
+            if data.get("usage"):
+                event["usage"] = self._extract_usage(data)
+            if event:
+                yield event
+    
+    @staticmethod
+    def _messages(prompt: str, kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+        """The conversation to send: the caller's chat messages, or the prompt as a single user turn"""
+        return kwargs.get("messages") or [{"role": "user", "content": prompt}]
+    
+    def _extract_usage(self, data: Dict[str, Any]) -> Dict[str, int]:
+        """Extract token counts from the usage field, including context cache hits"""
+        usage = data.get("usage") or {}
+        return self._build_usage(
+            usage.get("prompt_tokens"),
+            usage.get("completion_tokens"),
+            usage.get("prompt_cache_hit_tokens"),
+            usage.get("total_tokens")
+        )
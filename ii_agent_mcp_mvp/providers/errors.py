@@ -0,0 +1,99 @@
+"""
+II-Agent MCP Server Add-On - Upstream Errors
+Typed upstream failures, so fallback decisions do not depend on error text
+"""
+import re
+from typing import Dict, Any, Optional
+
+# Error categories
+QUOTA = "quota"            # Rate limited or out of quota; another provider may serve the request
+TRANSIENT = "transient"    # Server errors, timeouts and dropped connections; worth retrying
+PROVIDER = "provider"      # This provider cannot serve the request (bad key, unknown model)
+CLIENT = "client"          # The request itself is invalid and would fail on every provider
+
+# Upstream bodies are kept only up to this size, for logs
+MAX_MESSAGE_LENGTH = 500
+
+PROVIDER_STATUSES = frozenset((401, 402, 403, 404))
+TRANSIENT_STATUSES = frozenset((408, 409, 425))
+
+# Failure strings produced by providers before errors were typed
+_LEGACY_STATUS = re.compile(r"^API Error: (\d{3})")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header in seconds; HTTP dates are not supported and give None"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class UpstreamError:
+    """A failed upstream call, classified once where it happens"""
+
+    __slots__ = ("category", "status_code", "retry_after", "message")
+
+    def __init__(self, category: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 message: str = ""):
+        """Initialize the error"""
+        self.category = category
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.message = message[:MAX_MESSAGE_LENGTH]
+
+    @classmethod
+    def from_status(cls, status_code: int, retry_after: Optional[float] = None, message: str = "") -> "UpstreamError":
+        """Classify an HTTP error status"""
+        if status_code == 429:
+            category = QUOTA
+        elif status_code >= 500 or status_code in TRANSIENT_STATUSES:
+            category = TRANSIENT
+        elif status_code in PROVIDER_STATUSES:
+            category = PROVIDER
+        else:
+            category = CLIENT
+        return cls(category, status_code, retry_after, message)
+
+    @classmethod
+    def from_response(cls, response) -> "UpstreamError":
+        """Classify a non-200 requests response"""
+        return cls.from_status(response.status_code, parse_retry_after(response.headers.get("Retry-After")),
+                               response.text[:MAX_MESSAGE_LENGTH])
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "UpstreamError":
+        """Get the error of a failed generation result, classifying results from untyped providers by their error string"""
+        error = result.get("upstream_error")
+        if isinstance(error, cls):
+            return error
+        match = _LEGACY_STATUS.match(str(result.get("error", "")))
+        if match:
+            return cls.from_status(int(match.group(1)), result.get("retry_after"), str(result.get("response", "")))
+        return cls(TRANSIENT, message=str(result.get("error", "")))
+
+    @property
+    def retryable(self) -> bool:
+        """Whether retrying the same provider may succeed"""
+        return self.category == TRANSIENT
+
+    @property
+    def fallback(self) -> bool:
+        """Whether another provider may succeed"""
+        return self.category != CLIENT
+
+    def __str__(self) -> str:
+        if self.status_code is not None:
+            return f"API Error: {self.status_code}"
+        return f"Exception: {self.message}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the error for failure details"""
+        return {
+            "category": self.category,
+            "status_code": self.status_code,
+            "retryable": self.retryable,
+            "retry_after": self.retry_after
+        }
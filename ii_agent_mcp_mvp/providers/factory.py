@@ -22,7 +22,8 @@ class ProviderFactory:
             "mistral": MistralProvider
         }
     
-    def create_provider(self, provider_name: str, api_key: str, models: Optional[List[str]] = None) -> Optional[AbstractProvider]:
+    def create_provider(self, provider_name: str, api_key: str, models: Optional[List[str]] = None,
+                        base_url: Optional[str] = None) -> Optional[AbstractProvider]:
         """Create a provider instance"""
         provider_name = provider_name.lower()
         
@@ -30,7 +31,7 @@ class ProviderFactory:
             return None
         
         provider_class = self.provider_classes[provider_name]
-        provider = provider_class(api_key, models)
+        provider = provider_class(api_key, models, base_url)
         
         # Store the provider instance
         self.providers[provider_name] = provider
@@ -4,27 +4,47 @@ Implements the Gemini API provider
 """
 import time
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 
 from .base import AbstractProvider
+from .errors import UpstreamError, CLIENT, PROVIDER
+from ..routing import DEFAULT_MODEL
+
+
+# Gemini answers 400 for some failures of the key or account rather than the request, so another
+# provider may still serve it; these are recognised by the error's status or ErrorInfo reason
+PROVIDER_ERROR_STATUSES = frozenset(("FAILED_PRECONDITION",))
+PROVIDER_ERROR_REASONS = frozenset(("API_KEY_INVALID", "API_KEY_EXPIRED", "API_KEY_SERVICE_BLOCKED", "SERVICE_DISABLED",
+                                    "CONSUMER_INVALID", "BILLING_DISABLED"))
+
+# Gemini finish reasons in OpenAI terms; any other reason is reported as "stop"
+FINISH_REASONS = {"STOP": "stop", "MAX_TOKENS": "length", "SAFETY": "content_filter", "RECITATION": "content_filter"}
 
 
 class GeminiProvider(AbstractProvider):
     """Provider implementation for Google's Gemini API"""
     
     BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+    # Model used for "default" when no models are configured or discovered
+    FALLBACK_MODEL = "gemini-1.5-flash"
+    EMBEDDING_MODEL = "text-embedding-004"
+    # batchEmbedContents accepts at most 100 requests per call
+    max_embedding_batch = 100
     
-    def __init__(self, api_key: str, models: Optional[List[str]] = None):
+    def __init__(self, api_key: str, models: Optional[List[str]] = None, base_url: Optional[str] = None):
         """Initialize the Gemini provider with API key and optional model list"""
-        super().__init__(api_key, models)
+        super().__init__(api_key, models, base_url)
         if not models:
             self.models = self.discover_models()
     
+    def _list_models(self, timeout: float = 10) -> requests.Response:
+        """Call the model-listing endpoint"""
+        return self.session.get(f"{self.BASE_URL}/models?key={self.api_key}", timeout=timeout)
+    
     def validate_api_key(self) -> bool:
         """Validate the API key with Gemini API"""
         try:
-            url = f"{self.BASE_URL}/models?key={self.api_key}"
-            response = requests.get(url, timeout=10)
+            response = self._list_models()
             
             if response.status_code == 200:
                 return True
@@ -35,8 +55,7 @@ class GeminiProvider(AbstractProvider):
     def discover_models(self) -> List[str]:
         """Discover available models from Gemini API"""
         try:
-            url = f"{self.BASE_URL}/models?key={self.api_key}"
-            response = requests.get(url, timeout=10)
+            response = self._list_models()
             
             if response.status_code != 200:
                 return []
@@ -56,51 +75,48 @@ class GeminiProvider(AbstractProvider):
             print(f"Error discovering Gemini models: {e}")
             return []
     
+    def _upstream_error(self, response: requests.Response) -> UpstreamError:
+        """Classify a failed response, treating 400s caused by the key or account as provider errors"""
+        error = UpstreamError.from_response(response)
+        if error.category != CLIENT:
+            return error
+        try:
+            body = response.json().get("error") or {}
+            reasons = {detail.get("reason") for detail in body.get("details") or [] if isinstance(detail, dict)}
+        except (ValueError, AttributeError):
+            return error
+        if body.get("status") in PROVIDER_ERROR_STATUSES or reasons & PROVIDER_ERROR_REASONS:
+            error.category = PROVIDER
+        return error
+    
+    def resolve_model(self, model: str) -> str:
+        """Ensure model name is properly formatted"""
+        if model == DEFAULT_MODEL:
+            return self.models[0] if self.models else self.FALLBACK_MODEL
+        if not model.startswith("gemini-"):
+            model = f"gemini-{model}"
+        return model
+    
     def generate(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
         """Generate text using Gemini API"""
         start_time = time.time()
         
         try:
-            # Ensure model name is properly formatted
-            if not model.startswith("gemini-"):
-                model = f"gemini-{model}"
+            model = self.resolve_model(model)
             
-            url = f"{self.BASE_URL}/models/{model}:generateContent?key={self.api_key}"
+            url = f"{self.BASE_URL}/models/{model}:generateContent"
             
-            payload = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": kwargs.get("temperature", 0.7),
-                    "topP": kwargs.get("top_p", 0.95),
-                    "topK": kwargs.get("top_k", 40),
-                    "maxOutputTokens": kwargs.get("max_tokens", 1024)
-                }
-            }
-            
-            response = requests.post(url, json=payload, timeout=30)
+            payload = self._build_payload(prompt, kwargs)
             
-            # Check for rate limiting headers
-            if "x-ratelimit-remaining" in response.headers:
-                self.rate_limit_remaining = int(response.headers["x-ratelimit-remaining"])
+            # Send with the next key from the pool, recording its rate limit state
+            with self.key_pool.use() as key:
+                response = self._post_json(f"{url}?key={key.value}", payload, timeout=30)
+                self._record_rate_limit(key, response)
             
             if response.status_code != 200:
-                self._update_metrics(False)
-                return {
-                    "success": False,
-                    "error": f"API Error: {response.status_code}",
-                    "response": response.text,
-                    "latency": time.time() - start_time
-                }
+                return self._failure(self._upstream_error(response), start_time)
             
-            data = response.json()
+            data = self._decode_json(response)
             
             # Extract the generated text from the response
             generated_text = ""
@@ -115,13 +131,132 @@ class GeminiProvider(AbstractProvider):
                 "text": generated_text,
                 "model": model,
                 "provider": "gemini",
+                "usage": self._extract_usage(data),
                 "latency": time.time() - start_time
             }
             
         except Exception as e:
-            self._update_metrics(False)
+            return self._exception_failure(e, start_time)
+    
+    def generate_stream(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
+        """Start a streamed generation using Gemini API"""
+        start_time = time.time()
+        
+        try:
+            model = self.resolve_model(model)
+            payload = self._build_payload(prompt, kwargs)
+            
+            with self.key_pool.use() as key:
+                url = f"{self.BASE_URL}/models/{model}:streamGenerateContent?alt=sse&key={key.value}"
+                response = self._post_json(url, payload, timeout=30, stream=True)
+                self._record_rate_limit(key, response)
+            
+            if response.status_code != 200:
+                return self._failure(self._upstream_error(response), start_time)
+            
+            self._update_metrics(True)
             return {
-                "success": False,
-                "error": f"Exception: {str(e)}",
+                "success": True,
+                "text": "",
+                "stream": self._stream_events(response),
+                "model": model,
+                "provider": "gemini",
+                "usage": None,
                 "latency": time.time() - start_time
             }
+            
+        except Exception as e:
+            return self._exception_failure(e, start_time)
+    
+    def _stream_events(self, response: requests.Response) -> Iterator[Dict[str, Any]]:
+        """Translate streamed candidates into text pieces, usage and the finish reason"""
+        for data in self._iter_events(response):
+            event = {}
+            candidates = data.get("candidates") or [{}]
+            text = "".join(part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []))
+            if text:
+                event["text"] = text
+            finish_reason = candidates[0].get("finishReason")
+            if finish_reason:
+                event["finish_reason"] = FINISH_REASONS.get(finish_reason, "stop")
+            if data.get("usageMetadata"):
+                event["usage"] = self._extract_usage(data)
+            if event:
+                yield event
+    
+    def _build_payload(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a generateContent payload from the prompt, or from chat messages when given"""
+        messages = kwargs.get("messages") or [{"role": "user", "content": prompt}]
+        # Gemini takes system messages as a separate instruction and calls the assistant "model"
+        system = [message["content"] for message in messages if message["role"] == "system"]
+        payload = {
+            "contents": [
+                {
+                    "role": "model" if message["role"] == "assistant" else "user",
+                    "parts": [
+                        {
+                            "text": message["content"]
+                        }
+                    ]
+                }
+                for message in messages if message["role"] != "system"
+            ],
+            "generationConfig": {
+                "temperature": kwargs.get("temperature", 0.7),
+                "topP": kwargs.get("top_p", 0.95),
+                "topK": kwargs.get("top_k", 40),
+                "maxOutputTokens": kwargs.get("max_tokens", 1024)
+            }
+        }
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": "\n\n".join(system)}]}
+        return payload
+    
+    def embed(self, texts: List[str], model: Optional[str] = None) -> Dict[str, Any]:
+        """Embed texts with a single batchEmbedContents call"""
+        start_time = time.time()
+        
+        try:
+            # Embedding models are not Gemini models, so the name is used as given
+            model = model or self.EMBEDDING_MODEL
+            
+            payload = {
+                "requests": [
+                    {"model": f"models/{model}", "content": {"parts": [{"text": text}]}}
+                    for text in texts
+                ]
+            }
+            
+            with self.key_pool.use() as key:
+                url = f"{self.BASE_URL}/models/{model}:batchEmbedContents?key={key.value}"
+                response = self._post_json(url, payload, timeout=30)
+                self._record_rate_limit(key, response)
+            
+            if response.status_code != 200:
+                return self._failure(self._upstream_error(response), start_time)
+            
+            data = self._decode_json(response)
+            
+            self._update_metrics(True)
+            return {
+                "success": True,
+                "embeddings": [embedding.get("values", []) for embedding in data.get("embeddings", [])],
+                "model": model,
+                "provider": "gemini",
+                # Gemini does not report token counts for embeddings
+                "usage": None,
+                "latency": time.time() - start_time
+            }
+            
+        except Exception as e:
+            return self._exception_failure(e, start_time)
+    
+    def _extract_usage(self, data: Dict[str, Any]) -> Dict[str, int]:
+        """Extract token counts from the usageMetadata field"""
+        metadata = data.get("usageMetadata") or {}
+        return self._build_usage(
+            metadata.get("promptTokenCount"),
+            metadata.get("candidatesTokenCount"),
+            metadata.get("cachedContentTokenCount"),
+            metadata.get("totalTokenCount")
+        )
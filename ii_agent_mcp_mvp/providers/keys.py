@@ -0,0 +1,162 @@
+"""
+II-Agent MCP Server Add-On - API Key Pools
+Spreads requests for one provider across several API keys and parks keys
+that hit rate limits
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+KEY_STRATEGIES = ("weighted_round_robin", "least_recently_limited")
+
+
+class ApiKey:
+    """One key in a pool with its usage and rate limit state"""
+
+    def __init__(self, value: str, weight: float = 1.0, name: Optional[str] = None):
+        self.value = value
+        self.weight = weight
+        self.name = name
+        self.current_weight = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.rate_limit_remaining: Optional[int] = None
+        self.parked_until = 0.0
+        self.last_limited = 0.0
+
+    @property
+    def masked(self) -> str:
+        """The key with all but its last four characters hidden"""
+        return f"...{self.value[-4:]}" if len(self.value) > 8 else "***"
+
+    def is_parked(self, now: float) -> bool:
+        return self.parked_until > now
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "key": self.masked,
+            "weight": self.weight,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "in_flight": self.in_flight,
+            "rate_limit_remaining": self.rate_limit_remaining,
+            "parked_for": round(max(0.0, self.parked_until - now), 1)
+        }
+
+
+class KeyPool:
+    """Selects API keys by weighted round robin or least-recently-limited"""
+
+    def __init__(self, keys: List[ApiKey], strategy: str = "weighted_round_robin", park_seconds: float = 30.0):
+        """Initialize the pool; keys that get a 429 are parked for Retry-After or park_seconds"""
+        if not keys:
+            raise ValueError("A key pool needs at least one key")
+        if strategy not in KEY_STRATEGIES:
+            raise ValueError(f"Unknown key strategy: {strategy}")
+        self.keys = keys
+        self.strategy = strategy
+        self.park_seconds = park_seconds
+        self._lock = threading.Lock()
+        for i, key in enumerate(keys):
+            key.name = key.name or f"key-{i + 1}"
+
+    @classmethod
+    def from_config(cls, api_key: Optional[str], api_keys: Optional[List[Union[str, Dict[str, Any]]]] = None,
+                    strategy: str = "weighted_round_robin", park_seconds: float = 30.0) -> "KeyPool":
+        """Create a pool from a provider's api_key and api_keys entries, which are strings or {key, weight, name} dicts"""
+        keys: List[ApiKey] = [ApiKey(api_key)] if api_key else []
+        for entry in api_keys or []:
+            if isinstance(entry, dict):
+                key = ApiKey(entry["key"], float(entry.get("weight", 1.0)), entry.get("name"))
+            else:
+                key = ApiKey(entry)
+            # Keys that failed to decrypt are empty
+            if key.value and key.value not in (existing.value for existing in keys):
+                keys.append(key)
+        return cls(keys, strategy, park_seconds)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _select(self, now: float) -> ApiKey:
+        """Pick a key; the lock must be held"""
+        available = [key for key in self.keys if not key.is_parked(now)]
+        if not available:
+            # Every key is limited; the one released first is the best bet
+            return min(self.keys, key=lambda key: key.parked_until)
+        if len(available) == 1:
+            return available[0]
+
+        if self.strategy == "least_recently_limited":
+            return min(available, key=lambda key: (key.last_limited, key.in_flight, key.requests))
+
+        # Smooth weighted round robin: interleaves keys in proportion to their weights
+        total = 0.0
+        best = None
+        for key in available:
+            key.current_weight += key.weight
+            total += key.weight
+            if best is None or key.current_weight > best.current_weight:
+                best = key
+        best.current_weight -= total
+        return best
+
+    @contextmanager
+    def use(self) -> Iterator[ApiKey]:
+        """Check out a key for one request"""
+        with self._lock:
+            key = self._select(time.monotonic())
+            key.requests += 1
+            key.in_flight += 1
+        try:
+            yield key
+        finally:
+            with self._lock:
+                key.in_flight -= 1
+
+    def record(self, key: ApiKey, status_code: int, rate_limit_remaining: Optional[int] = None,
+               retry_after: Optional[float] = None) -> None:
+        """Record an upstream response for a key, parking it on 429"""
+        with self._lock:
+            if rate_limit_remaining is not None:
+                key.rate_limit_remaining = rate_limit_remaining
+            if status_code == 429:
+                now = time.monotonic()
+                key.rate_limited += 1
+                key.last_limited = now
+                key.parked_until = now + (retry_after if retry_after is not None else self.park_seconds)
+                # The limit resets by the time the key is unparked, and an exhausted count would keep it unused
+                key.rate_limit_remaining = None
+                if len(self.keys) > 1:
+                    logger.warning(f"API key {key.name} rate limited, parked for {key.parked_until - now:.0f}s")
+
+    @property
+    def rate_limit_remaining(self) -> Optional[int]:
+        """Requests left across keys that are not parked, None when no key has reported a limit"""
+        now = time.monotonic()
+        with self._lock:
+            available = [key for key in self.keys if not key.is_parked(now)]
+            if not available:
+                return 0
+            known = [key.rate_limit_remaining for key in available if key.rate_limit_remaining is not None]
+            if len(known) < len(available):
+                # Keys without a reported limit are assumed to have headroom
+                return None
+            return sum(known)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get per-key stats with masked keys"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "available": sum(not key.is_parked(now) for key in self.keys),
+                "keys": [key.to_dict(now) for key in self.keys]
+            }
@@ -0,0 +1,447 @@
+"""
+II-Agent MCP Server Add-On - Replay Log
+Append-only, compressed, segment-rotated request/response log written by a
+background thread, with a CLI to compute statistics and replay captured traffic
+"""
+import io
+import os
+import sys
+import glob
+import gzip
+import math
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+import requests
+
+from .compression import compress, zstandard
+from .utils.jsonlib import dumps, loads
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_EXTENSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+
+_STOP = object()
+
+
+class ReplayLogWriter:
+    """Queues log entries and writes them to rotating segment files from a background thread"""
+
+    def __init__(self, directory: str, compression: str = "gzip", segment_max_bytes: int = 64 * 1024 * 1024,
+                 segment_max_seconds: float = 3600.0, max_segments: int = 48, queue_size: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 1.0, capture_prompts: bool = True,
+                 capture_responses: bool = False, registry: Optional[MetricsRegistry] = None):
+        """Initialize the writer and start its thread"""
+        if compression not in SEGMENT_EXTENSIONS:
+            raise ValueError(f"Unknown replay log compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, writing the replay log with gzip")
+            compression = "gzip"
+
+        self.directory = directory
+        self.compression = compression
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.max_segments = max_segments
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.capture_prompts = capture_prompts
+        self.capture_responses = capture_responses
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._segment_path: Optional[str] = None
+        self._segment_started = 0.0
+        self._segment_index = 0
+
+        registry = registry or get_registry()
+        self._written = registry.counter("mcp_replay_log_entries_total", "Entries written to the replay log")
+        self._dropped = registry.counter("mcp_replay_log_dropped_total", "Entries dropped because the replay log queue was full")
+        self._bytes = registry.counter("mcp_replay_log_bytes_total", "Bytes written to the replay log")
+
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="replay-log-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["ReplayLogWriter"]:
+        """Create a writer from the `replay_log` section of providers.yaml, or None if disabled"""
+        config = config or {}
+        if not config.get("enabled", False):
+            return None
+        return cls(
+            config.get("directory", "replay_logs"),
+            config.get("compression", "gzip"),
+            int(config.get("segment_max_bytes", 64 * 1024 * 1024)),
+            float(config.get("segment_max_seconds", 3600.0)),
+            int(config.get("max_segments", 48)),
+            int(config.get("queue_size", 10000)),
+            capture_prompts=bool(config.get("capture_prompts", True)),
+            capture_responses=bool(config.get("capture_responses", False))
+        )
+
+    def record(self, entry: Dict[str, Any]) -> bool:
+        """Queue an entry without blocking, returning False if it was dropped"""
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self._dropped.inc()
+            return False
+
+    def record_request(self, request: Dict[str, Any], client: str, priority: str, status: int,
+                       result: Optional[Dict[str, Any]] = None, latency: Optional[float] = None,
+                       cost: Optional[float] = None, cached: bool = False) -> bool:
+        """Record a /generate request and its outcome, leaving out prompts and responses unless captured"""
+        result = result or {}
+        request = dict(request)
+        if not self.capture_prompts:
+            request.pop("prompt", None)
+        entry = {
+            "timestamp": time.time(),
+            "client": client,
+            "priority": priority,
+            "request": request,
+            "status": status,
+            "provider": result.get("provider"),
+            "model": result.get("model"),
+            "latency": latency,
+            "usage": result.get("usage"),
+            "cost": cost,
+            "fallback_used": result.get("fallback_used", False),
+            "cached": cached,
+            "error": result.get("error")
+        }
+        if self.capture_responses and "text" in result:
+            entry["text"] = result["text"]
+        return self.record(entry)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued entry has been written"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write the queued entries and stop the writer thread"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Replay log queue full on close, dropping pending entries")
+            return
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        pending: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) < self.batch_size:
+                    continue
+
+            if pending:
+                self._write(pending)
+                pending = []
+            if isinstance(item, threading.Event):
+                item.set()
+            if item is _STOP:
+                break
+        self._close_segment()
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        """Append a batch as one compressed member, so segments stay readable while open"""
+        try:
+            data = b"".join(dumps(entry) + b"\n" for entry in entries)
+            if self.compression != "none":
+                data = compress(data, self.compression, direction="replay_log")
+            self._maybe_rotate(len(data))
+            self._file.write(data)
+            self._file.flush()
+            self._written.inc(len(entries))
+            self._bytes.inc(len(data))
+        except Exception as e:
+            logger.error(f"Error writing replay log: {e}")
+
+    def _maybe_rotate(self, incoming: int) -> None:
+        if self._file is not None:
+            too_big = self._file.tell() + incoming > self.segment_max_bytes
+            too_old = time.time() - self._segment_started > self.segment_max_seconds
+            if not (too_big or too_old):
+                return
+            self._close_segment()
+
+        self._segment_index += 1
+        name = f"replay-{time.strftime('%Y%m%d-%H%M%S')}-{self._segment_index:04d}{SEGMENT_EXTENSIONS[self.compression]}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._file = open(self._segment_path, "ab")
+        self._segment_started = time.time()
+        self._enforce_retention()
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _enforce_retention(self) -> None:
+        segments = list_segments(self.directory)
+        for path in segments[:max(0, len(segments) - self.max_segments)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old replay log segment {path}: {e}")
+
+
+def list_segments(directory: str) -> List[str]:
+    """List segment files in a directory, oldest first"""
+    paths = []
+    for extension in SEGMENT_EXTENSIONS.values():
+        paths.extend(glob.glob(os.path.join(directory, f"replay-*{extension}")))
+    return sorted(paths)
+
+
+def _open_segment(path: str) -> io.BufferedIOBase:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+    return open(path, "rb")
+
+
+def iter_entries(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Stream entries from segment files or directories of segments, one at a time"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_entries(list_segments(path))
+            continue
+        with _open_segment(path) as f:
+            reader = io.BufferedReader(f) if not isinstance(f, io.BufferedIOBase) else f
+            try:
+                for line in reader:
+                    if line.strip():
+                        yield loads(line)
+            except (EOFError, ValueError) as e:
+                # The newest segment may end in a partly written batch
+                logger.warning(f"Stopped reading {path} at a truncated entry: {e}")
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram giving percentiles within about 4% in constant memory"""
+
+    GROWTH = 1.04
+    MIN_VALUE = 0.0001
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        index = 0 if value <= self.MIN_VALUE else int(math.log(value / self.MIN_VALUE, self.GROWTH)) + 1
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, pct: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self.MIN_VALUE * self.GROWTH ** index if index else self.MIN_VALUE
+        return 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
+
+
+def compute_stats(entries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate latency and outcome statistics in a single streaming pass"""
+    overall = LatencyHistogram()
+    providers: Dict[str, Dict[str, Any]] = {}
+    statuses: Dict[str, int] = {}
+    first = last = None
+    fallbacks = cached = 0
+    cost = 0.0
+
+    for entry in entries:
+        timestamp = entry.get("timestamp")
+        if timestamp is not None:
+            first = timestamp if first is None else min(first, timestamp)
+            last = timestamp if last is None else max(last, timestamp)
+        status = str(entry.get("status", ""))
+        statuses[status] = statuses.get(status, 0) + 1
+        fallbacks += bool(entry.get("fallback_used"))
+        cached += bool(entry.get("cached"))
+        cost += entry.get("cost") or 0.0
+
+        latency = entry.get("latency")
+        if latency is None:
+            continue
+        overall.add(latency)
+        provider = entry.get("provider") or "none"
+        stats = providers.setdefault(provider, {"histogram": LatencyHistogram(), "tokens": 0})
+        stats["histogram"].add(latency)
+        stats["tokens"] += (entry.get("usage") or {}).get("total_tokens", 0)
+
+    return {
+        "requests": sum(statuses.values()),
+        "statuses": statuses,
+        "duration": (last - first) if first is not None else 0.0,
+        "fallback_used": fallbacks,
+        "cached": cached,
+        "cost": cost,
+        "latency": overall.summary(),
+        "providers": {
+            name: {"requests": s["histogram"].count, "tokens": s["tokens"], "latency": s["histogram"].summary()}
+            for name, s in sorted(providers.items())
+        }
+    }
+
+
+class Replayer:
+    """Sends captured requests to a gateway, optionally preserving their original timing"""
+
+    REQUEST_FIELDS = ("prompt", "model", "provider", "temperature", "max_tokens", "top_p", "top_k", "priority")
+
+    def __init__(self, gateway_url: str, concurrency: int = 8, speed: float = 0.0, headers: Optional[Dict[str, str]] = None):
+        """Initialize the replayer; speed 1.0 keeps original timing, 0 sends as fast as possible"""
+        self.gateway_url = gateway_url.rstrip("/")
+        self.concurrency = concurrency
+        self.speed = speed
+        self.headers = headers or {}
+        self._local = threading.local()
+        self._slots = threading.BoundedSemaphore(concurrency * 2)
+        self._lock = threading.Lock()
+        self.latencies = LatencyHistogram()
+        self.statuses: Dict[str, int] = {}
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _send(self, entry: Dict[str, Any]) -> None:
+        payload = {k: entry["request"][k] for k in self.REQUEST_FIELDS if entry["request"].get(k) is not None}
+        headers = {"X-Client-ID": entry["client"]} if entry.get("client") else {}
+        start = time.perf_counter()
+        try:
+            status = self._session().post(f"{self.gateway_url}/generate", json=payload, headers=headers, timeout=120).status_code
+        except requests.RequestException:
+            status = -1
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.latencies.add(time.perf_counter() - start)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def run(self, entries: Iterable[Dict[str, Any]], limit: Optional[int] = None) -> Dict[str, Any]:
+        """Replay entries that captured their prompt, returning a summary"""
+        sent = skipped = 0
+        start = time.perf_counter()
+        first_timestamp = None
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for entry in entries:
+                if limit is not None and sent >= limit:
+                    break
+                if not (entry.get("request") or {}).get("prompt"):
+                    skipped += 1
+                    continue
+                if self.speed > 0 and entry.get("timestamp") is not None:
+                    first_timestamp = first_timestamp if first_timestamp is not None else entry["timestamp"]
+                    delay = (entry["timestamp"] - first_timestamp) / self.speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                # Bound the entries held in memory to what is in flight
+                self._slots.acquire()
+                pool.submit(self._send, entry)
+                sent += 1
+        duration = time.perf_counter() - start
+        return {
+            "sent": sent,
+            "skipped": skipped,
+            "duration": duration,
+            "throughput": sent / duration if duration > 0 else 0.0,
+            "statuses": self.statuses,
+            "latency": self.latencies.summary()
+        }
+
+
+def _print_latency(label: str, latency: Dict[str, float]) -> None:
+    print(f"{label:<24} mean={latency['mean'] * 1000:.1f}ms p50={latency['p50'] * 1000:.1f}ms "
+          f"p95={latency['p95'] * 1000:.1f}ms p99={latency['p99'] * 1000:.1f}ms")
+
+
+def main():
+    """Main entry point for the replay log CLI"""
+    parser = argparse.ArgumentParser(description="II-Agent MCP Server replay log tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Compute latency and provider statistics")
+    stats_parser.add_argument("paths", nargs="+", help="Segment files or replay log directories")
+    stats_parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay captured requests against a gateway")
+    replay_parser.add_argument("paths", nargs="+", help="Segment files or replay log directories")
+    replay_parser.add_argument("--gateway-url", default="http://127.0.0.1:8000", help="Gateway to send requests to")
+    replay_parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests")
+    replay_parser.add_argument("--speed", type=float, default=0.0, help="Timing multiplier; 1 keeps original pacing, 0 sends as fast as possible")
+    replay_parser.add_argument("--limit", type=int, help="Maximum requests to send")
+    replay_parser.add_argument("--api-key", help="API key sent as X-API-Key")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        stats = compute_stats(iter_entries(args.paths))
+        if args.json:
+            print(dumps(stats).decode())
+            return
+        print(f"Requests:     {stats['requests']} over {stats['duration']:.0f}s")
+        print(f"Statuses:     {stats['statuses']}")
+        print(f"Fallbacks:    {stats['fallback_used']}  Cached: {stats['cached']}  Cost: ${stats['cost']:.4f}")
+        _print_latency("All providers", stats["latency"])
+        for name, provider_stats in stats["providers"].items():
+            _print_latency(f"{name} ({provider_stats['requests']})", provider_stats["latency"])
+        return
+
+    headers = {"X-API-Key": args.api_key} if args.api_key else None
+    replayer = Replayer(args.gateway_url, args.concurrency, args.speed, headers)
+    summary = replayer.run(iter_entries(args.paths), args.limit)
+    print(f"Sent:         {summary['sent']} ({summary['skipped']} skipped without prompts) in {summary['duration']:.2f}s")
+    print(f"Throughput:   {summary['throughput']:.1f} req/s")
+    print(f"Statuses:     {summary['statuses']}")
+    _print_latency("Latency", summary["latency"])
+    if any(status != "200" for status in summary["statuses"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+II-Agent MCP Server Add-On - Routing Table
+Compiles provider order, model ownership and model aliases into a lookup table
+so each request resolves its (provider, model) targets with one dictionary lookup
+"""
+from typing import Dict, Any, List, Optional, Tuple
+
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Aliases available without configuration; targets a provider does not serve are dropped
+DEFAULT_ALIASES = {
+    "fast": {"gemini": "gemini-1.5-flash", "deepseek": "deepseek-chat", "mistral": "mistral-small"},
+    "smart": {"gemini": "gemini-1.5-pro", "deepseek": "deepseek-chat", "mistral": "mistral-large"}
+}
+
+# Requests for this model go to each provider's first configured model
+DEFAULT_MODEL = "default"
+
+
+class Route:
+    """Ordered providers and the concrete model to request from each"""
+
+    __slots__ = ("providers", "models")
+
+    def __init__(self, targets: List[Tuple[str, Optional[str]]]):
+        """Initialize the route; a None model is resolved by the provider at request time"""
+        self.providers = [provider for provider, _ in targets]
+        self.models = {provider: model for provider, model in targets if model is not None}
+
+    @property
+    def targets(self) -> List[Tuple[str, Optional[str]]]:
+        """The (provider, model) pairs in order"""
+        return [(provider, self.models.get(provider)) for provider in self.providers]
+
+
+class RoutingTable:
+    """Maps (requested provider, requested model or alias) to ordered (provider, model) targets"""
+
+    def __init__(self, provider_models: Dict[str, List[str]], aliases: Optional[Dict[str, Dict[str, str]]] = None):
+        """Compile the table; provider_models lists each provider's models in fallback order"""
+        self.provider_order = list(provider_models)
+        self.provider_models = provider_models
+        self.aliases = self._compile_aliases(provider_models, {**DEFAULT_ALIASES, **(aliases or {})})
+        self._routes: Dict[Tuple[Optional[str], str], Route] = {}
+        self._fallback_routes: Dict[Optional[str], Route] = {}
+
+        defaults = {name: models[0] if models else None for name, models in provider_models.items()}
+        owners: Dict[str, List[str]] = {}
+        for name, models in provider_models.items():
+            for model in models:
+                owners.setdefault(model, []).append(name)
+
+        model_targets: Dict[str, Dict[str, Optional[str]]] = {DEFAULT_MODEL: defaults}
+        for model, names in owners.items():
+            # Providers serving the model come first; the others fall back to their default model
+            model_targets[model] = {**{name: model for name in names},
+                                    **{name: defaults[name] for name in self.provider_order if name not in names}}
+        model_targets.update(self.aliases)
+
+        for model, targets in model_targets.items():
+            self._routes[(None, model)] = Route(list(targets.items()))
+            for requested in self.provider_order:
+                first = (requested, targets.get(requested, defaults[requested]))
+                self._routes[(requested, model)] = Route([first] + [t for t in targets.items() if t[0] != requested])
+
+        # Unknown models are passed to each provider to resolve
+        self._fallback_routes[None] = Route([(name, None) for name in self.provider_order])
+        for requested in self.provider_order:
+            self._fallback_routes[requested] = Route(
+                [(requested, None)] + [(name, None) for name in self.provider_order if name != requested]
+            )
+
+    @staticmethod
+    def _compile_aliases(provider_models: Dict[str, List[str]],
+                         aliases: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        """Keep alias targets for known providers, in provider order"""
+        compiled = {}
+        for alias, targets in aliases.items():
+            resolved = {}
+            for name in provider_models:
+                model = (targets or {}).get(name)
+                if model is None:
+                    continue
+                if provider_models[name] and model not in provider_models[name]:
+                    logger.warning(f"Alias {alias} targets {model}, which {name} does not list; skipping")
+                    continue
+                resolved[name] = model
+            if resolved:
+                compiled[alias] = resolved
+        return compiled
+
+    @classmethod
+    def from_config(cls, provider_factory, provider_order: List[str],
+                    config: Optional[Dict[str, Any]]) -> "RoutingTable":
+        """Compile a table for the created providers from the `routing` section of providers.yaml"""
+        provider_models = {}
+        for name in provider_order:
+            provider = provider_factory.get_provider(name)
+            if provider is not None:
+                provider_models[name.lower()] = list(provider.models or [])
+        return cls(provider_models, (config or {}).get("aliases"))
+
+    def route(self, model: str, provider: Optional[str] = None) -> Route:
+        """Get the targets for a request"""
+        route = self._routes.get((provider, model))
+        if route is not None:
+            return route
+        if provider is not None and provider not in self._fallback_routes:
+            logger.warning(f"Requested provider {provider} is not configured, using the default order")
+            return self.route(model)
+        return self._fallback_routes[provider]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the table for the admin endpoint"""
+        return {
+            "provider_order": self.provider_order,
+            "aliases": self.aliases,
+            "routes": {model: route.targets for (requested, model), route in self._routes.items() if requested is None}
+        }
@@ -0,0 +1,180 @@
+"""
+II-Agent MCP Server Add-On - Shadow Traffic
+Mirrors a sample of answered /generate requests to candidate providers and models
+off the request path, discarding their output and comparing latency, errors and
+output length against the live route
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from .tokens import estimate_tokens
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Generation parameters passed on to shadow calls
+MIRRORED_PARAMETERS = ("temperature", "max_tokens", "top_p", "top_k")
+
+
+def output_tokens(result: Dict[str, Any]) -> int:
+    """Get a result's completion tokens, estimating them when the provider did not report usage"""
+    usage = result.get("usage") or {}
+    if usage.get("completion_tokens") is not None:
+        return int(usage["completion_tokens"])
+    return estimate_tokens(result.get("text", ""))
+
+
+class ShadowTarget:
+    """A candidate provider and model, the share of traffic mirrored to it and how it compared"""
+
+    def __init__(self, provider: str, model: Optional[str] = None, sample_rate: float = 0.01):
+        """Initialize the target; without a model the provider's default model is used"""
+        self.provider = provider.lower()
+        self.model = model
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.mirrored = 0
+        self.errors = 0
+        self.dropped = 0
+        # Sums over mirrored requests the candidate answered, paired with the live route's answer
+        self.compared = 0
+        self.shadow_latency = 0.0
+        self.primary_latency = 0.0
+        self.shadow_tokens = 0
+        self.primary_tokens = 0
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        return {"provider": self.provider, "model": self.model or "default"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Summarize how the candidate compared with the live route"""
+        compared = max(self.compared, 1)
+        return {
+            "provider": self.provider,
+            "model": self.model or "default",
+            "sample_rate": self.sample_rate,
+            "mirrored": self.mirrored,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "error_rate": self.errors / self.mirrored if self.mirrored else 0.0,
+            "compared": self.compared,
+            "latency": {
+                "shadow_mean": self.shadow_latency / compared,
+                "primary_mean": self.primary_latency / compared,
+                "ratio": self.shadow_latency / self.primary_latency if self.primary_latency else None
+            },
+            "output_tokens": {
+                "shadow_mean": self.shadow_tokens / compared,
+                "primary_mean": self.primary_tokens / compared
+            }
+        }
+
+
+class ShadowMirror:
+    """Sends sampled copies of answered requests to shadow targets from a small bounded thread pool"""
+
+    def __init__(self, provider_factory, targets: List[ShadowTarget], max_workers: int = 2, max_pending: int = 32,
+                 registry: Optional[MetricsRegistry] = None):
+        """Initialize the mirror; requests beyond max_pending queued shadow calls are not mirrored"""
+        self.provider_factory = provider_factory
+        self.targets = targets
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shadow")
+
+        registry = registry or get_registry()
+        self._requests = registry.counter("mcp_shadow_requests_total", "Requests mirrored to shadow targets by outcome")
+        self._latency = registry.histogram("mcp_shadow_latency_seconds",
+                                           "Latency of shadow calls and of the live calls they mirrored")
+        self._tokens = registry.counter("mcp_shadow_output_tokens_total",
+                                        "Output tokens of shadow calls and of the live calls they mirrored")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], provider_factory) -> Optional["ShadowMirror"]:
+        """Create a mirror from the `shadow` section of providers.yaml, or None if disabled"""
+        config = config or {}
+        if not config.get("enabled", False) or not config.get("targets"):
+            return None
+        targets = [
+            ShadowTarget(target["provider"], target.get("model"), float(target.get("sample_rate", 0.01)))
+            for target in config["targets"]
+        ]
+        return cls(provider_factory, targets, int(config.get("max_workers", 2)), int(config.get("max_pending", 32)))
+
+    def mirror(self, prompt: str, parameters: Dict[str, Any], result: Dict[str, Any]) -> int:
+        """Queue shadow calls for an answered request without blocking, returning how many were queued"""
+        queued = 0
+        for target in self.targets:
+            if target.provider == result.get("provider") and target.model in (None, result.get("model")):
+                continue
+            if random.random() >= target.sample_rate:
+                continue
+            provider = self.provider_factory.get_provider(target.provider)
+            if provider is None:
+                continue
+            with self._lock:
+                if self._pending >= self.max_pending:
+                    target.dropped += 1
+                    self._requests.inc(1, {**target.labels, "outcome": "dropped"})
+                    continue
+                self._pending += 1
+            kwargs = {name: parameters[name] for name in MIRRORED_PARAMETERS if parameters.get(name) is not None}
+            try:
+                self._executor.submit(self._run, target, provider, prompt, kwargs, result)
+            except RuntimeError:
+                # Shutting down
+                with self._lock:
+                    self._pending -= 1
+                break
+            queued += 1
+        return queued
+
+    def _run(self, target: ShadowTarget, provider, prompt: str, kwargs: Dict[str, Any],
+             primary: Dict[str, Any]) -> None:
+        """Make one shadow call and record it; the output itself is discarded"""
+        start_time = time.time()
+        try:
+            try:
+                shadow = provider.generate(prompt, target.model or "default", **kwargs)
+            except Exception as e:
+                shadow = {"success": False, "error": str(e)}
+            latency = time.time() - start_time
+            succeeded = shadow.get("success", False)
+            if succeeded:
+                shadow_tokens, primary_tokens = output_tokens(shadow), output_tokens(primary)
+
+            with self._lock:
+                target.mirrored += 1
+                if not succeeded:
+                    target.errors += 1
+                    self._requests.inc(1, {**target.labels, "outcome": "error"})
+                    logger.debug(f"Shadow call to {target.provider} failed: {shadow.get('error')}")
+                    return
+                target.compared += 1
+                target.shadow_latency += latency
+                target.primary_latency += primary.get("latency", 0.0)
+                target.shadow_tokens += shadow_tokens
+                target.primary_tokens += primary_tokens
+
+            self._requests.inc(1, {**target.labels, "outcome": "success"})
+            self._latency.observe(latency, {**target.labels, "role": "shadow"})
+            self._latency.observe(primary.get("latency", 0.0), {**target.labels, "role": "primary"})
+            self._tokens.inc(shadow_tokens, {**target.labels, "role": "shadow"})
+            self._tokens.inc(primary_tokens, {**target.labels, "role": "primary"})
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get pending shadow calls and the comparison for each target"""
+        with self._lock:
+            return {"pending": self._pending, "targets": [target.get_stats() for target in self.targets]}
+
+    def close(self) -> None:
+        """Stop accepting shadow calls and drop the ones still queued"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,110 @@
+"""
+II-Agent MCP Server Add-On - Token Estimation Module
+Estimates prompt sizes locally and checks them against model context limits
+"""
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Words, numbers and individual punctuation marks roughly map to BPE pieces
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Characters covered by each token when subword tokenizers split a long word
+SUBWORD_CHARS = 6
+
+# Known model limits, matched by longest prefix (context window, max output tokens)
+DEFAULT_MODEL_LIMITS: Dict[str, Dict[str, Optional[int]]] = {
+    "gemini-1.5-pro": {"context": 2097152, "max_output": 8192},
+    "gemini-1.5-flash": {"context": 1048576, "max_output": 8192},
+    "gemini-2.0-flash": {"context": 1048576, "max_output": 8192},
+    "deepseek-chat": {"context": 65536, "max_output": 8192},
+    "deepseek-coder": {"context": 65536, "max_output": 8192},
+    "deepseek-reasoner": {"context": 65536, "max_output": 8192},
+    "mistral-large": {"context": 131072, "max_output": None},
+    "mistral-medium": {"context": 32768, "max_output": None},
+    "mistral-small": {"context": 32768, "max_output": None},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text without calling the provider"""
+    if not text:
+        return 0
+
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        # Short pieces are usually a single token, longer ones split every few characters
+        tokens += 1 + (len(piece) - 1) // SUBWORD_CHARS
+    return tokens
+
+
+class ContextLimits:
+    """Per-model context window table used to pre-check requests"""
+
+    def __init__(self, models: Optional[Dict[str, Dict[str, Any]]] = None,
+                 safety_margin: float = 1.1, route_to_larger_context: bool = True):
+        """Initialize the table, merging configured limits over the defaults"""
+        self.models = dict(DEFAULT_MODEL_LIMITS)
+        self.models.update(models or {})
+        self.safety_margin = safety_margin
+        self.route_to_larger_context = route_to_larger_context
+        # Longest prefixes first so specific entries win
+        self._prefixes = sorted(self.models, key=len, reverse=True)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ContextLimits":
+        """Create the table from the `limits` section of providers.yaml"""
+        config = config or {}
+        return cls(
+            models=config.get("models"),
+            safety_margin=float(config.get("safety_margin", 1.1)),
+            route_to_larger_context=config.get("route_to_larger_context", True)
+        )
+
+    def get_limits(self, model: str) -> Optional[Dict[str, Optional[int]]]:
+        """Get the limits for a model, or None if the model is unknown"""
+        if model in self.models:
+            return self.models[model]
+        for prefix in self._prefixes:
+            if model.startswith(prefix):
+                return self.models[prefix]
+        return None
+
+    def estimate_prompt(self, prompt: str) -> int:
+        """Estimate prompt tokens including the safety margin"""
+        return int(estimate_tokens(prompt) * self.safety_margin) + 1
+
+    def fit(self, model: str, prompt_tokens: int, max_tokens: int) -> Tuple[bool, int]:
+        """Check whether a request fits the model and return the clamped max_tokens"""
+        limits = self.get_limits(model)
+        if not limits:
+            return True, max_tokens
+
+        context = limits.get("context")
+        max_output = limits.get("max_output")
+
+        clamped = max_tokens
+        if max_output:
+            clamped = min(clamped, max_output)
+        if context:
+            available = context - prompt_tokens
+            if available <= 0:
+                return False, 0
+            clamped = min(clamped, available)
+
+        return True, clamped
+
+    def find_larger_model(self, models: List[str], prompt_tokens: int) -> Optional[str]:
+        """Find the smallest known model in a list whose context fits the prompt"""
+        candidates = []
+        for model in models:
+            limits = self.get_limits(model)
+            if limits and limits.get("context") and limits["context"] > prompt_tokens:
+                candidates.append((limits["context"], model))
+
+        if not candidates:
+            return None
+        return min(candidates)[1]
@@ -0,0 +1,113 @@
+"""
+II-Agent MCP Server Add-On - Usage Accounting Module
+Aggregates token usage, throughput and cost per provider, model and client
+"""
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Prices are expressed in USD per one million tokens
+PRICE_UNIT = 1_000_000
+
+
+def empty_usage() -> Dict[str, int]:
+    """Get a usage dict with all counts set to zero"""
+    return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "total_tokens": 0}
+
+
+class UsageTracker:
+    """Tracks token usage and cost for completed generations"""
+
+    def __init__(self, pricing: Optional[Dict[str, Any]] = None, registry: Optional[MetricsRegistry] = None):
+        """Initialize the tracker with an optional price table"""
+        self.pricing = pricing or {}
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+
+        registry = registry or get_registry()
+        self._generations = registry.counter("mcp_generations_total", "Successful generations")
+        self._tokens = registry.counter("mcp_tokens_total", "Tokens processed by type")
+        self._cost = registry.counter("mcp_cost_usd_total", "Estimated upstream cost in USD")
+        self._generation_seconds = registry.counter(
+            "mcp_generation_seconds_total", "Upstream generation time of successful requests"
+        )
+
+    def get_price(self, provider: str, model: str) -> Optional[Dict[str, float]]:
+        """Look up the price entry for a model, preferring provider-qualified keys"""
+        return self.pricing.get(f"{provider}/{model}") or self.pricing.get(model)
+
+    def calculate_cost(self, provider: str, model: str, usage: Dict[str, int]) -> float:
+        """Calculate the cost of a single generation in USD"""
+        price = self.get_price(provider, model)
+        if not price:
+            return 0.0
+
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        cached_tokens = min(usage.get("cached_tokens", 0), prompt_tokens)
+        completion_tokens = usage.get("completion_tokens", 0)
+
+        input_price = float(price.get("input", 0.0))
+        cached_price = float(price.get("cached_input", input_price))
+        output_price = float(price.get("output", 0.0))
+
+        cost = (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + completion_tokens * output_price
+        )
+        return cost / PRICE_UNIT
+
+    def record(self, provider: str, model: str, client: str, usage: Optional[Dict[str, int]], latency: float) -> float:
+        """Record a completed generation and return its cost"""
+        usage = usage or empty_usage()
+        cost = self.calculate_cost(provider, model, usage)
+        key = (provider, model, client)
+
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = {
+                    "requests": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cached_tokens": 0,
+                    "cost": 0.0,
+                    "generation_seconds": 0.0,
+                }
+                self._totals[key] = totals
+            totals["requests"] += 1
+            totals["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            totals["completion_tokens"] += usage.get("completion_tokens", 0)
+            totals["cached_tokens"] += usage.get("cached_tokens", 0)
+            totals["cost"] += cost
+            totals["generation_seconds"] += latency
+
+        labels = {"provider": provider, "model": model, "client": client}
+        self._generations.inc(1, labels)
+        for token_type in ("prompt", "completion", "cached"):
+            count = usage.get(f"{token_type}_tokens", 0)
+            if count:
+                self._tokens.inc(count, {**labels, "type": token_type})
+        if cost:
+            self._cost.inc(cost, labels)
+        self._generation_seconds.inc(latency, labels)
+
+        return cost
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Get aggregated usage grouped by provider, model and client"""
+        summary: Dict[str, Any] = {}
+        with self._lock:
+            items = [(key, dict(totals)) for key, totals in self._totals.items()]
+
+        for (provider, model, client), totals in items:
+            seconds = totals["generation_seconds"]
+            totals["tokens_per_second"] = totals["completion_tokens"] / seconds if seconds > 0 else 0.0
+            totals["cost"] = round(totals["cost"], 6)
+            summary.setdefault(provider, {}).setdefault(model, {})[client] = totals
+
+        return summary
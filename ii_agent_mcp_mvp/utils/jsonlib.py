@@ -0,0 +1,37 @@
+"""
+II-Agent MCP Server Add-On - JSON Utilities
+JSON encoding and decoding using orjson when installed, falling back to the standard library
+"""
+import json
+from typing import Any, Union
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the active backend, reported on /status
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Decode JSON from bytes or text"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fast backend"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
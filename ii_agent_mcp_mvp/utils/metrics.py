@@ -0,0 +1,212 @@
+"""
+II-Agent MCP Server Add-On - Metrics Utilities
+In-process metrics registry rendered in Prometheus text format
+"""
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Default histogram buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    """Convert a label dict into a hashable, ordered key"""
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    """Format a label key for the exposition format"""
+    items = list(key)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    escaped = []
+    for k, v in items:
+        v = v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        """Initialize the metric with a name and help text"""
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        """Render the metric in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Increment the counter"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, labels: Optional[Dict[str, Any]] = None) -> float:
+        """Get the current value for a label set"""
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Set the gauge value"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Increment the gauge"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Decrement the gauge"""
+        self.inc(-amount, labels)
+
+    def get(self, labels: Optional[Dict[str, Any]] = None) -> float:
+        """Get the current value for a label set"""
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, Dict[str, Any]] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Record an observation"""
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def get_count(self, labels: Optional[Dict[str, Any]] = None) -> int:
+        """Get the number of observations for a label set"""
+        state = self._values.get(_label_key(labels))
+        return state["count"] if state else 0
+
+    def get_sum(self, labels: Optional[Dict[str, Any]] = None) -> float:
+        """Get the sum of observations for a label set"""
+        state = self._values.get(_label_key(labels))
+        return state["sum"] if state else 0.0
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(s["counts"]), s["sum"], s["count"]) for k, s in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registry of named metrics"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.metric_type}")
+            return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        """Get or create a counter"""
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        """Get or create a gauge"""
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return _registry
@@ -0,0 +1,134 @@
+"""
+II-Agent MCP Server Add-On - Profiling Utilities
+Sampling profiler producing collapsed stacks and optional per-stage timers
+"""
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from .metrics import get_registry
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Buckets for stage timers, which are mostly well under a millisecond
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Innermost functions of threads parked waiting for work
+IDLE_FUNCTIONS = frozenset(("wait", "select", "poll", "accept", "_worker", "run_forever"))
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+    pass
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval"""
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        """Initialize the profiler with the sampling interval in seconds"""
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self.stacks: Dict[str, int] = {}
+
+    @staticmethod
+    def _format_frame(frame) -> str:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", code.co_filename)
+        return f"{module}:{code.co_name}"
+
+    def _sample(self, own_thread_id: int, thread_names: Dict[int, str]) -> None:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+
+            frames = []
+            while frame is not None:
+                frames.append(self._format_frame(frame))
+                frame = frame.f_back
+            frames.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            stack = ";".join(reversed(frames))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def run(self, duration: float) -> Dict[str, int]:
+        """Sample for the given number of seconds, blocking the calling thread"""
+        own_thread_id = threading.get_ident()
+        deadline = time.perf_counter() + duration
+        next_sample = time.perf_counter()
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_sample:
+                time.sleep(next_sample - now)
+            # Resolve names each time so threads started mid-profile are labelled
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            self._sample(own_thread_id, thread_names)
+            self.samples += 1
+            next_sample += self.interval
+        return self.stacks
+
+    def collapsed(self) -> str:
+        """Render the samples in collapsed-stack format for flamegraph tools"""
+        lines = [f"{stack} {count}" for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+_profile_lock = threading.Lock()
+
+
+def run_profile(duration: float, interval: float = 0.005, include_idle: bool = False) -> SamplingProfiler:
+    """Run a single sampling profile, raising ProfilerBusy if one is already running"""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        logger.info(f"Sampling profiler running for {duration}s at {interval * 1000:.1f}ms intervals")
+        profiler = SamplingProfiler(interval, include_idle)
+        profiler.run(duration)
+        return profiler
+    finally:
+        _profile_lock.release()
+
+
+class StageTimers:
+    """Records the time spent in named request stages as a histogram"""
+
+    def __init__(self, enabled: bool = False):
+        """Initialize the timers; when disabled timing a stage costs a single check"""
+        self.enabled = enabled
+        self._histogram = get_registry().histogram("mcp_stage_seconds", "Time spent per request stage", STAGE_BUCKETS)
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time the block as the given stage"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._histogram.observe(time.perf_counter() - start, {"stage": stage})
+
+
+_stage_timers = StageTimers()
+
+
+def stage(name: str):
+    """Time a block as a request stage if stage timers are enabled"""
+    return _stage_timers.time(name)
+
+
+def configure_profiling(config: Optional[Dict[str, Any]]) -> None:
+    """Apply the `profiling` section of providers.yaml"""
+    config = config or {}
+    _stage_timers.enabled = bool(config.get("stage_timers", False))
+    if _stage_timers.enabled:
+        logger.info("Per-stage timers enabled")
@@ -0,0 +1,380 @@
+"""
+II-Agent MCP Server Add-On - Tracing Utilities
+Lightweight OpenTelemetry-compatible tracing with W3C trace-context propagation
+and batched export to a JSONL file or an OTLP/HTTP collector
+"""
+import os
+import re
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Mapping, Optional
+
+import requests
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_PATTERN = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class SpanContext:
+    """Identifies a span within a trace"""
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        """Initialize with hex-encoded trace and span ids"""
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        """Format the context as a W3C traceparent header value"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a W3C traceparent header value, returning None if invalid"""
+        if not value:
+            return None
+        match = _TRACEPARENT_PATTERN.match(value.strip().lower())
+        if not match:
+            return None
+        version, trace_id, span_id, flags = match.groups()
+        if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        """Start the span"""
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set a single attribute"""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """Set several attributes"""
+        self.attributes.update(attributes)
+
+    def set_status(self, ok: bool, message: str = "") -> None:
+        """Mark the span as successful or failed"""
+        self.status = STATUS_OK if ok else STATUS_ERROR
+        self.status_message = message
+
+    def end(self) -> None:
+        """End the span"""
+        if self.end_time_ns is None:
+            self.end_time_ns = time.time_ns()
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds"""
+        end = self.end_time_ns or time.time_ns()
+        return (end - self.start_time_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat representation used by the file exporter"""
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_time_ns": self.start_time_ns,
+            "end_time_ns": self.end_time_ns,
+            "duration": self.duration,
+            "status": {STATUS_UNSET: "unset", STATUS_OK: "ok", STATUS_ERROR: "error"}[self.status],
+            "status_message": self.status_message,
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """Span stand-in used when tracing is disabled"""
+
+    context = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_status(self, ok: bool, message: str = "") -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """Base class for span exporters"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends spans to a JSONL file"""
+
+    def __init__(self, path: str):
+        """Initialize the exporter for a file path"""
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with open(self.path, "a") as f:
+            f.write(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """Sends spans to an OpenTelemetry collector using OTLP/HTTP with JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0, headers: Optional[Dict[str, str]] = None):
+        """Initialize the exporter for a collector endpoint such as http://localhost:4318/v1/traces"""
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+    def _encode(self, span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": SPAN_KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.end_time_ns or span.start_time_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": span.status, "message": span.status_message}
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "ii_agent_mcp_mvp"}, "spans": [self._encode(s) for s in spans]}]
+            }]
+        }
+        response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        if response.status_code >= 300:
+            logger.warning(f"OTLP export failed with status {response.status_code}")
+
+    def shutdown(self) -> None:
+        self.session.close()
+
+
+class Tracer:
+    """Creates spans and exports finished spans in batches from a background thread"""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, batch_size: int = 512,
+                 flush_interval: float = 2.0, max_queue_size: int = 8192):
+        """Initialize the tracer; without an exporter every span is a no-op"""
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self._current: contextvars.ContextVar = contextvars.ContextVar("mcp_current_span", default=None)
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.dropped_spans = 0
+
+        if self.exporter is not None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether spans are recorded"""
+        return self.exporter is not None
+
+    def current_span(self) -> Optional[Span]:
+        """Get the active span in the current context"""
+        return self._current.get()
+
+    def extract(self, headers: Mapping[str, str]) -> Optional[SpanContext]:
+        """Extract a remote parent from W3C trace-context headers"""
+        return SpanContext.from_traceparent(headers.get(TRACEPARENT_HEADER))
+
+    def inject(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """Add the current trace context to outgoing headers"""
+        span = self.current_span()
+        if span is not None:
+            headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+        return headers
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal",
+             parent: Optional[SpanContext] = None):
+        """Record a span around the block, as a child of the current or given parent"""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        if parent is None:
+            current = self.current_span()
+            parent = current.context if current is not None else None
+
+        trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        context = SpanContext(trace_id, os.urandom(8).hex(), parent.sampled if parent else True)
+        span = Span(name, context, parent.span_id if parent else None, kind, attributes)
+
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_status(False, f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._current.reset(token)
+            span.end()
+            if context.sampled:
+                self._enqueue(span)
+
+    def _enqueue(self, span: Span) -> None:
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped_spans += 1
+                return
+            self._queue.append(span)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Export all queued spans"""
+        with self._lock:
+            batch, self._queue = self._queue, []
+        if not batch or self.exporter is None:
+            return
+        try:
+            for i in range(0, len(batch), self.batch_size):
+                self.exporter.export(batch[i:i + self.batch_size])
+        except Exception as e:
+            logger.error(f"Error exporting spans: {e}")
+
+    def shutdown(self) -> None:
+        """Flush remaining spans and stop the export thread"""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+# Process-wide tracer, disabled until configured
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer"""
+    return _tracer
+
+
+def configure_tracing(config: Optional[Dict[str, Any]]) -> Tracer:
+    """Configure the process-wide tracer from the `tracing` section of providers.yaml"""
+    global _tracer
+    config = config or {}
+
+    exporter: Optional[SpanExporter] = None
+    if config.get("enabled", False):
+        exporter_type = config.get("exporter", "file")
+        if exporter_type == "file":
+            exporter = FileSpanExporter(config.get("file", "traces.jsonl"))
+        elif exporter_type == "otlp":
+            exporter = OtlpHttpSpanExporter(
+                config.get("otlp_endpoint", "http://localhost:4318/v1/traces"),
+                config.get("service_name", "ii-agent-mcp"),
+                headers=config.get("otlp_headers")
+            )
+        elif exporter_type != "none":
+            logger.warning(f"Unknown tracing exporter {exporter_type}, tracing disabled")
+
+    _tracer.shutdown()
+    _tracer = Tracer(exporter, int(config.get("batch_size", 512)), float(config.get("flush_interval", 2.0)))
+    if exporter is not None:
+        logger.info(f"Tracing enabled with {type(exporter).__name__}")
+    return _tracer
+
+
+class TracingMiddleware:
+    """ASGI middleware recording a server span per request, continuing any incoming W3C trace context"""
+
+    def __init__(self, app):
+        """Initialize the middleware"""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        tracer = get_tracer()
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope.get("headers", [])
+                   if name == b"traceparent"}
+        attributes = {"http.method": method, "http.route": path}
+        with tracer.span(f"{method} {path}", attributes, kind="server", parent=tracer.extract(headers)) as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    span.set_status(message["status"] < 500)
+                    traceparent = (TRACEPARENT_HEADER.encode(), span.context.to_traceparent().encode())
+                    message = {**message, "headers": list(message.get("headers", [])) + [traceparent]}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,175 @@
+"""
+II-Agent MCP Server Add-On - Connection Warm-Up
+Pre-resolves and pre-connects to provider endpoints on startup and keeps idle
+connections alive so the first requests after a deploy do not pay connection setup
+"""
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+
+from .utils.metrics import get_registry, MetricsRegistry
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+WARMUP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ConnectionWarmer:
+    """Warms up provider connection pools and pings them while idle"""
+
+    def __init__(self, provider_factory, connections: int = 2, probe: bool = False, timeout: float = 5.0,
+                 keepalive_interval: float = 30.0, wait_on_startup: bool = False,
+                 registry: Optional[MetricsRegistry] = None):
+        """Initialize the warmer; keepalive_interval 0 disables keep-alive pings
+
+        With wait_on_startup the server waits for warm-up before accepting requests; otherwise
+        warm-up runs in the background so an unreachable provider cannot delay startup.
+        """
+        self.provider_factory = provider_factory
+        self.connections = max(1, connections)
+        self.probe = probe
+        self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self.wait_on_startup = wait_on_startup
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        registry = registry or get_registry()
+        self._durations = registry.histogram("mcp_warmup_seconds", "Time spent on each warm-up step", WARMUP_BUCKETS)
+        self._pings = registry.counter("mcp_keepalive_pings_total", "Keep-alive pings sent to providers by result")
+
+    @classmethod
+    def from_config(cls, provider_factory, config: Optional[Dict[str, Any]]) -> Optional["ConnectionWarmer"]:
+        """Create a warmer from the `warmup` section of providers.yaml, or None if disabled"""
+        config = config or {}
+        if not config.get("enabled", True):
+            return None
+        return cls(
+            provider_factory,
+            int(config.get("connections", 2)),
+            bool(config.get("probe", False)),
+            float(config.get("timeout", 5.0)),
+            float(config.get("keepalive_interval", 30.0)),
+            bool(config.get("wait_on_startup", False))
+        )
+
+    def _timed(self, provider_name: str, step: str, func) -> Any:
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._durations.observe(elapsed, {"provider": provider_name, "step": step})
+            with self._lock:
+                self._status.setdefault(provider_name, {})[f"{step}_seconds"] = round(elapsed, 4)
+
+    def _open_connections(self, provider, count: int) -> int:
+        """Send concurrent HEAD requests so the pool holds count open connections, returning how many succeeded"""
+        def head(_):
+            try:
+                # Streamed responses hold their connection until read, so each request gets its own
+                return provider.session.head(provider.BASE_URL, timeout=self.timeout, stream=True)
+            except Exception as e:
+                logger.warning(f"Could not connect to {provider.name}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            responses = [response for response in pool.map(head, range(count)) if response is not None]
+        for response in responses:
+            # Reading the empty body returns the connection to the pool
+            response.content
+        return len(responses)
+
+    def warm_provider(self, provider) -> Dict[str, Any]:
+        """Resolve, connect and optionally probe one provider"""
+        name = provider.name
+        parts = urlsplit(provider.BASE_URL)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+
+        try:
+            addresses = self._timed(name, "dns", lambda: socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM))
+            dns_ok = bool(addresses)
+        except OSError as e:
+            logger.warning(f"Could not resolve {parts.hostname} for {name}: {e}")
+            dns_ok = False
+
+        connected = self._timed(name, "connect", lambda: self._open_connections(provider, self.connections)) if dns_ok else 0
+
+        probe_ok = None
+        if self.probe and connected and provider.models:
+            # The smallest possible generation, to get past any provider-side cold path
+            result = self._timed(name, "probe", lambda: provider.generate("ping", provider.models[0], max_tokens=1))
+            probe_ok = bool(result.get("success"))
+            if not probe_ok:
+                logger.warning(f"Warm-up probe to {name} failed: {result.get('error')}")
+
+        with self._lock:
+            status = self._status.setdefault(name, {})
+            status.update({"connections": connected, "warmed": connected > 0, "last_ping": time.time()})
+            if probe_ok is not None:
+                status["probe_ok"] = probe_ok
+            return dict(status)
+
+    def warm_up(self) -> Dict[str, Dict[str, Any]]:
+        """Warm every provider in parallel, returning the per-provider results"""
+        providers = self.provider_factory.get_all_providers()
+        if not providers:
+            return {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(providers)) as pool:
+            results = dict(zip((p.name for p in providers), pool.map(self.warm_provider, providers)))
+        logger.info(f"Warmed up {sum(r['warmed'] for r in results.values())}/{len(results)} providers "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return results
+
+    def ping_idle(self) -> None:
+        """Ping providers with no traffic for a keep-alive interval, so their connections are not closed as idle"""
+        now = time.monotonic()
+        for provider in self.provider_factory.get_all_providers():
+            with self._lock:
+                status = self._status.setdefault(provider.name, {})
+                last_ping = status.get("_last_ping_monotonic", 0.0)
+            if now - max(provider.last_request_time, last_ping) < self.keepalive_interval:
+                continue
+            ok = self._open_connections(provider, self.connections) > 0
+            self._pings.inc(1, {"provider": provider.name, "result": "ok" if ok else "error"})
+            with self._lock:
+                status["_last_ping_monotonic"] = time.monotonic()
+                status["last_ping"] = time.time()
+                status["ping_failures"] = 0 if ok else status.get("ping_failures", 0) + 1
+
+    def start(self) -> None:
+        """Start the keep-alive thread"""
+        if self.keepalive_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="connection-keepalive", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        # Wake at half the interval so an idle provider is pinged within one interval of its last use
+        while not self._stop.wait(self.keepalive_interval / 2):
+            try:
+                self.ping_idle()
+            except Exception as e:
+                logger.error(f"Keep-alive ping failed: {e}")
+
+    def stop(self) -> None:
+        """Stop the keep-alive thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout)
+            self._thread = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get warm-up results and keep-alive state per provider"""
+        with self._lock:
+            return {
+                name: {k: v for k, v in status.items() if not k.startswith("_")}
+                for name, status in self._status.items()
+            }
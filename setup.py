@@ -7,7 +7,7 @@ from setuptools import setup, find_packages
 setup(
     name="ii-agent-mcp-mvp",
     version="0.1.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=[
         "fastapi>=0.104.0",
         "uvicorn>=0.23.2",
@@ -17,10 +17,16 @@ setup(
         "cryptography>=41.0.4",
         "python-dotenv>=1.0.0"
     ],
+    extras_require={
+        "fast": ["orjson>=3.8"],
+        "compression": ["brotli>=1.2", "zstandard>=0.21"],
+        "cache": ["numpy>=1.24"],
+    },
     entry_points={
         "console_scripts": [
             "mcp-setup=ii_agent_mcp_mvp.setup:main",
             "mcp-server=ii_agent_mcp_mvp.main:main",
+            "mcp-replay=ii_agent_mcp_mvp.replay:main",
         ],
     },
     author="II-Agent Team",
@@ -27,6 +27,30 @@ def main():
     parser.add_argument("--skip-providers", action="store_true", help="Skip provider tests")
     parser.add_argument("--skip-fallback", action="store_true", help="Skip fallback tests")
     parser.add_argument("--skip-security", action="store_true", help="Skip security tests")
+    parser.add_argument("--skip-usage", action="store_true", help="Skip usage accounting tests")
+    parser.add_argument("--skip-tokens", action="store_true", help="Skip token estimation tests")
+    parser.add_argument("--skip-admission", action="store_true", help="Skip admission control tests")
+    parser.add_argument("--skip-clients", action="store_true", help="Skip client quota tests")
+    parser.add_argument("--skip-mock-upstream", action="store_true", help="Skip mock upstream HTTP tests")
+    parser.add_argument("--skip-chaos", action="store_true", help="Skip fault injection tests")
+    parser.add_argument("--skip-tracing", action="store_true", help="Skip tracing tests")
+    parser.add_argument("--skip-profiling", action="store_true", help="Skip profiling tests")
+    parser.add_argument("--skip-jsonlib", action="store_true", help="Skip JSON utility tests")
+    parser.add_argument("--skip-compression", action="store_true", help="Skip compression tests")
+    parser.add_argument("--skip-cache", action="store_true", help="Skip semantic cache tests")
+    parser.add_argument("--skip-replay", action="store_true", help="Skip replay log tests")
+    parser.add_argument("--skip-warmup", action="store_true", help="Skip connection warm-up tests")
+    parser.add_argument("--skip-health", action="store_true", help="Skip health check tests")
+    parser.add_argument("--skip-lifecycle", action="store_true", help="Skip graceful shutdown tests")
+    parser.add_argument("--skip-keys", action="store_true", help="Skip API key pool tests")
+    parser.add_argument("--skip-routing", action="store_true", help="Skip routing table tests")
+    parser.add_argument("--skip-errors", action="store_true", help="Skip upstream error tests")
+    parser.add_argument("--skip-cancellation", action="store_true", help="Skip request cancellation tests")
+    parser.add_argument("--skip-downgrade", action="store_true", help="Skip model downgrade tests")
+    parser.add_argument("--skip-shadow", action="store_true", help="Skip shadow traffic tests")
+    parser.add_argument("--skip-jobs", action="store_true", help="Skip background job tests")
+    parser.add_argument("--skip-embeddings", action="store_true", help="Skip embeddings tests")
+    parser.add_argument("--skip-openai", action="store_true", help="Skip OpenAI-compatible API tests")
     args = parser.parse_args()
     
     # Get directory of this script
@@ -45,6 +69,126 @@ def main():
         fallback_script = os.path.join(script_dir, "test_fallback.py")
         results["fallback"] = run_test(fallback_script)
     
+    # Run usage accounting tests
+    if not args.skip_usage:
+        usage_script = os.path.join(script_dir, "test_usage.py")
+        results["usage"] = run_test(usage_script)
+    
+    # Run token estimation tests
+    if not args.skip_tokens:
+        tokens_script = os.path.join(script_dir, "test_tokens.py")
+        results["tokens"] = run_test(tokens_script)
+    
+    # Run admission control tests
+    if not args.skip_admission:
+        admission_script = os.path.join(script_dir, "test_admission.py")
+        results["admission"] = run_test(admission_script)
+    
+    # Run client quota tests
+    if not args.skip_clients:
+        clients_script = os.path.join(script_dir, "test_clients.py")
+        results["clients"] = run_test(clients_script)
+    
+    # Run provider tests against the local mock upstream
+    if not args.skip_mock_upstream:
+        mock_upstream_script = os.path.join(script_dir, "test_mock_upstream.py")
+        results["mock upstream"] = run_test(mock_upstream_script)
+    
+    # Run fault injection tests
+    if not args.skip_chaos:
+        chaos_script = os.path.join(script_dir, "test_chaos.py")
+        results["chaos"] = run_test(chaos_script)
+    
+    # Run tracing tests
+    if not args.skip_tracing:
+        tracing_script = os.path.join(script_dir, "test_tracing.py")
+        results["tracing"] = run_test(tracing_script)
+    
+    # Run profiling tests
+    if not args.skip_profiling:
+        profiling_script = os.path.join(script_dir, "test_profiling.py")
+        results["profiling"] = run_test(profiling_script)
+    
+    # Run JSON utility tests
+    if not args.skip_jsonlib:
+        jsonlib_script = os.path.join(script_dir, "test_jsonlib.py")
+        results["jsonlib"] = run_test(jsonlib_script)
+    
+    # Run compression tests
+    if not args.skip_compression:
+        compression_script = os.path.join(script_dir, "test_compression.py")
+        results["compression"] = run_test(compression_script)
+    
+    # Run semantic cache tests
+    if not args.skip_cache:
+        cache_script = os.path.join(script_dir, "test_cache.py")
+        results["cache"] = run_test(cache_script)
+    
+    # Run replay log tests
+    if not args.skip_replay:
+        replay_script = os.path.join(script_dir, "test_replay.py")
+        results["replay"] = run_test(replay_script)
+    
+    # Run connection warm-up tests
+    if not args.skip_warmup:
+        warmup_script = os.path.join(script_dir, "test_warmup.py")
+        results["warmup"] = run_test(warmup_script)
+    
+    # Run health check tests
+    if not args.skip_health:
+        health_script = os.path.join(script_dir, "test_health.py")
+        results["health"] = run_test(health_script)
+    
+    # Run graceful shutdown tests
+    if not args.skip_lifecycle:
+        lifecycle_script = os.path.join(script_dir, "test_lifecycle.py")
+        results["lifecycle"] = run_test(lifecycle_script)
+    
+    # Run API key pool tests
+    if not args.skip_keys:
+        keys_script = os.path.join(script_dir, "test_keys.py")
+        results["keys"] = run_test(keys_script)
+    
+    # Run routing table tests
+    if not args.skip_routing:
+        routing_script = os.path.join(script_dir, "test_routing.py")
+        results["routing"] = run_test(routing_script)
+    
+    # Run upstream error tests
+    if not args.skip_errors:
+        errors_script = os.path.join(script_dir, "test_errors.py")
+        results["errors"] = run_test(errors_script)
+    
+    # Run request cancellation tests
+    if not args.skip_cancellation:
+        cancellation_script = os.path.join(script_dir, "test_cancellation.py")
+        results["cancellation"] = run_test(cancellation_script)
+    
+    # Run model downgrade tests
+    if not args.skip_downgrade:
+        downgrade_script = os.path.join(script_dir, "test_downgrade.py")
+        results["downgrade"] = run_test(downgrade_script)
+    
+    # Run shadow traffic tests
+    if not args.skip_shadow:
+        shadow_script = os.path.join(script_dir, "test_shadow.py")
+        results["shadow"] = run_test(shadow_script)
+    
+    # Run background job tests
+    if not args.skip_jobs:
+        jobs_script = os.path.join(script_dir, "test_jobs.py")
+        results["jobs"] = run_test(jobs_script)
+    
+    # Run embeddings tests
+    if not args.skip_embeddings:
+        embeddings_script = os.path.join(script_dir, "test_embeddings.py")
+        results["embeddings"] = run_test(embeddings_script)
+    
+    # Run OpenAI-compatible API tests
+    if not args.skip_openai:
+        openai_script = os.path.join(script_dir, "test_openai_compat.py")
+        results["openai"] = run_test(openai_script)
+    
     # Run provider tests if API keys provided
     if not args.skip_providers and (args.gemini_key or args.deepseek_key or args.mistral_key):
         provider_script = os.path.join(script_dir, "test_providers.py")
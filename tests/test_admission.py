@@ -0,0 +1,201 @@
+"""
+II-Agent MCP Server Add-On - Test Admission Control
+Tests priority admission, load shedding and per-provider concurrency caps, fixed and adaptive
+"""
+import os
+import sys
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.admission import AdaptiveLimit, AdmissionController, AdmissionRejected, FairSemaphore, ProviderSlots
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.providers.errors import UpstreamError
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class AdmissionTester(unittest.IsolatedAsyncioTestCase):
+    """Tests admission control functionality"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.registry = MetricsRegistry()
+        self.controller = AdmissionController(
+            max_concurrent=1,
+            queue_sizes={"interactive": 2, "default": 2, "batch": 1},
+            queue_timeout=0.5,
+            registry=self.registry
+        )
+
+    async def test_priority_order(self):
+        """Test that interactive waiters are admitted before batch waiters"""
+        await self.controller.acquire("default")
+        order = []
+
+        async def waiter(priority):
+            await self.controller.acquire(priority)
+            order.append(priority)
+            self.controller.release()
+
+        tasks = [asyncio.create_task(waiter("batch"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(waiter("interactive")))
+        await asyncio.sleep(0)
+        self.assertEqual(self.controller.queue_depth(), 2)
+
+        self.controller.release()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(order, ["interactive", "batch"])
+        self.assertEqual(self.controller.active, 0)
+
+    async def test_queue_full_sheds_with_429(self):
+        """Test fast rejection when a class queue overflows"""
+        await self.controller.acquire("default")
+        waiter = asyncio.create_task(self.controller.acquire("batch"))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            await self.controller.acquire("batch")
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        self.controller.release()
+        await waiter
+        self.controller.release()
+
+    async def test_queue_timeout_sheds_with_503(self):
+        """Test rejection when a waiter is not admitted in time"""
+        await self.controller.acquire("default")
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            await self.controller.acquire("interactive")
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(self.controller.queue_depth(), 0)
+
+        self.controller.release()
+        self.assertEqual(self.controller.active, 0)
+        self.assertEqual(self.registry.histogram("mcp_admission_wait_seconds", "").get_count({"priority": "default"}), 1)
+
+    def test_provider_slots(self):
+        """Test that a saturated provider is reported instead of blocking forever"""
+        slots = ProviderSlots({"gemini": 1}, wait_timeout=0.05, registry=self.registry)
+        results = []
+
+        with slots.slot("gemini") as first:
+            thread = threading.Thread(target=lambda: results.append(slots.slot("gemini").__enter__()))
+            thread.start()
+            thread.join()
+            with slots.slot("mistral") as unlimited:
+                self.assertTrue(unlimited)
+            self.assertTrue(first)
+
+        self.assertEqual(results, [False])
+        with slots.slot("gemini") as again:
+            self.assertTrue(again)
+
+class AdaptiveConcurrencyTester(unittest.TestCase):
+    """Tests adaptive per-provider concurrency limits"""
+
+    def test_gradient_grows_while_latency_is_flat(self):
+        """Test that steady latency raises a busy limit but not an idle one"""
+        limit = AdaptiveLimit(initial_limit=4, max_limit=16)
+        for _ in range(20):
+            limit.update(1.0, inflight=1)
+        self.assertEqual(limit.limit, 4)
+        for _ in range(40):
+            limit.update(1.0, inflight=limit.limit)
+        self.assertEqual(limit.limit, 16)
+
+    def test_gradient_backs_off_when_latency_climbs(self):
+        """Test that rising latency and overload failures lower the limit, bounded by min_limit"""
+        limit = AdaptiveLimit(initial_limit=16, min_limit=2)
+        for _ in range(10):
+            limit.update(1.0, inflight=16)
+        before = limit.limit
+        for _ in range(5):
+            limit.update(5.0, inflight=16)
+        self.assertLess(limit.limit, before)
+        for _ in range(50):
+            limit.update(5.0, inflight=16, dropped=True)
+        self.assertEqual(limit.limit, 2)
+
+    def test_aimd(self):
+        """Test additive increase per window and multiplicative decrease on slow or failed calls"""
+        limit = AdaptiveLimit(initial_limit=4, algorithm="aimd", backoff=0.5)
+        for _ in range(4):
+            limit.update(1.0, inflight=4)
+        self.assertEqual(limit.limit, 4)
+        limit.update(1.0, inflight=4)
+        self.assertEqual(limit.limit, 5)
+        limit.update(1.0, inflight=5, dropped=True)
+        self.assertEqual(limit.limit, 2)
+        limit.update(3.0, inflight=2)
+        self.assertEqual(limit.limit, 1)
+        with self.assertRaises(ValueError):
+            AdaptiveLimit(algorithm="vegas")
+
+    def test_semaphore_limit_changes(self):
+        """Test that raising the limit admits waiters and lowering it retires permits as they are released"""
+        semaphore = FairSemaphore(1)
+        self.assertTrue(semaphore.acquire())
+        granted = []
+        thread = threading.Thread(target=lambda: granted.append(semaphore.acquire(timeout=2)))
+        thread.start()
+        while not semaphore.waiting:
+            pass
+        semaphore.set_limit(2)
+        thread.join()
+        self.assertEqual((granted, semaphore.active), ([True], 2))
+
+        semaphore.set_limit(1)
+        semaphore.release()
+        self.assertEqual(semaphore.active, 1)
+        self.assertFalse(semaphore.acquire(timeout=0.01))
+        semaphore.release()
+        self.assertTrue(semaphore.acquire(timeout=0.01))
+
+    def test_provider_slots_record(self):
+        """Test that overload failures through the handler lower the exported limit"""
+        registry = MetricsRegistry()
+        slots = ProviderSlots(4, registry=registry, adaptive={"backoff": 0.5})
+        provider = MagicMock()
+        provider.rate_limit_remaining = None
+        error = UpstreamError.from_status(429)
+        provider.generate.return_value = {"success": False, "error": str(error), "upstream_error": error}
+        factory = MagicMock()
+        factory.get_provider = lambda name: provider
+        handler = FallbackHandler(factory, max_retries=1, provider_slots=slots)
+
+        handler.process_request("hi", "default", ["gemini"])
+        self.assertEqual(registry.gauge("mcp_provider_concurrency_limit", "").get({"provider": "gemini"}), 2)
+        self.assertEqual(registry.gauge("mcp_provider_queue_length", "").get({"provider": "gemini"}), 0)
+
+        error = UpstreamError.from_status(401)
+        provider.generate.return_value = {"success": False, "error": str(error), "upstream_error": error}
+        handler.process_request("hi", "default", ["gemini"])
+        status = slots.get_status()["gemini"]
+        self.assertEqual((status["limit"], status["active"], status["queued"]), (2, 0, 0))
+        self.assertEqual(status["adaptive"]["algorithm"], "gradient")
+
+    def test_from_config(self):
+        """Test that adaptive limits are only used when enabled"""
+        self.assertIsNone(ProviderSlots.from_config({"adaptive_concurrency": {"enabled": False}}).adaptive)
+        slots = ProviderSlots.from_config({"adaptive_concurrency": {"enabled": True, "initial_limit": 3}})
+        with slots.slot("mistral") as acquired:
+            self.assertTrue(acquired)
+        self.assertEqual(slots.get_status()["mistral"]["limit"], 3)
+
+def main():
+    """Main entry point for admission tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
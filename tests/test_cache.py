@@ -0,0 +1,140 @@
+"""
+II-Agent MCP Server Add-On - Test Semantic Cache
+Tests prompt normalization, similarity lookups and eviction
+"""
+import os
+import sys
+import time
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp import cache
+from ii_agent_mcp_mvp.cache import SemanticCache, VectorIndex, HashingVectorizer, normalize_prompt
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+PROMPT = ("You are a coding agent. Summarize the failing tests in the attached CI log "
+          "and propose a minimal fix for each failure, citing file names and line numbers.")
+RESULT = {"text": "cached answer", "model": "gemini-1.5-flash", "provider": "gemini", "usage": None}
+
+class NormalizationTester(unittest.TestCase):
+    """Tests prompt normalization"""
+
+    def test_volatile_fragments(self):
+        """Test that whitespace, case, timestamps and ids do not change the normalized prompt"""
+        a = normalize_prompt("Run  at 2024-05-01T10:00:00Z for job 123e4567-e89b-12d3-a456-426614174000\n")
+        b = normalize_prompt("run at 2024-06-30 23:59 for JOB 00000000-1111-2222-3333-444444444444\n")
+        self.assertEqual(a, b)
+        self.assertEqual(normalize_prompt("now is 1716000000, at 9:30 pm"), normalize_prompt("now is 1716999999, at 10:05"))
+        self.assertNotEqual(normalize_prompt("version 2"), normalize_prompt("version 3"))
+
+    def test_from_config(self):
+        """Test that the cache is only created when enabled and numpy is available"""
+        self.assertIsNone(SemanticCache.from_config(None))
+        self.assertIsNone(SemanticCache.from_config({"enabled": False}))
+        if cache.np is None:
+            self.assertIsNone(SemanticCache.from_config({"enabled": True}))
+
+@unittest.skipUnless(cache.np is not None, "numpy is not installed")
+class SemanticCacheTester(unittest.TestCase):
+    """Tests semantic cache functionality"""
+
+    def setUp(self):
+        """Create a small cache"""
+        self.cache = SemanticCache(similarity_threshold=0.9, max_entries=3, ttl=60, dimensions=256, registry=MetricsRegistry())
+
+    def test_near_duplicate_hit(self):
+        """Test that trivially different prompts hit and different prompts miss"""
+        self.cache.store(PROMPT, "ns", RESULT)
+
+        hit = self.cache.lookup("  " + PROMPT.replace("minimal", "small") + " ", "ns")
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit[0]["text"], "cached answer")
+        self.assertGreaterEqual(hit[1], 0.9)
+
+        self.assertEqual(self.cache.lookup(PROMPT.upper(), "ns")[1], 1.0)
+        self.assertIsNone(self.cache.lookup("Write a haiku about the sea.", "ns"))
+        self.assertIsNone(self.cache.lookup(PROMPT, "other-model"))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted at capacity"""
+        prompts = [f"Describe the history of {topic} in detail" for topic in ("rome", "egypt", "china", "peru")]
+        for prompt in prompts[:3]:
+            self.cache.store(prompt, "ns", {**RESULT, "text": prompt})
+        self.assertIsNotNone(self.cache.lookup(prompts[0], "ns"))
+
+        self.cache.store(prompts[3], "ns", {**RESULT, "text": prompts[3]})
+        self.assertEqual(self.cache.get_status()["entries"], 3)
+        self.assertIsNone(self.cache.lookup(prompts[1], "ns"))
+        self.assertIsNotNone(self.cache.lookup(prompts[0], "ns"))
+        self.assertIsNotNone(self.cache.lookup(prompts[3], "ns"))
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are not served"""
+        self.cache.ttl = 0.05
+        self.cache.store(PROMPT, "ns", RESULT)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.lookup(PROMPT, "ns"))
+        self.assertEqual(self.cache.get_status()["entries"], 0)
+
+    def test_replaced_between_lookup_steps(self):
+        """Test that a lookup never returns another prompt's entry stored in the slot it found"""
+        prompts = [f"Describe the history of {topic} in detail" for topic in ("rome", "egypt")]
+        self.cache.store(prompts[0], "ns", {**RESULT, "text": prompts[0]})
+        lock = self.cache._lock
+        hooks = [lambda: (self.cache.clear(), self.cache.store(prompts[1], "ns", {**RESULT, "text": prompts[1]}))]
+
+        class InterleavingLock:
+            """Lets another store run each time the lookup releases the lock"""
+            def __enter__(self):
+                lock.acquire()
+
+            def __exit__(self, *exc_info):
+                lock.release()
+                if hooks:
+                    hooks.pop()()
+
+        self.cache._lock = InterleavingLock()
+        hit = self.cache.lookup(prompts[0], "ns")
+        self.assertTrue(hit is None or hit[0]["text"] == prompts[0])
+
+    def test_other_namespaces_do_not_crowd_out(self):
+        """Test that near-duplicates stored by many other namespaces do not hide the caller's own entry"""
+        cache = SemanticCache(similarity_threshold=0.8, max_entries=100, ttl=60, dimensions=256, registry=MetricsRegistry())
+        cache.store(PROMPT, "mine", RESULT)
+        query = PROMPT.replace("minimal", "small")
+        for i in range(12):
+            cache.store(query + f" variant {i}", f"other{i}", {**RESULT, "text": f"other {i}"})
+
+        hit = cache.lookup(query, "mine")
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit[0]["text"], "cached answer")
+        self.assertIsNone(cache.lookup(query, "unused"))
+
+    def test_lsh_index(self):
+        """Test approximate search once the index is past the exhaustive search limit"""
+        vectorizer = HashingVectorizer(256)
+        index = VectorIndex(256, 200, exact_search_limit=10)
+        slots = {}
+        for i in range(150):
+            slots[i] = index.add(vectorizer.embed(normalize_prompt(f"ticket {i} about topic {i * 7} and area {i * 13}")))
+
+        query = vectorizer.embed(normalize_prompt("ticket 42 about topic 294 and area 546"))
+        self.assertEqual(index.search(query)[0][0], slots[42])
+        self.assertEqual([slot for slot, _ in index.search(query, slots={slots[7]})], [slots[7]])
+
+        index.remove(slots[42])
+        self.assertNotIn(slots[42], [slot for slot, _ in index.search(query)])
+        self.assertEqual(len(index), 149)
+
+def main():
+    """Main entry point for semantic cache tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
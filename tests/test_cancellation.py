@@ -0,0 +1,114 @@
+"""
+II-Agent MCP Server Add-On - Test Cancellation
+Tests aborting upstream calls and fallback attempts for disconnected clients
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.cancellation import CancellationToken, RequestCancelled, cancellation_scope
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class CancellationTester(unittest.TestCase):
+    """Tests cancelling generations in the fallback handler"""
+
+    def setUp(self):
+        """Start a slow, failing upstream behind two providers"""
+        self.upstream = MockUpstream(UpstreamBehaviour(latency=2.0, error_rate=1.0)).start()
+        self.factory = ProviderFactory()
+        self.factory.create_provider("deepseek", "key", ["deepseek-chat"], f"{self.upstream.url}/v1")
+        self.factory.create_provider("mistral", "key", ["mistral-small"], f"{self.upstream.url}/v1")
+        self.handler = FallbackHandler(self.factory, max_retries=2)
+
+    def tearDown(self):
+        """Stop the upstream"""
+        self.upstream.stop()
+
+    def generate(self, token):
+        return self.handler.process_request("hi", "default", ["deepseek", "mistral"], cancel_token=token)
+
+    def test_cancel_aborts_in_flight_call(self):
+        """Test that cancelling unblocks the upstream call and skips remaining retries and providers"""
+        token = CancellationToken()
+        results = {}
+        thread = threading.Thread(target=lambda: results.update(self.generate(token)))
+        thread.start()
+        time.sleep(0.3)
+        start = time.perf_counter()
+        token.cancel("client disconnected")
+        thread.join(5)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(results["error_type"], "cancelled")
+        self.assertEqual(results["attempts"], 1)
+        self.assertEqual(self.upstream.behaviour.stats["requests"], 1)
+
+    def test_cancelled_before_start(self):
+        """Test that a request cancelled while queued never reaches an upstream"""
+        token = CancellationToken()
+        token.cancel()
+        self.assertEqual(self.generate(token)["attempts"], 0)
+        self.assertEqual(self.upstream.behaviour.stats["requests"], 0)
+        with self.assertRaises(RequestCancelled):
+            token.raise_if_cancelled()
+
+    def test_connections_reusable_after_cancel(self):
+        """Test that cancellation leaves the connection pool usable and other calls untouched"""
+        token = CancellationToken()
+        thread = threading.Thread(target=self.generate, args=(token,))
+        thread.start()
+        time.sleep(0.3)
+        token.cancel()
+        thread.join(5)
+
+        self.upstream.behaviour.latency = 0.0
+        self.upstream.behaviour.error_rate = 0.0
+        provider = self.factory.get_provider("deepseek")
+        with cancellation_scope(CancellationToken()):
+            self.assertTrue(provider.generate("hi", "deepseek-chat")["success"])
+        self.assertTrue(provider.generate("hi", "deepseek-chat")["success"])
+
+class ServerCancellationTester(unittest.TestCase):
+    """Tests client disconnects against the server"""
+
+    def test_disconnect_cancels_generation(self):
+        """Test that a client timing out stops the server's upstream calls and is counted"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=1.0, error_rate=1.0)).start()
+        gateway = GatewayProcess(upstream.url, ["gemini", "deepseek"], {"health_check": {"enabled": False}})
+        try:
+            gateway.start()
+            with self.assertRaises(requests.Timeout):
+                requests.post(f"{gateway.url}/generate", json={"prompt": "hi"}, timeout=0.3)
+            # Without cancellation, two providers with two attempts each would take about 4s
+            time.sleep(2.0)
+            self.assertEqual(upstream.behaviour.stats["requests"], 1)
+            metrics = requests.get(f"{gateway.url}/metrics", timeout=5).text
+            self.assertIn('mcp_requests_cancelled_total{path="/generate"} 1.0', metrics)
+
+            upstream.behaviour.latency = 0.0
+            upstream.behaviour.error_rate = 0.0
+            response = requests.post(f"{gateway.url}/generate", json={"prompt": "hi"}, timeout=10)
+            self.assertEqual(response.status_code, 200)
+        finally:
+            gateway.stop()
+            upstream.stop()
+
+def main():
+    """Main entry point for cancellation tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+II-Agent MCP Server Add-On - Test Fault Injection
+Tests fallback timing and upstream traffic against fault-injected providers
+"""
+import os
+import sys
+import time
+import random
+import unittest
+from typing import Dict, Any, List
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour, mock_embedding
+from ii_agent_mcp_mvp.providers.base import AbstractProvider
+from ii_agent_mcp_mvp.providers.chaos import FaultProfile, FaultInjectingProvider, ChaosController
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class StubProvider(AbstractProvider):
+    """Provider that always succeeds without network access"""
+
+    def validate_api_key(self) -> bool:
+        return True
+
+    def discover_models(self) -> List[str]:
+        return self.models
+
+    def generate(self, prompt: str, model: str, **kwargs) -> Dict[str, Any]:
+        self._update_metrics(True)
+        return {"success": True, "text": "stub response", "model": model, "provider": self.name, "latency": 0.0}
+
+class ChaosTester(unittest.TestCase):
+    """Tests fault injection functionality"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.registry = MetricsRegistry()
+        self.provider_factory = ProviderFactory()
+        self.primary = StubProvider("key", ["stub-model"])
+        self.secondary = StubProvider("key", ["stub-model"])
+        self.provider_factory.providers = {"primary": self.primary, "secondary": self.secondary}
+        self.fallback_handler = FallbackHandler(self.provider_factory, max_retries=2)
+
+    def test_latency_distributions(self):
+        """Test latency sampling for each distribution"""
+        rng = random.Random(0)
+        self.assertEqual(FaultProfile({"value": 0.2}).sample_latency(rng), 0.2)
+        self.assertTrue(0.1 <= FaultProfile({"distribution": "uniform", "min": 0.1, "max": 0.3}).sample_latency(rng) <= 0.3)
+        self.assertLessEqual(FaultProfile({"distribution": "exponential", "mean": 5, "max_delay": 1}).sample_latency(rng), 1)
+        self.assertGreater(FaultProfile({"distribution": "lognormal", "median": 0.1}).sample_latency(rng), 0)
+        with self.assertRaises(ValueError):
+            FaultProfile({"distribution": "pareto"})
+        with self.assertRaises(ValueError):
+            FaultProfile(error_rate=0.8, reset_rate=0.5)
+
+    def test_errors_with_real_latency(self):
+        """Test that injected errors cost real time before falling back"""
+        self.provider_factory.providers["primary"] = FaultInjectingProvider(
+            self.primary, FaultProfile({"value": 0.05}, error_rate=1.0, error_codes=[503]), seed=0, registry=self.registry
+        )
+
+        start = time.time()
+        result = self.fallback_handler.process_request("prompt", "stub-model", ["primary", "secondary"])
+        elapsed = time.time() - start
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["attempts"], 3)
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertEqual(self.primary.failure_count, 2)
+        self.assertEqual(self.registry.counter("mcp_chaos_faults_total", "").get({"provider": "stub", "fault": "error"}), 2)
+
+    def test_rate_limit_fault(self):
+        """Test that injected rate limits move on after one attempt and update headroom"""
+        self.provider_factory.providers["primary"] = FaultInjectingProvider(
+            self.primary, FaultProfile(rate_limit_rate=1.0, rate_limit_remaining=0), registry=self.registry
+        )
+
+        result = self.fallback_handler.process_request("prompt", "stub-model", ["primary", "secondary"])
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["attempts"], 2)
+        self.assertEqual(self.primary.rate_limit_remaining, 0)
+
+    def test_partial_response_wastes_upstream_call(self):
+        """Test that partial responses still count as upstream traffic"""
+        wrapped = FaultInjectingProvider(self.primary, FaultProfile(partial_rate=1.0), registry=self.registry)
+        result = wrapped.generate("prompt", "stub-model")
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["partial_text"], "stub r")
+        self.assertEqual(self.primary.request_count, 2)
+
+    def test_controller(self):
+        """Test enabling and disabling chaos mode at runtime"""
+        controller = ChaosController(self.provider_factory)
+        controller.apply_config({"enabled": True, "providers": {"primary": {"reset_rate": 1.0}}})
+
+        self.assertIsInstance(self.provider_factory.get_provider("primary"), FaultInjectingProvider)
+        self.assertEqual(controller.get_status()["primary"]["reset_rate"], 1.0)
+        self.assertIn("chaos", self.provider_factory.get_provider_status()["primary"])
+        self.assertFalse(controller.enable("missing", FaultProfile()))
+
+        self.assertTrue(controller.disable("primary"))
+        self.assertIs(self.provider_factory.get_provider("primary"), self.primary)
+        self.assertFalse(controller.disable("primary"))
+
+class ChaosEmbeddingsTester(unittest.TestCase):
+    """Tests embeddings through a fault-injected provider"""
+
+    def setUp(self):
+        """Start the mock upstream"""
+        self.upstream = MockUpstream(UpstreamBehaviour(latency=0.0)).start()
+
+    def tearDown(self):
+        """Stop the mock upstream"""
+        self.upstream.stop()
+
+    def test_wrapper_forwards_embeddings(self):
+        """Test that the wrapper exposes the inner provider's embeddings API and injects faults into it"""
+        factory = ProviderFactory()
+        gemini = factory.create_provider("gemini", "key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        wrapped = FaultInjectingProvider(gemini, FaultProfile(), registry=MetricsRegistry())
+        self.assertEqual((wrapped.BASE_URL, wrapped.EMBEDDING_MODEL), (gemini.BASE_URL, "text-embedding-004"))
+        self.assertEqual(wrapped.max_embedding_batch, gemini.max_embedding_batch)
+        self.assertTrue(wrapped.supports_embeddings)
+        self.assertEqual(wrapped.embed(["a"])["embeddings"], [mock_embedding("a")])
+
+        wrapped.profile = FaultProfile(reset_rate=1.0)
+        self.assertFalse(wrapped.embed(["a"])["success"])
+
+    def test_embeddings_endpoint(self):
+        """Test /embeddings with chaos mode enabled for the embedding provider"""
+        gateway = GatewayProcess(self.upstream.url, ["gemini"], {
+            "health_check": {"enabled": False},
+            "chaos": {"enabled": True, "providers": {"gemini": {"latency": {"value": 0.01}}}}
+        })
+        try:
+            gateway.start()
+            response = requests.post(f"{gateway.url}/embeddings", json={"input": ["one", "two"]}, timeout=10)
+            self.assertEqual(response.status_code, 200, response.text)
+            body = response.json()
+            self.assertEqual((body["provider"], body["model"]), ("gemini", "text-embedding-004"))
+            self.assertEqual([item["embedding"] for item in body["data"]], [mock_embedding("one"), mock_embedding("two")])
+        finally:
+            gateway.stop()
+
+class ChaosStreamingTester(unittest.TestCase):
+    """Tests streamed generations through a fault-injected provider"""
+
+    def setUp(self):
+        """Start the mock upstream and wrap a Gemini provider pointed at it"""
+        self.upstream = MockUpstream(UpstreamBehaviour(latency=0.0, stream_chunks=4)).start()
+        factory = ProviderFactory()
+        self.gemini = factory.create_provider("gemini", "key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        self.wrapped = FaultInjectingProvider(self.gemini, FaultProfile(), registry=MetricsRegistry())
+
+    def tearDown(self):
+        """Stop the mock upstream"""
+        self.upstream.stop()
+
+    def test_stream_passes_through(self):
+        """Test that the wrapper streams the inner provider's events"""
+        result = self.wrapped.generate_stream("hi", "gemini-1.5-flash")
+        self.assertTrue(result["success"], result)
+        events = list(result["stream"])
+        self.assertEqual(len([event for event in events if event.get("text")]), 4)
+        self.assertEqual(events[-1]["usage"]["completion_tokens"], 64)
+
+    def test_stream_faults(self):
+        """Test that injected failures end the call before streaming and partial faults drop the stream"""
+        self.wrapped.profile = FaultProfile(error_rate=1.0, error_codes=[503])
+        result = self.wrapped.generate_stream("hi", "gemini-1.5-flash")
+        self.assertFalse(result["success"])
+        self.assertEqual(self.upstream.behaviour.key_requests.get("key", 0), 0)
+
+        self.wrapped.profile = FaultProfile(partial_rate=1.0)
+        result = self.wrapped.generate_stream("hi", "gemini-1.5-flash")
+        self.assertTrue(result["success"], result)
+        stream = result["stream"]
+        self.assertTrue(next(stream)["text"])
+        with self.assertRaises(ConnectionError):
+            next(stream)
+        self.assertEqual(self.upstream.behaviour.key_requests["key"], 1)
+
+def main():
+    """Main entry point for chaos tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
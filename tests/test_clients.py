@@ -0,0 +1,113 @@
+"""
+II-Agent MCP Server Add-On - Test Client Quotas
+Tests client identification, quota enforcement and weighted fair scheduling
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.admission import WeightedFairQueue
+from ii_agent_mcp_mvp.clients import ClientRegistry, QuotaTracker, QuotaExceeded
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class ClientTester(unittest.TestCase):
+    """Tests client quota functionality"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.temp_dir.name, "quota_state.json")
+        self.registry = ClientRegistry([
+            {"name": "prod", "api_key": "prod-key", "weight": 3, "requests_per_minute": 2, "tokens_per_day": 100},
+            {"name": "dev", "api_key": "dev-key"}
+        ], require_api_key=True)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.temp_dir.cleanup()
+
+    def test_identify(self):
+        """Test client lookup from both supported headers"""
+        self.assertEqual(self.registry.identify({"x-api-key": "prod-key"}).name, "prod")
+        self.assertEqual(self.registry.identify({"authorization": "Bearer dev-key"}).name, "dev")
+        self.assertIsNone(self.registry.identify({"authorization": "Bearer wrong"}))
+        self.assertIsNone(self.registry.identify({}))
+        self.assertEqual(self.registry.clients["prod"].weight, 3.0)
+
+    def test_request_and_token_quotas(self):
+        """Test that exhausted quotas raise with a retry hint"""
+        tracker = QuotaTracker(registry=MetricsRegistry())
+        prod = self.registry.clients["prod"]
+        dev = self.registry.clients["dev"]
+
+        tracker.consume_request(prod)
+        tracker.consume_request(prod)
+        with self.assertRaises(QuotaExceeded) as ctx:
+            tracker.consume_request(prod)
+        self.assertEqual(ctx.exception.quota, "requests_per_minute")
+        self.assertTrue(1 <= ctx.exception.retry_after <= 60)
+
+        # Clients without quotas are never limited
+        for _ in range(10):
+            tracker.consume_request(dev)
+
+        tracker._counters["prod"]["minute"]["requests"] = 0
+        tracker.record_tokens(prod, 150)
+        with self.assertRaises(QuotaExceeded) as ctx:
+            tracker.consume_request(prod)
+        self.assertEqual(ctx.exception.quota, "tokens_per_day")
+
+    def test_batch_requests(self):
+        """Test that several requests are counted together or not at all"""
+        tracker = QuotaTracker(registry=MetricsRegistry())
+        prod = self.registry.clients["prod"]
+        with self.assertRaises(QuotaExceeded):
+            tracker.consume_request(prod, 3)
+        tracker.consume_request(prod, 2)
+        self.assertEqual(tracker.get_usage(prod)["requests_per_minute"]["used"], 2)
+        with self.assertRaises(QuotaExceeded):
+            tracker.consume_request(prod)
+
+    def test_state_persistence(self):
+        """Test that counters survive a restart"""
+        prod = self.registry.clients["prod"]
+        tracker = QuotaTracker(self.state_file, persist_interval=0, registry=MetricsRegistry())
+        tracker.record_tokens(prod, 40)
+
+        restored = QuotaTracker(self.state_file, registry=MetricsRegistry())
+        self.assertEqual(restored.get_usage(prod)["tokens_per_day"], {"used": 40, "limit": 100})
+
+    def test_weighted_fair_queue(self):
+        """Test that a heavy client cannot starve others and weights are honoured"""
+        queue = WeightedFairQueue()
+        for i in range(6):
+            queue.push(f"noisy-{i}", "noisy")
+        for i in range(2):
+            queue.push(f"quiet-{i}", "quiet")
+        order = [queue.pop() for _ in range(4)]
+        self.assertEqual(sorted(order), ["noisy-0", "noisy-1", "quiet-0", "quiet-1"])
+
+        queue = WeightedFairQueue()
+        for i in range(6):
+            queue.push(("heavy", i), "heavy", weight=2.0)
+            queue.push(("light", i), "light", weight=1.0)
+        served = [queue.pop()[0] for _ in range(6)]
+        self.assertEqual(served.count("heavy"), 4)
+
+        self.assertTrue(queue.remove(queue._heap[0][2]))
+        self.assertFalse(queue.remove(object()))
+
+def main():
+    """Main entry point for client tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+II-Agent MCP Server Add-On - Test Compression
+Tests encoding negotiation, the compression middleware and compressed upstream requests
+"""
+import os
+import sys
+import gzip
+import json
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.compression import (
+    BROTLI_BOUNDED, CompressionMiddleware, CompressionError, DecompressedTooLarge, choose_encoding, compress, decompress,
+    get_stats
+)
+from ii_agent_mcp_mvp.providers.deepseek import DeepSeekProvider
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+LARGE_TEXT = "All work and no play makes Jack a dull boy. " * 200
+
+async def echo_app(scope, receive, send):
+    """ASGI app returning the request body, or a large JSON document for empty requests"""
+    message = await receive()
+    body = message.get("body", b"") or json.dumps({"text": LARGE_TEXT}).encode()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body, "more_body": False})
+
+async def call(app, body: bytes = b"", headers=None, path: str = "/generate"):
+    """Call an ASGI app, returning the status, headers and body"""
+    scope = {"type": "http", "method": "POST", "path": path,
+             "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], response_headers, b"".join(m.get("body", b"") for m in messages[1:])
+
+class EncodingTester(unittest.TestCase):
+    """Tests codec helpers"""
+
+    def test_choose_encoding(self):
+        """Test Accept-Encoding negotiation"""
+        self.assertEqual(choose_encoding("gzip, deflate", ["zstd", "br", "gzip"]), "gzip")
+        self.assertEqual(choose_encoding("gzip;q=0.5, br", ["zstd", "br", "gzip"]), "br")
+        self.assertEqual(choose_encoding("*", ["zstd", "gzip"]), "zstd")
+        self.assertIsNone(choose_encoding("gzip;q=0", ["gzip"]))
+        self.assertIsNone(choose_encoding("", ["gzip"]))
+        self.assertIsNone(choose_encoding("br", ["gzip"]))
+
+    def test_round_trip_and_limits(self):
+        """Test gzip round trips, truncated bodies and decompression limits"""
+        data = LARGE_TEXT.encode()
+        compressed = compress(data, "gzip")
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(gzip.decompress(compressed), data)
+        self.assertEqual(decompress(compressed, "gzip", len(data)), data)
+
+        with self.assertRaises(DecompressedTooLarge):
+            decompress(compressed, "gzip", len(data) - 1)
+        with self.assertRaises(CompressionError):
+            decompress(compressed[:len(compressed) // 2], "gzip", len(data))
+        with self.assertRaises(CompressionError):
+            decompress(b"not gzip", "gzip", 1024)
+
+    @unittest.skipUnless(BROTLI_BOUNDED, "brotli 1.2 or later is not installed")
+    def test_brotli_limit(self):
+        """Test that brotli bodies stop decompressing once they pass the limit"""
+        data = LARGE_TEXT.encode()
+        self.assertEqual(decompress(compress(data, "br"), "br", len(data)), data)
+        bomb = compress(b"\0" * (64 * 1024 * 1024), "br")
+        with self.assertRaises(DecompressedTooLarge):
+            decompress(bomb, "br", 1024 * 1024)
+        with self.assertRaises(CompressionError):
+            decompress(compress(data, "br")[:-4], "br", len(data))
+
+class CompressionMiddlewareTester(unittest.IsolatedAsyncioTestCase):
+    """Tests the compression middleware"""
+
+    def setUp(self):
+        """Wrap the echo app"""
+        self.app = CompressionMiddleware(echo_app, minimum_size=1024, paths=["/generate"])
+
+    async def test_response_compression(self):
+        """Test that large responses are compressed when accepted"""
+        status, headers, body = await call(self.app, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertEqual(headers["vary"], "Accept-Encoding")
+        self.assertEqual(int(headers["content-length"]), len(body))
+        self.assertEqual(json.loads(gzip.decompress(body))["text"], LARGE_TEXT)
+
+    async def test_small_and_unnegotiated_responses(self):
+        """Test that small bodies, other paths and clients without Accept-Encoding get identity"""
+        _, headers, body = await call(self.app, b"small", {"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", headers)
+        self.assertEqual(body, b"small")
+
+        _, headers, _ = await call(self.app)
+        self.assertNotIn("content-encoding", headers)
+
+        _, headers, _ = await call(self.app, headers={"Accept-Encoding": "gzip"}, path="/status")
+        self.assertNotIn("content-encoding", headers)
+
+    async def test_request_decompression(self):
+        """Test that compressed request bodies reach the app decompressed"""
+        data = json.dumps({"prompt": LARGE_TEXT}).encode()
+        status, _, body = await call(self.app, gzip.compress(data), {"Content-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertEqual(body, data)
+
+    async def test_request_errors(self):
+        """Test unsupported, invalid and oversized request bodies"""
+        status, _, _ = await call(self.app, b"data", {"Content-Encoding": "compress"})
+        self.assertEqual(status, 415)
+
+        status, _, _ = await call(self.app, b"not gzip", {"Content-Encoding": "gzip"})
+        self.assertEqual(status, 400)
+
+        small_limit = CompressionMiddleware(echo_app, max_request_size=100)
+        status, _, _ = await call(small_limit, gzip.compress(b"x" * 1000), {"Content-Encoding": "gzip"})
+        self.assertEqual(status, 413)
+
+class UpstreamCompressionTester(unittest.TestCase):
+    """Tests compressed requests to upstream providers"""
+
+    def test_compressed_upstream_request(self):
+        """Test that providers gzip large payloads and record the savings"""
+        behaviour = UpstreamBehaviour(latency=0.0, completion_tokens=5)
+        upstream = MockUpstream(behaviour).start()
+        try:
+            provider = DeepSeekProvider("test-key", ["deepseek-chat"], f"{upstream.url}/v1")
+            provider.request_compression = "gzip"
+            saved = get_stats()._saved
+            before = saved.get({"direction": "upstream", "encoding": "gzip"})
+
+            result = provider.generate(LARGE_TEXT, "deepseek-chat")
+            self.assertTrue(result["success"], result)
+            self.assertEqual(result["usage"]["prompt_tokens"], len(LARGE_TEXT.split()))
+
+            provider.generate("short", "deepseek-chat")
+        finally:
+            upstream.stop()
+
+        self.assertEqual(behaviour.stats["compressed_requests"], 1)
+        self.assertGreater(saved.get({"direction": "upstream", "encoding": "gzip"}), before)
+
+def main():
+    """Main entry point for compression tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
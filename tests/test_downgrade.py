@@ -0,0 +1,124 @@
+"""
+II-Agent MCP Server Add-On - Test Model Downgrade
+Tests switching requests to lighter model tiers under load
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.admission import ProviderSlots
+from ii_agent_mcp_mvp.downgrade import DowngradePolicy
+from ii_agent_mcp_mvp.routing import RoutingTable
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+PROVIDER_MODELS = {
+    "gemini": ["gemini-1.5-pro", "gemini-1.5-flash"],
+    "mistral": ["mistral-large", "mistral-small"]
+}
+
+class DowngradePolicyTester(unittest.TestCase):
+    """Tests tier selection from latency, queue and rate-limit signals"""
+
+    def setUp(self):
+        """Create a policy over mock providers"""
+        self.registry = MetricsRegistry()
+        self.table = RoutingTable(PROVIDER_MODELS)
+        self.providers = {name: MagicMock(rate_limit_remaining=None) for name in PROVIDER_MODELS}
+        factory = MagicMock()
+        factory.get_provider = lambda name: self.providers.get(name)
+        self.slots = ProviderSlots(1, wait_timeout=2)
+        self.policy = DowngradePolicy({"smart": ["fast"]}, factory, self.slots, max_latency=5.0, max_queue_length=1,
+                                      min_rate_limit_remaining=10, recover_after=0.2, registry=self.registry)
+
+    def select(self, model="smart", provider=None):
+        return self.policy.select(model, self.table.route(model, provider), self.table, provider)
+
+    def downgrades(self, reason):
+        return self.registry.counter("mcp_model_downgrades_total", "").get({"model": "smart", "to": "fast", "reason": reason})
+
+    def test_no_load(self):
+        """Test that requests keep their model while targets are within thresholds"""
+        self.policy.observe("gemini", "gemini-1.5-pro", 1.0)
+        self.assertEqual(self.select()[0], "smart")
+        self.assertEqual(self.select("mistral-large")[0], "mistral-large")
+
+    def test_latency(self):
+        """Test that a slow target is downgraded until its average goes stale"""
+        self.policy.observe("gemini", "gemini-1.5-pro", 9.0)
+        model, route = self.select()
+        self.assertEqual((model, route.targets[0]), ("fast", ("gemini", "gemini-1.5-flash")))
+        self.assertEqual(self.downgrades("latency"), 1)
+        # A requested provider keeps its place in the lighter tier's route
+        self.assertEqual(self.select(provider="mistral")[0], "smart")
+
+        time.sleep(0.3)
+        self.assertEqual(self.select()[0], "smart")
+
+    def test_rate_limit_headroom(self):
+        """Test that a target close to its rate limit is downgraded"""
+        self.providers["gemini"].rate_limit_remaining = 3
+        self.assertEqual(self.select()[0], "fast")
+        self.assertEqual(self.downgrades("rate_limit"), 1)
+
+    def test_queue_length(self):
+        """Test that a target with calls queued for its slots is downgraded"""
+        with self.slots.slot("gemini"):
+            thread = threading.Thread(target=lambda: self.slots.slot("gemini").__enter__())
+            thread.start()
+            while not self.slots.queue_length("gemini"):
+                time.sleep(0.01)
+            self.assertEqual(self.select()[0], "fast")
+        thread.join()
+        self.assertEqual(self.downgrades("queue"), 1)
+
+    def test_from_config(self):
+        """Test that the policy is only created when enabled with tiers"""
+        self.assertIsNone(DowngradePolicy.from_config({"enabled": False, "tiers": {"smart": "fast"}}, None))
+        self.assertIsNone(DowngradePolicy.from_config({"enabled": True}, None))
+        policy = DowngradePolicy.from_config({"enabled": True, "tiers": {"smart": "fast"}, "max_latency": 2}, None)
+        self.assertEqual((policy.tiers, policy.max_latency, policy.max_queue_length), ({"smart": ["fast"]}, 2.0, None))
+
+class ServerDowngradeTester(unittest.TestCase):
+    """Tests downgrades reported by the server"""
+
+    def test_response_reports_served_model(self):
+        """Test that a slow model is downgraded and the response names the model that served it"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.05)).start()
+        downgrade = {"enabled": True, "tiers": {"gemini-1.5-flash": ["mistral-small"]}, "max_latency": 0.01}
+        gateway = GatewayProcess(upstream.url, ["gemini", "mistral"],
+                                 {"health_check": {"enabled": False}, "routing": {"downgrade": downgrade}})
+        try:
+            gateway.start()
+            body = {"prompt": "hi", "model": "gemini-1.5-flash"}
+            first = requests.post(f"{gateway.url}/generate", json=body, timeout=10).json()
+            self.assertEqual((first["model"], first["downgraded_from"]), ("gemini-1.5-flash", None))
+
+            second = requests.post(f"{gateway.url}/generate", json=body, timeout=10).json()
+            self.assertEqual((second["provider"], second["model"]), ("mistral", "mistral-small"))
+            self.assertEqual(second["downgraded_from"], "gemini-1.5-flash")
+            metrics = requests.get(f"{gateway.url}/metrics", timeout=5).text
+            self.assertIn('mcp_model_downgrades_total{model="gemini-1.5-flash",reason="latency",to="mistral-small"} 1.0', metrics)
+        finally:
+            gateway.stop()
+            upstream.stop()
+
+def main():
+    """Main entry point for model downgrade tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+II-Agent MCP Server Add-On - Test Embeddings
+Tests provider embedding calls, request coalescing, vector encoding and the /embeddings endpoint
+"""
+import os
+import sys
+import asyncio
+import unittest
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour, mock_embedding
+from ii_agent_mcp_mvp.embeddings import EmbeddingBatcher, decode_embedding, encode_embedding
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class EmbeddingBatcherTester(unittest.TestCase):
+    """Tests embedding calls against the mock upstream"""
+
+    def setUp(self):
+        """Start the mock upstream and create providers pointed at it"""
+        self.behaviour = UpstreamBehaviour(latency=0.0)
+        self.upstream = MockUpstream(self.behaviour).start()
+        self.factory = ProviderFactory()
+        self.factory.create_provider("gemini", "key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        self.factory.create_provider("mistral", "key", ["mistral-small"], f"{self.upstream.url}/v1")
+        self.factory.create_provider("deepseek", "key", ["deepseek-chat"], f"{self.upstream.url}/v1")
+        self.registry = MetricsRegistry()
+
+    def tearDown(self):
+        """Stop the mock upstream"""
+        self.upstream.stop()
+
+    def embed_concurrently(self, batcher, provider, requests_texts):
+        async def run():
+            return await asyncio.gather(*(batcher.embed(provider, texts) for texts in requests_texts))
+        return asyncio.run(run())
+
+    def test_provider_embed(self):
+        """Test that both embedding APIs return one vector per text in input order"""
+        texts = ["alpha", "beta", "gamma"]
+        for name, model in (("gemini", "text-embedding-004"), ("mistral", "mistral-embed")):
+            result = self.factory.get_provider(name).embed(texts)
+            self.assertTrue(result["success"], result.get("error"))
+            self.assertEqual(result["embeddings"], [mock_embedding(text) for text in texts])
+            self.assertEqual(result["model"], model)
+        self.assertFalse(self.factory.get_provider("deepseek").supports_embeddings)
+
+    def test_coalesces_concurrent_requests(self):
+        """Test that concurrent single-text requests share one upstream call and get their own vectors back"""
+        batcher = EmbeddingBatcher(self.factory, max_wait=0.05, registry=self.registry)
+        texts = [f"text {i}" for i in range(10)]
+        results = self.embed_concurrently(batcher, "mistral", [[text] for text in texts])
+
+        self.assertEqual(self.behaviour.stats["embedding_requests"], 1)
+        self.assertEqual([result["embeddings"] for result in results], [[mock_embedding(text)] for text in texts])
+        self.assertEqual(batcher.get_status()["texts_per_call"], 10)
+        histogram = self.registry.histogram("mcp_embedding_batch_size", "")
+        self.assertEqual(histogram.get_sum({"provider": "mistral"}), 10)
+
+    def test_splits_at_batch_limit(self):
+        """Test that waiting texts are sent in calls no larger than the batch limit"""
+        batcher = EmbeddingBatcher(self.factory, max_wait=0.05, max_batch_size=4, registry=self.registry)
+        results = self.embed_concurrently(batcher, "gemini", [["a", "b", "c"], ["d", "e", "f"], ["g"]])
+
+        self.assertEqual(self.behaviour.stats["embedded_texts"], 7)
+        self.assertEqual(self.behaviour.stats["embedding_requests"], 3)
+        self.assertEqual(results[1]["embeddings"], [mock_embedding(text) for text in "def"])
+
+    def test_failed_call(self):
+        """Test that an upstream failure is returned to every request in the batch"""
+        self.behaviour.rate_limit_rate = 1.0
+        batcher = EmbeddingBatcher(self.factory, max_wait=0.05, registry=self.registry)
+        results = self.embed_concurrently(batcher, "mistral", [["a"], ["b"]])
+
+        self.assertEqual([result["success"] for result in results], [False, False])
+        self.assertEqual(results[0]["error"], "API Error: 429")
+        with self.assertRaises(ValueError):
+            self.embed_concurrently(batcher, "deepseek", [["a"]])
+
+    def test_base64_encoding(self):
+        """Test that base64 vectors decode to the float32 values"""
+        vector = [0.5, -1.25, 3.0]
+        encoded = encode_embedding(vector, "base64")
+        self.assertEqual(len(encoded), 16)
+        self.assertEqual(decode_embedding(encoded), vector)
+        self.assertIs(encode_embedding(vector, "float"), vector)
+
+class EmbeddingsApiTester(unittest.TestCase):
+    """Tests the /embeddings endpoint against the server"""
+
+    def test_embeddings_endpoint(self):
+        """Test float and base64 responses and that concurrent requests are coalesced"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0)).start()
+        gateway = GatewayProcess(upstream.url, ["deepseek", "mistral"],
+                                 {"health_check": {"enabled": False}, "embeddings": {"max_wait_ms": 50}})
+        try:
+            gateway.start()
+            response = requests.post(f"{gateway.url}/embeddings", json={"input": ["one", "two"]}, timeout=10)
+            self.assertEqual(response.status_code, 200, response.text)
+            body = response.json()
+            self.assertEqual((body["provider"], body["model"]), ("mistral", "mistral-embed"))
+            self.assertEqual([item["embedding"] for item in body["data"]], [mock_embedding("one"), mock_embedding("two")])
+            self.assertEqual(body["usage"]["prompt_tokens"], 2)
+
+            response = requests.post(f"{gateway.url}/embeddings", json={"input": "one", "encoding_format": "base64"},
+                                     timeout=10)
+            decoded = decode_embedding(response.json()["data"][0]["embedding"])
+            for value, expected in zip(decoded, mock_embedding("one")):
+                self.assertAlmostEqual(value, expected, places=5)
+
+            self.assertEqual(requests.post(f"{gateway.url}/embeddings", json={"input": "x", "provider": "deepseek"},
+                                           timeout=10).status_code, 400)
+            self.assertEqual(requests.post(f"{gateway.url}/embeddings", json={"input": "x", "encoding_format": "hex"},
+                                           timeout=10).status_code, 400)
+
+            async def concurrent():
+                def post(i):
+                    return requests.post(f"{gateway.url}/embeddings", json={"input": f"text {i}"}, timeout=10)
+                return await asyncio.gather(*(asyncio.to_thread(post, i) for i in range(8)))
+            before = upstream.behaviour.stats["embedding_requests"]
+            responses = asyncio.run(concurrent())
+            self.assertEqual([r.status_code for r in responses], [200] * 8)
+            self.assertLess(upstream.behaviour.stats["embedding_requests"] - before, 8)
+        finally:
+            gateway.stop()
+            upstream.stop()
+
+def main():
+    """Main entry point for embeddings tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+II-Agent MCP Server Add-On - Test Upstream Errors
+Tests error classification and the fallback decisions made from it
+"""
+import os
+import sys
+import json
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.providers.errors import UpstreamError, CLIENT, PROVIDER, QUOTA, TRANSIENT, parse_retry_after
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+def failure(status_code: int, retry_after=None):
+    """A failed result as returned by a provider"""
+    error = UpstreamError.from_status(status_code, retry_after, "upstream says no")
+    return {"success": False, "error": str(error), "upstream_error": error, "response": error.message, "latency": 0.1}
+
+def success(provider: str):
+    """A successful result as returned by a provider"""
+    return {"success": True, "text": "ok", "model": f"{provider}-model", "provider": provider, "latency": 0.1}
+
+class ClassificationTester(unittest.TestCase):
+    """Tests mapping failures onto error classes"""
+
+    def test_status_codes(self):
+        """Test the class of common upstream statuses"""
+        expected = {429: QUOTA, 500: TRANSIENT, 503: TRANSIENT, 408: TRANSIENT,
+                    401: PROVIDER, 403: PROVIDER, 404: PROVIDER, 400: CLIENT, 422: CLIENT}
+        for status_code, category in expected.items():
+            error = UpstreamError.from_status(status_code)
+            self.assertEqual(error.category, category, status_code)
+            self.assertEqual(str(error), f"API Error: {status_code}")
+        self.assertTrue(UpstreamError.from_status(502).retryable)
+        self.assertFalse(UpstreamError.from_status(429).retryable)
+        self.assertTrue(UpstreamError.from_status(429).fallback)
+        self.assertFalse(UpstreamError.from_status(400).fallback)
+
+    def test_legacy_results(self):
+        """Test that untyped results are classified from their error string only"""
+        error = UpstreamError.from_result({"success": False, "error": "API Error: 429", "response": "slow down", "retry_after": 2})
+        self.assertEqual((error.category, error.retry_after), (QUOTA, 2))
+        error = UpstreamError.from_result({"success": False, "error": "API Error: 500", "response": "rate limit " * 10000})
+        self.assertEqual(error.category, TRANSIENT)
+        self.assertEqual(len(error.message), 500)
+        self.assertEqual(UpstreamError.from_result({"success": False, "error": "Exception: timed out"}).category, TRANSIENT)
+
+    def test_retry_after(self):
+        """Test Retry-After parsing"""
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_provider_results(self):
+        """Test that providers return typed errors for statuses and exceptions"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0, rate_limit_rate=1.0)).start()
+        try:
+            factory = ProviderFactory()
+            provider = factory.create_provider("gemini", "secret-key", ["gemini-1.5-flash"], f"{upstream.url}/v1beta")
+            error = provider.generate("hi", "gemini-1.5-flash")["upstream_error"]
+            self.assertEqual((error.category, error.status_code, error.retry_after), (QUOTA, 429, 1.0))
+        finally:
+            upstream.stop()
+
+        provider = factory.create_provider("gemini", "secret-key", ["gemini-1.5-flash"], "http://127.0.0.1:9/v1beta")
+        result = provider.generate("hi", "gemini-1.5-flash")
+        self.assertEqual(result["upstream_error"].category, TRANSIENT)
+        self.assertTrue(result["error"].startswith("Exception: "))
+        self.assertNotIn("secret-key", result["error"])
+
+    def test_gemini_provider_side_400(self):
+        """Test that Gemini 400s caused by the key or account are provider errors, and other 400s are not"""
+        provider = ProviderFactory().create_provider("gemini", "key", ["gemini-1.5-flash"], "http://127.0.0.1:9/v1beta")
+
+        def response(body):
+            reply = requests.Response()
+            reply.status_code = 400
+            reply._content = json.dumps(body).encode()
+            return reply
+
+        invalid_key = {"error": {"code": 400, "status": "INVALID_ARGUMENT",
+                                 "details": [{"@type": "type.googleapis.com/google.rpc.ErrorInfo", "reason": "API_KEY_INVALID"}]}}
+        location = {"error": {"code": 400, "status": "FAILED_PRECONDITION", "message": "User location is not supported"}}
+        bad_request = {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message": "Invalid JSON payload"}}
+        self.assertEqual(provider._upstream_error(response(invalid_key)).category, PROVIDER)
+        self.assertEqual(provider._upstream_error(response(location)).category, PROVIDER)
+        self.assertEqual(provider._upstream_error(response(bad_request)).category, CLIENT)
+        self.assertEqual(provider._upstream_error(response("not an object")).category, CLIENT)
+
+    def test_invalid_gemini_key_falls_back(self):
+        """Test that a request Gemini rejects for its key is served by the next provider"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0)).start()
+        try:
+            factory = ProviderFactory()
+            factory.create_provider("gemini", "bad-key", ["gemini-1.5-flash"], f"{upstream.url}/v1beta")
+            factory.create_provider("mistral", "key", ["mistral-small"], f"{upstream.url}/v1")
+            upstream.behaviour.invalid_keys.add("bad-key")
+            result = FallbackHandler(factory).process_request("hi", "default", ["gemini", "mistral"])
+            self.assertTrue(result["success"], result)
+            self.assertEqual((result["provider"], result["attempts"]), ("mistral", 2))
+            self.assertEqual(upstream.behaviour.key_requests["bad-key"], 1)
+        finally:
+            upstream.stop()
+
+class FallbackDecisionTester(unittest.TestCase):
+    """Tests fallback decisions driven by error classes"""
+
+    def setUp(self):
+        """Create a handler over mock providers"""
+        self.providers = {name: MagicMock() for name in ("gemini", "deepseek", "mistral")}
+        for provider in self.providers.values():
+            provider.rate_limit_remaining = None
+        factory = MagicMock()
+        factory.get_provider = lambda name: self.providers.get(name)
+        self.handler = FallbackHandler(factory, max_retries=3)
+
+    def run_request(self):
+        return self.handler.process_request("hi", "default", ["gemini", "deepseek", "mistral"])
+
+    def test_client_error_stops(self):
+        """Test that an invalid request is not retried or sent to other providers"""
+        self.providers["gemini"].generate.return_value = failure(400)
+        result = self.run_request()
+        self.assertFalse(result["success"])
+        self.assertEqual((result["error_type"], result["status_code"], result["attempts"]), ("invalid_request", 400, 1))
+        self.providers["deepseek"].generate.assert_not_called()
+
+    def test_provider_error_falls_back_without_retry(self):
+        """Test that an auth failure moves straight to the next provider"""
+        self.providers["gemini"].generate.return_value = failure(401)
+        self.providers["deepseek"].generate.return_value = success("deepseek")
+        result = self.run_request()
+        self.assertEqual((result["provider"], result["attempts"]), ("deepseek", 2))
+        self.assertEqual(self.providers["gemini"].generate.call_count, 1)
+
+    def test_transient_error_is_retried(self):
+        """Test that server errors are retried on the same provider"""
+        self.providers["gemini"].generate.side_effect = [failure(503), failure(502), success("gemini")]
+        result = self.run_request()
+        self.assertEqual((result["provider"], result["attempts"]), ("gemini", 3))
+
+    def test_all_rate_limited(self):
+        """Test that a request every provider rate limits reports the shortest Retry-After"""
+        self.providers["gemini"].generate.return_value = failure(429, 20)
+        self.providers["deepseek"].generate.return_value = failure(429, 5)
+        self.providers["mistral"].rate_limit_remaining = 0
+        result = self.run_request()
+        self.assertEqual((result["error_type"], result["retry_after"]), ("rate_limited", 5))
+        self.providers["mistral"].generate.assert_not_called()
+
+        self.providers["deepseek"].generate.return_value = failure(500)
+        self.assertNotIn("error_type", self.run_request())
+
+    def test_decision_does_not_scan_body(self):
+        """Test that a huge error body mentioning rate limits does not change the decision"""
+        result = failure(500)
+        result["response"] = "rate limit 429 " * 100000
+        self.providers["gemini"].generate.side_effect = [result, success("gemini")]
+        start = time.perf_counter()
+        self.assertEqual(self.run_request()["provider"], "gemini")
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+def main():
+    """Main entry point for upstream error tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
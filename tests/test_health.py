@@ -0,0 +1,119 @@
+"""
+II-Agent MCP Server Add-On - Test Health Checks
+Tests background provider health checks and health-aware provider ordering
+"""
+import os
+import sys
+import time
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.health import HealthChecker, HEALTHY, UNHEALTHY
+from ii_agent_mcp_mvp.providers.chaos import FaultInjectingProvider, FaultProfile
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class HealthCheckerTester(unittest.TestCase):
+    """Tests health checks against mock upstreams"""
+
+    def setUp(self):
+        """Start separate upstreams for Gemini and DeepSeek so they can fail independently"""
+        self.gemini_upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=2)).start()
+        self.deepseek_upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=2)).start()
+        self.factory = ProviderFactory()
+        self.factory.create_provider("gemini", "secret-key", ["gemini-1.5-flash"], f"{self.gemini_upstream.url}/v1beta")
+        self.factory.create_provider("deepseek", "test-key", ["deepseek-chat"], f"{self.deepseek_upstream.url}/v1")
+        self.registry = MetricsRegistry()
+        self.checker = HealthChecker(self.factory, interval=0.1, timeout=1.0, unhealthy_threshold=2, registry=self.registry)
+
+    def tearDown(self):
+        """Stop checks and upstreams"""
+        self.checker.stop()
+        self.gemini_upstream.stop()
+        self.deepseek_upstream.stop()
+
+    def test_state_transitions(self):
+        """Test that providers turn unhealthy after consecutive failures and recover"""
+        gemini = self.factory.get_provider("gemini")
+        self.assertEqual(self.checker.check(gemini).state, HEALTHY)
+
+        self.gemini_upstream.behaviour.list_models_status = 503
+        self.assertEqual(self.checker.check(gemini).state, HEALTHY)
+        health = self.checker.check(gemini)
+        self.assertEqual(health.state, UNHEALTHY)
+        self.assertEqual(health.last_error, "API Error: 503")
+        self.assertFalse(self.checker.is_healthy("gemini"))
+        self.assertEqual(self.registry.gauge("mcp_provider_healthy", "").get({"provider": "gemini"}), 0)
+
+        self.gemini_upstream.behaviour.list_models_status = 429
+        self.assertEqual(self.checker.check(gemini).state, HEALTHY)
+        status = self.checker.get_status()["gemini"]
+        self.assertAlmostEqual(status["availability"], 50.0)
+
+    def test_order(self):
+        """Test that providers known to be down move to the end"""
+        self.assertEqual(self.checker.order(["gemini", "deepseek", "mistral"]), ["gemini", "deepseek", "mistral"])
+        self.gemini_upstream.behaviour.list_models_status = 500
+        for _ in range(2):
+            self.checker.check(self.factory.get_provider("gemini"))
+        self.assertEqual(self.checker.order(["gemini", "deepseek", "mistral"]), ["deepseek", "mistral", "gemini"])
+
+    def test_fallback_avoids_unhealthy_provider(self):
+        """Test that requests go straight to a healthy provider"""
+        self.gemini_upstream.behaviour.list_models_status = 503
+        self.gemini_upstream.behaviour.error_rate = 1.0
+        self.checker.check_due()
+        self.checker.check_due()
+        for health in self.checker._health.values():
+            health.next_check = 0.0
+        self.checker.check_due()
+
+        handler = FallbackHandler(self.factory, max_retries=2, health_checker=self.checker)
+        result = handler.process_request("hello", "gemini-1.5-flash", ["gemini", "deepseek"])
+        self.assertTrue(result["success"], result)
+        self.assertEqual(result["provider"], "deepseek")
+        self.assertEqual(result["attempts"], 1)
+        self.assertEqual(self.gemini_upstream.behaviour.stats["requests"], 0)
+
+    def test_background_checks(self):
+        """Test that the background thread checks every provider on its jittered schedule"""
+        self.checker.start()
+        time.sleep(0.35)
+        self.checker.stop()
+        checks = self.registry.counter("mcp_health_checks_total", "")
+        self.assertGreaterEqual(checks.get({"provider": "gemini", "result": "ok"}), 2)
+        self.assertGreaterEqual(checks.get({"provider": "deepseek", "result": "ok"}), 2)
+
+    def test_unreachable_provider_error_hides_key(self):
+        """Test that connection errors are reported without the API key"""
+        provider = self.factory.create_provider("gemini", "secret-key", ["gemini-1.5-flash"], "http://127.0.0.1:9/v1beta")
+        result = provider.check_health(timeout=1.0)
+        self.assertFalse(result["healthy"])
+        self.assertNotIn("secret-key", result["error"])
+
+    def test_chaos_wrapper(self):
+        """Test that health checks pass through fault injection wrappers"""
+        wrapped = FaultInjectingProvider(self.factory.get_provider("deepseek"), FaultProfile(error_rate=1.0), registry=self.registry)
+        self.assertTrue(wrapped.check_health(1.0)["healthy"])
+
+    def test_from_config(self):
+        """Test configuration parsing"""
+        self.assertIsNone(HealthChecker.from_config(self.factory, {"enabled": False}))
+        self.assertIsNone(HealthChecker.from_config(self.factory, None))
+        checker = HealthChecker.from_config(self.factory, {"enabled": True, "interval": 10, "unhealthy_threshold": 3})
+        self.assertEqual((checker.interval, checker.unhealthy_threshold), (10.0, 3))
+
+def main():
+    """Main entry point for health check tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
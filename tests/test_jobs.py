@@ -0,0 +1,243 @@
+"""
+II-Agent MCP Server Add-On - Test Jobs
+Tests the persistent job store, the throttled job runner, webhooks and the /jobs API
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.jobs import JobRunner, JobStore, SIGNATURE_HEADER, check_webhook_url
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class WebhookReceiver:
+    """Local HTTP server recording webhook deliveries"""
+
+    def __init__(self):
+        self.deliveries = []
+        self.received = threading.Event()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.deliveries.append((dict(self.headers), body))
+                receiver.received.set()
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+class JobStoreTester(unittest.TestCase):
+    """Tests job persistence"""
+
+    def setUp(self):
+        """Open a store in a temporary directory"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "jobs.db")
+        self.store = JobStore(self.path)
+
+    def tearDown(self):
+        """Close the store"""
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_lifecycle(self):
+        """Test claiming items in order and completing a job"""
+        job = self.store.create("alice", ["a", "b"], "fast", parameters={"max_tokens": 10})
+        self.assertEqual((job["status"], job["total"], job["parameters"]), ("queued", 2, {"max_tokens": 10}))
+
+        first = self.store.claim()
+        self.assertEqual((first["index"], first["prompt"], first["job"]["status"]), (0, "a", "running"))
+        second = self.store.claim()
+        self.assertIsNone(self.store.claim())
+
+        self.assertIsNone(self.store.finish_item(job["id"], 1, False, {"error": "boom"}))
+        finished = self.store.finish_item(job["id"], 0, True, {"text": "A"})
+        self.assertEqual((finished["status"], finished["succeeded"], finished["failed"]), ("completed", 1, 1))
+        self.assertEqual(second["index"], 1)
+        self.assertEqual([r["status"] for r in self.store.results(job["id"])], ["succeeded", "failed"])
+        self.assertEqual(self.store.results(job["id"], offset=1)[0]["error"], "boom")
+
+    def test_client_scoping_and_cancel(self):
+        """Test that jobs are only visible to their client and cancelled jobs stop handing out items"""
+        job = self.store.create("alice", ["a", "b"], "default")
+        self.assertIsNone(self.store.get(job["id"], "bob"))
+        self.assertEqual(len(self.store.list_jobs("alice")), 1)
+        self.assertEqual(self.store.list_jobs("bob"), [])
+
+        self.assertTrue(self.store.cancel(job["id"]))
+        self.assertFalse(self.store.cancel(job["id"]))
+        self.assertIsNone(self.store.claim())
+        self.assertEqual(self.store.pending_items(), 0)
+
+    def test_resume_after_restart(self):
+        """Test that items running when the process stopped are run again"""
+        job = self.store.create("alice", ["a"], "default")
+        self.store.claim()
+        self.store.close()
+        self.store = JobStore(self.path)
+        self.assertEqual(self.store.claim()["job"]["id"], job["id"])
+
+class JobRunnerTester(unittest.TestCase):
+    """Tests running items in the background"""
+
+    def setUp(self):
+        """Create a store and a runner over a fake generate function"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.directory.name, "jobs.db"))
+        self.calls = []
+        self.busy = False
+        self.registry = MetricsRegistry()
+
+    def tearDown(self):
+        """Stop the runner and close the store"""
+        self.runner.stop()
+        self.store.close()
+        self.directory.cleanup()
+
+    def generate(self, job, prompt):
+        self.calls.append((time.monotonic(), prompt))
+        if prompt == "bad":
+            return {"success": False, "error": "API Error: 400", "error_type": "invalid_request"}
+        return {"success": True, "text": prompt.upper(), "provider": "gemini", "model": job["model"], "latency": 0.01}
+
+    def start_runner(self, **kwargs):
+        self.runner = JobRunner(self.store, self.generate, poll_interval=0.05, registry=self.registry, **kwargs)
+        self.runner.start()
+
+    def test_runs_items_and_signs_webhook(self):
+        """Test that every item runs and the completed job is posted to its webhook with a signature"""
+        receiver = WebhookReceiver()
+        try:
+            self.start_runner(max_concurrent=2, webhook_secret="s3cret", webhook_hosts=["127.0.0.1"])
+            job = self.store.create("alice", ["a", "bad", "c"], "fast", webhook_url=receiver.url)
+            self.runner.notify()
+            self.assertTrue(receiver.received.wait(5))
+
+            headers, body = receiver.deliveries[0]
+            expected = hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+            self.assertEqual(headers[SIGNATURE_HEADER], f"sha256={expected}")
+            payload = json.loads(body)
+            self.assertEqual(payload["event"], "job.completed")
+            self.assertEqual((payload["job"]["succeeded"], payload["job"]["failed"]), (2, 1))
+            self.assertEqual([r.get("text") for r in self.store.results(job["id"])], ["A", None, "C"])
+            self.assertTrue(wait_for(lambda: self.store.get(job["id"])["webhook_status"] == "delivered"))
+        finally:
+            receiver.stop()
+
+    def test_refuses_internal_webhooks(self):
+        """Test that webhooks to internal addresses are refused unless their host is allowed"""
+        for url in ("http://127.0.0.1:8000/hook", "http://169.254.169.254/latest", "http://10.0.0.5/",
+                    "http://[::ffff:192.168.0.1]/", "http://localhost/", "file:///etc/passwd"):
+            with self.assertRaises(ValueError):
+                check_webhook_url(url)
+        check_webhook_url("https://93.184.216.34/hook")
+        check_webhook_url("http://127.0.0.1:8000/hook", ["127.0.0.1"])
+        with self.assertRaises(ValueError):
+            check_webhook_url("https://93.184.216.34/hook", ["hooks.example.com"])
+
+        receiver = WebhookReceiver()
+        try:
+            self.start_runner()
+            job = self.store.create("alice", ["a"], "fast", webhook_url=receiver.url)
+            self.runner.notify()
+            self.assertTrue(wait_for(lambda: self.store.get(job["id"])["webhook_status"] == "failed"))
+            self.assertEqual(receiver.deliveries, [])
+        finally:
+            receiver.stop()
+
+    def test_throttled(self):
+        """Test that item starts are spaced by the rate limit"""
+        self.start_runner(max_concurrent=2, requests_per_minute=600)
+        job = self.store.create("alice", ["a", "b", "c", "d"], "default")
+        self.runner.notify()
+        self.assertTrue(wait_for(lambda: self.store.get(job["id"])["status"] == "completed"))
+        # Items run on two threads, so calls may be recorded slightly out of start order
+        starts = [start for start, _ in self.calls]
+        self.assertGreaterEqual(max(starts) - min(starts), 0.25)
+
+    def test_yields_to_interactive_traffic(self):
+        """Test that no items start while interactive requests are waiting"""
+        self.busy = True
+        self.start_runner(should_yield=lambda: self.busy)
+        job = self.store.create("alice", ["a"], "default")
+        self.runner.notify()
+        time.sleep(0.2)
+        self.assertEqual(self.calls, [])
+        self.busy = False
+        self.assertTrue(wait_for(lambda: self.store.get(job["id"])["status"] == "completed"))
+
+class JobsApiTester(unittest.TestCase):
+    """Tests the /jobs API against the server"""
+
+    def test_submit_poll_and_results(self):
+        """Test a job from submission to results through the server"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=3)).start()
+        directory = tempfile.TemporaryDirectory()
+        jobs = {"enabled": True, "database": os.path.join(directory.name, "jobs.db"), "requests_per_minute": 0}
+        gateway = GatewayProcess(upstream.url, ["gemini"], {"health_check": {"enabled": False}, "jobs": jobs})
+        try:
+            gateway.start()
+            response = requests.post(f"{gateway.url}/jobs", json={"prompts": ["one", "two", "three"], "model": "fast"},
+                                     headers={"X-Client-ID": "batcher"}, timeout=10)
+            self.assertEqual(response.status_code, 202, response.text)
+            job_id = response.json()["id"]
+
+            def status():
+                return requests.get(f"{gateway.url}/jobs/{job_id}", headers={"X-Client-ID": "batcher"}, timeout=5).json()
+            self.assertTrue(wait_for(lambda: status()["status"] == "completed", 10))
+
+            results = requests.get(f"{gateway.url}/jobs/{job_id}/results", headers={"X-Client-ID": "batcher"},
+                                   timeout=5).json()["results"]
+            self.assertEqual([r["status"] for r in results], ["succeeded"] * 3)
+            self.assertEqual(results[0]["model"], "gemini-1.5-flash")
+            self.assertEqual(requests.get(f"{gateway.url}/jobs/{job_id}", timeout=5).status_code, 404)
+            self.assertEqual(requests.post(f"{gateway.url}/jobs", json={"prompts": []}, timeout=5).status_code, 422)
+            response = requests.post(f"{gateway.url}/jobs", json={"prompts": ["x"], "webhook_url": f"{upstream.url}/hook"},
+                                     timeout=5)
+            self.assertEqual(response.status_code, 400)
+        finally:
+            gateway.stop()
+            upstream.stop()
+            directory.cleanup()
+
+def main():
+    """Main entry point for jobs tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
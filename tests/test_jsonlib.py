@@ -0,0 +1,84 @@
+"""
+II-Agent MCP Server Add-On - Test JSON Utilities
+Tests the fast JSON backend and its standard library fallback
+"""
+import os
+import sys
+import json
+import unittest
+from unittest.mock import patch
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.utils import jsonlib
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+PAYLOAD = {
+    "model": "deepseek-chat",
+    "messages": [{"role": "user", "content": "Grüße — 你好"}],
+    "temperature": 0.7,
+    "max_tokens": 1024,
+    "stream": False,
+    "stop": None
+}
+
+class JsonLibTester(unittest.TestCase):
+    """Tests JSON utility functionality"""
+
+    def _check_backend(self):
+        encoded = jsonlib.dumps(PAYLOAD)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(json.loads(encoded), PAYLOAD)
+        self.assertEqual(jsonlib.loads(encoded), PAYLOAD)
+        self.assertEqual(jsonlib.loads(encoded.decode("utf-8")), PAYLOAD)
+        self.assertIn("你好".encode("utf-8"), encoded)
+        self.assertNotIn(b", ", encoded)
+
+    def test_active_backend(self):
+        """Test encoding and decoding with the installed backend"""
+        self._check_backend()
+
+    def test_standard_library_fallback(self):
+        """Test encoding and decoding when orjson is not installed"""
+        with patch.object(jsonlib, "orjson", None):
+            self._check_backend()
+
+    def test_invalid_json(self):
+        """Test that invalid input raises a ValueError on both backends"""
+        with self.assertRaises(ValueError):
+            jsonlib.loads(b"{not json")
+        with patch.object(jsonlib, "orjson", None), self.assertRaises(ValueError):
+            jsonlib.loads(b"{not json")
+
+    def test_response_class(self):
+        """Test that the response class renders with the fast backend"""
+        response = jsonlib.FastJSONResponse(PAYLOAD)
+        self.assertEqual(response.body, jsonlib.dumps(PAYLOAD))
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+    def test_status_reports_backend(self):
+        """Test that the server reports the active backend on /status"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0)).start()
+        gateway = GatewayProcess(upstream.url, ["gemini"], {"health_check": {"enabled": False}})
+        try:
+            gateway.start()
+            status = requests.get(f"{gateway.url}/status", timeout=10).json()
+            self.assertEqual(status["json_backend"], jsonlib.BACKEND)
+        finally:
+            gateway.stop()
+            upstream.stop()
+
+def main():
+    """Main entry point for JSON utility tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+II-Agent MCP Server Add-On - Test API Key Pools
+Tests key selection, rate limit parking and key rotation in providers
+"""
+import os
+import sys
+import time
+import unittest
+from collections import Counter
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.config import ConfigManager
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.providers.keys import ApiKey, KeyPool
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+def pick(pool: KeyPool, count: int) -> Counter:
+    """Check out count keys, returning how often each was used"""
+    used = Counter()
+    for _ in range(count):
+        with pool.use() as key:
+            used[key.name] += 1
+    return used
+
+class KeyPoolTester(unittest.TestCase):
+    """Tests key selection and parking"""
+
+    def test_weighted_round_robin(self):
+        """Test that keys are used in proportion to their weights and interleaved"""
+        pool = KeyPool([ApiKey("key-a", 2.0, "a"), ApiKey("key-b", 1.0, "b")])
+        order = []
+        for _ in range(6):
+            with pool.use() as key:
+                order.append(key.name)
+        self.assertEqual(order, ["a", "b", "a", "a", "b", "a"])
+        self.assertEqual(pick(pool, 300), {"a": 200, "b": 100})
+
+    def test_least_recently_limited(self):
+        """Test that keys limited longest ago are preferred"""
+        pool = KeyPool([ApiKey("key-a"), ApiKey("key-b"), ApiKey("key-c")], "least_recently_limited", park_seconds=0.0)
+        a, b, c = pool.keys
+        pool.record(a, 429)
+        time.sleep(0.01)
+        pool.record(b, 429)
+        self.assertEqual(pick(pool, 3), {"key-3": 3})
+        pool.record(c, 429)
+        self.assertEqual(pick(pool, 1), {"key-1": 1})
+
+    def test_rate_limited_key_is_parked(self):
+        """Test that a 429 parks a key for its Retry-After"""
+        pool = KeyPool([ApiKey("key-a"), ApiKey("key-b")])
+        a, b = pool.keys
+        pool.record(a, 200, rate_limit_remaining=10)
+        pool.record(b, 200, rate_limit_remaining=5)
+        self.assertEqual(pool.rate_limit_remaining, 15)
+
+        pool.record(a, 429, rate_limit_remaining=0, retry_after=0.1)
+        self.assertEqual(pick(pool, 4), {"key-2": 4})
+        self.assertEqual(pool.rate_limit_remaining, 5)
+        self.assertEqual(pool.get_status()["available"], 1)
+
+        time.sleep(0.15)
+        self.assertEqual(pick(pool, 2), {"key-1": 1, "key-2": 1})
+        # The exhausted count is dropped once the key's limit has reset
+        self.assertIsNone(pool.rate_limit_remaining)
+
+    def test_all_keys_parked(self):
+        """Test that a fully limited pool reports no headroom and uses the key released first"""
+        pool = KeyPool([ApiKey("key-a"), ApiKey("key-b")])
+        a, b = pool.keys
+        pool.record(a, 429, retry_after=5)
+        pool.record(b, 429, retry_after=1)
+        self.assertEqual(pool.rate_limit_remaining, 0)
+        self.assertEqual(pick(pool, 1), {"key-2": 1})
+
+    def test_from_config(self):
+        """Test pool construction from provider config entries"""
+        pool = KeyPool.from_config("key-a", ["key-b", {"key": "key-c", "weight": 3, "name": "batch"}, "key-a", "", "key-b"])
+        self.assertEqual([key.value for key in pool.keys], ["key-a", "key-b", "key-c"])
+        self.assertEqual([key.name for key in pool.keys], ["key-1", "key-2", "batch"])
+        self.assertEqual(pool.keys[2].weight, 3.0)
+        with self.assertRaises(ValueError):
+            KeyPool.from_config(None, [""])
+        with self.assertRaises(ValueError):
+            KeyPool.from_config("key-a", [], strategy="random")
+
+    def test_status_masks_keys(self):
+        """Test that status output never includes full keys"""
+        pool = KeyPool([ApiKey("sk-0123456789abcdef")])
+        status = pool.get_status()
+        self.assertEqual(status["keys"][0]["key"], "...cdef")
+        self.assertNotIn("0123456789", str(status))
+
+    def test_config_encryption_mapping(self):
+        """Test that pool entries are transformed whether they are plain keys or dicts"""
+        mapped = ConfigManager._map_key_pool(["key-a", {"key": "key-b", "weight": 2}], str.upper)
+        self.assertEqual(mapped, ["KEY-A", {"key": "KEY-B", "weight": 2}])
+
+class ProviderKeyRotationTester(unittest.TestCase):
+    """Tests providers spreading requests over their keys"""
+
+    def setUp(self):
+        """Start a mock upstream"""
+        self.upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=2)).start()
+        self.factory = ProviderFactory()
+
+    def tearDown(self):
+        """Stop the upstream"""
+        self.upstream.stop()
+
+    def test_openai_compatible_rotation(self):
+        """Test that Bearer keys rotate and a limited key is skipped until its Retry-After passes"""
+        provider = self.factory.create_provider("deepseek", "key-a", ["deepseek-chat"], f"{self.upstream.url}/v1")
+        provider.set_api_keys(["key-b", "key-c"])
+        for _ in range(6):
+            self.assertTrue(provider.generate("hi", "deepseek-chat")["success"])
+        self.assertEqual(self.upstream.behaviour.key_requests, {"key-a": 2, "key-b": 2, "key-c": 2})
+
+        self.upstream.behaviour.limited_keys.add("key-b")
+        results = [provider.generate("hi", "deepseek-chat")["success"] for _ in range(5)]
+        self.assertEqual(results.count(False), 1)
+        self.assertEqual(self.upstream.behaviour.key_requests["key-b"], 3)
+        status = provider.get_status()["api_keys"]
+        self.assertEqual(status["available"], 2)
+        self.assertEqual(status["keys"][1]["rate_limited"], 1)
+        self.assertIsNone(provider.rate_limit_remaining)
+
+    def test_gemini_rotation(self):
+        """Test that Gemini keys rotate through the key query parameter"""
+        provider = self.factory.create_provider("gemini", "key-a", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        provider.set_api_keys([{"key": "key-b", "weight": 3}])
+        for _ in range(4):
+            self.assertTrue(provider.generate("hi", "gemini-1.5-flash")["success"])
+        self.assertEqual(self.upstream.behaviour.key_requests, {"key-a": 1, "key-b": 3})
+
+    def test_single_key_recovers(self):
+        """Test that a provider with one key is usable again once its limit resets"""
+        provider = self.factory.create_provider("mistral", "key-a", ["mistral-small"], f"{self.upstream.url}/v1")
+        self.upstream.behaviour.limited_keys.add("key-a")
+        self.assertFalse(provider.generate("hi", "mistral-small")["success"])
+        self.assertEqual(provider.rate_limit_remaining, 0)
+        self.upstream.behaviour.limited_keys.clear()
+        time.sleep(1.1)
+        self.assertIsNone(provider.key_pool.rate_limit_remaining)
+        self.assertTrue(provider.generate("hi", "mistral-small")["success"])
+
+    def test_fallback_retries_after_park(self):
+        """Test that the fallback handler tries a rate-limited provider again once its key is unparked"""
+        provider = self.factory.create_provider("mistral", "key-a", ["mistral-small"], f"{self.upstream.url}/v1")
+        provider.set_api_keys([], park_seconds=0.5)
+        handler = FallbackHandler(self.factory, max_retries=1)
+        self.upstream.behaviour.limited_keys.add("key-a")
+        self.assertFalse(handler.process_request("hi", "mistral-small", ["mistral"])["success"])
+        self.upstream.behaviour.limited_keys.clear()
+        time.sleep(1.1)
+        result = handler.process_request("hi", "mistral-small", ["mistral"])
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertEqual(result["provider"], "mistral")
+
+def main():
+    """Main entry point for key pool tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+II-Agent MCP Server Add-On - Test Lifecycle
+Tests readiness, connection draining and graceful shutdown
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import threading
+import unittest
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.lifecycle import DrainMiddleware, ShutdownController, DRAINING, READY, STOPPING
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class SlowApp:
+    """ASGI app that answers once released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        if scope["path"] == "/generate":
+            await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+        await send({"type": "http.response.body", "body": b"ok", "more_body": False})
+
+async def call(app, path: str = "/generate"):
+    """Call an ASGI app, returning the status and headers"""
+    scope = {"type": "http", "method": "POST", "path": path, "headers": []}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"], dict(messages[0]["headers"])
+
+class DrainTester(unittest.IsolatedAsyncioTestCase):
+    """Tests the shutdown controller and drain middleware"""
+
+    def setUp(self):
+        """Wrap a slow app"""
+        self.controller = ShutdownController(drain_timeout=2.0, registry=MetricsRegistry())
+        self.slow_app = SlowApp()
+        self.app = DrainMiddleware(self.slow_app, self.controller)
+
+    async def test_readiness(self):
+        """Test that the server is only ready between startup and shutdown"""
+        self.assertFalse(self.controller.ready)
+        self.controller.mark_ready()
+        self.assertEqual(self.controller.get_status(), {"state": READY, "ready": True, "in_flight": 0})
+        await self.controller.drain()
+        self.assertFalse(self.controller.ready)
+
+    async def test_drain_waits_for_in_flight(self):
+        """Test that draining rejects new requests and waits for running ones"""
+        self.controller.mark_ready()
+        in_flight = asyncio.create_task(call(self.app))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.controller.in_flight, 1)
+
+        drain = asyncio.create_task(self.controller.drain())
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.controller.state, DRAINING)
+        self.assertFalse(drain.done())
+
+        status, headers = await call(self.app)
+        self.assertEqual(status, 503)
+        self.assertEqual(headers[b"connection"], b"close")
+        status, _ = await call(self.app, "/status")
+        self.assertEqual(status, 200)
+
+        self.slow_app.release.set()
+        status, headers = await in_flight
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"connection"], b"close")
+        self.assertEqual(await drain, 0)
+
+    async def test_readiness_delay(self):
+        """Test that requests are still served while load balancers react to the readiness change"""
+        self.controller.readiness_delay = 0.2
+        self.controller.mark_ready()
+        self.slow_app.release.set()
+        drain = asyncio.create_task(self.controller.drain())
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.controller.state, STOPPING)
+        self.assertEqual((await call(self.app))[0], 200)
+        await drain
+        self.assertEqual((await call(self.app))[0], 503)
+
+    async def test_drain_timeout(self):
+        """Test that draining gives up at the deadline"""
+        self.controller.drain_timeout = 0.1
+        in_flight = asyncio.create_task(call(self.app))
+        await asyncio.sleep(0.05)
+        self.assertEqual(await self.controller.drain(), 1)
+        self.slow_app.release.set()
+        await in_flight
+        self.assertEqual(self.controller.in_flight, 0)
+
+class GracefulShutdownTester(unittest.TestCase):
+    """Tests SIGTERM handling of the server process"""
+
+    @unittest.skipIf(sys.platform == "win32", "SIGTERM is not available")
+    def test_sigterm_drains_in_flight_generation(self):
+        """Test that a generation running when SIGTERM arrives completes before the process exits"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=1.0, completion_tokens=3)).start()
+        gateway = GatewayProcess(upstream.url, ["gemini"], {"shutdown": {"drain_timeout": 10}, "health_check": {"enabled": False}})
+        results = {}
+        try:
+            gateway.start(graceful=True)
+            self.assertEqual(requests.get(f"{gateway.url}/ready", timeout=5).status_code, 200)
+
+            def generate():
+                response = requests.post(f"{gateway.url}/generate", json={"prompt": "hi", "model": "gemini-1.5-flash"}, timeout=10)
+                results["status"] = response.status_code
+
+            thread = threading.Thread(target=generate)
+            thread.start()
+            time.sleep(0.3)
+            gateway.process.send_signal(signal.SIGTERM)
+            time.sleep(0.2)
+
+            ready = requests.get(f"{gateway.url}/ready", timeout=5)
+            self.assertEqual(ready.status_code, 503)
+            self.assertEqual(ready.json()["in_flight"], 1)
+            self.assertEqual(requests.post(f"{gateway.url}/generate", json={"prompt": "hi"}, timeout=5).status_code, 503)
+
+            thread.join(10)
+            self.assertEqual(results.get("status"), 200)
+            self.assertEqual(gateway.process.wait(10), 0)
+        finally:
+            gateway.stop()
+            upstream.stop()
+
+def main():
+    """Main entry point for lifecycle tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
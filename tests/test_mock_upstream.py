@@ -0,0 +1,71 @@
+"""
+II-Agent MCP Server Add-On - Test Mock Upstream
+Tests the providers end to end over HTTP against the local mock upstream
+"""
+import os
+import sys
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.providers.gemini import GeminiProvider
+from ii_agent_mcp_mvp.providers.deepseek import DeepSeekProvider
+from ii_agent_mcp_mvp.providers.mistral import MistralProvider
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class MockUpstreamTester(unittest.TestCase):
+    """Tests providers against the mock upstream"""
+
+    def setUp(self):
+        """Start a mock upstream"""
+        self.behaviour = UpstreamBehaviour(latency=0.0, completion_tokens=5, seed=0)
+        self.upstream = MockUpstream(self.behaviour).start()
+
+    def tearDown(self):
+        """Stop the mock upstream"""
+        self.upstream.stop()
+
+    def test_gemini_generation(self):
+        """Test a Gemini generation over HTTP"""
+        provider = GeminiProvider("test-key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        result = provider.generate("hello there", "gemini-1.5-flash")
+        self.assertTrue(result["success"], result)
+        self.assertEqual(result["text"], "token token token token token")
+        self.assertEqual(result["usage"]["prompt_tokens"], 2)
+        self.assertEqual(result["usage"]["completion_tokens"], 5)
+
+    def test_openai_compatible_generation(self):
+        """Test DeepSeek and Mistral generations over HTTP"""
+        for provider_class, model in ((DeepSeekProvider, "deepseek-chat"), (MistralProvider, "mistral-small")):
+            provider = provider_class("test-key", [model], f"{self.upstream.url}/v1")
+            result = provider.generate("hello", model)
+            self.assertTrue(result["success"], result)
+            self.assertEqual(result["model"], model)
+            self.assertEqual(result["usage"]["total_tokens"], 6)
+
+    def test_model_discovery(self):
+        """Test model listing against the mock"""
+        provider = MistralProvider("test-key", ["mistral-small"], f"{self.upstream.url}/v1")
+        self.assertTrue(provider.validate_api_key())
+        self.assertIn("mistral-large", provider.discover_models())
+
+    def test_rate_limited_upstream(self):
+        """Test that 429 responses are reported as failures with rate limit headers"""
+        self.behaviour.rate_limit_rate = 1.0
+        provider = GeminiProvider("test-key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        result = provider.generate("hello", "gemini-1.5-flash")
+        self.assertFalse(result["success"])
+        self.assertIn("429", result["error"])
+        self.assertEqual(provider.rate_limit_remaining, 0)
+
+def main():
+    """Main entry point for mock upstream tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
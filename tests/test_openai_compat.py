@@ -0,0 +1,161 @@
+"""
+II-Agent MCP Server Add-On - Test OpenAI-Compatible API
+Tests message translation, provider streaming and the /v1/chat/completions and /v1/models endpoints
+"""
+import os
+import sys
+import json
+import unittest
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.openai_compat import normalize_messages, stream_chunks
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+def read_events(response):
+    """Decode the data lines of a server-sent event response"""
+    events = []
+    for line in response.iter_lines():
+        if line.startswith(b"data: "):
+            data = line[len(b"data: "):]
+            events.append(data.decode() if data == b"[DONE]" else json.loads(data))
+    return events
+
+class TranslationTester(unittest.TestCase):
+    """Tests translating messages and streams"""
+
+    def test_normalize_messages(self):
+        """Test that roles and text parts are reduced to what providers take"""
+        messages = normalize_messages([
+            {"role": "developer", "content": "Be brief"},
+            {"role": "user", "content": [{"type": "text", "text": "Hi "}, {"type": "text", "text": "there"}]},
+            {"role": "assistant", "content": None}
+        ])
+        self.assertEqual(messages, [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Hi there"},
+                                    {"role": "assistant", "content": ""}])
+        with self.assertRaises(ValueError):
+            normalize_messages([{"role": "tool", "content": "42"}])
+        with self.assertRaises(ValueError):
+            normalize_messages([{"role": "user", "content": [{"type": "image_url", "image_url": {}}]}])
+        with self.assertRaises(ValueError):
+            normalize_messages([{"role": "system", "content": "Be brief"}])
+
+    def test_stream_chunks(self):
+        """Test that stream events become chunks ending with usage and [DONE]"""
+        finished = []
+        result = {"model": "m", "provider": "p", "stream": iter([{"text": "Hel"}, {"text": "lo", "finish_reason": "length"}])}
+        events = [e.decode() for e in stream_chunks(result, "hi", "chatcmpl-1", include_usage=True, on_finish=finished.append)]
+        payloads = [json.loads(e[len("data: "):]) for e in events[:-1]]
+
+        self.assertEqual([p["choices"][0]["delta"] for p in payloads[:4]],
+                         [{"role": "assistant", "content": ""}, {"content": "Hel"}, {"content": "lo"}, {}])
+        self.assertEqual(payloads[3]["choices"][0]["finish_reason"], "length")
+        self.assertEqual(payloads[4]["usage"]["completion_tokens"], finished[0]["completion_tokens"])
+        self.assertEqual(events[-1], "data: [DONE]\n\n")
+
+    def test_stream_failure(self):
+        """Test that a stream failing midway ends with an error event"""
+        def failing():
+            yield {"text": "partial"}
+            raise ConnectionError("reset")
+        events = list(stream_chunks({"model": "m", "provider": "p", "stream": failing()}, "hi", "chatcmpl-1"))
+        self.assertIn(b'"error"', events[-1])
+        self.assertNotIn(b"[DONE]", b"".join(events))
+
+class ProviderStreamTester(unittest.TestCase):
+    """Tests streamed generation against the mock upstream"""
+
+    def test_streams_and_messages(self):
+        """Test that every provider streams pieces and accepts chat messages"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=6, stream_chunks=3)).start()
+        try:
+            factory = ProviderFactory()
+            factory.create_provider("gemini", "key", ["gemini-1.5-flash"], f"{upstream.url}/v1beta")
+            factory.create_provider("deepseek", "key", ["deepseek-chat"], f"{upstream.url}/v1")
+            factory.create_provider("mistral", "key", ["mistral-small"], f"{upstream.url}/v1")
+            messages = [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "hi"}]
+            for name, model in (("gemini", "gemini-1.5-flash"), ("deepseek", "deepseek-chat"), ("mistral", "mistral-small")):
+                provider = factory.get_provider(name)
+                result = provider.generate_stream("hi", model, messages=messages)
+                self.assertTrue(result["success"], result.get("error"))
+                pieces = [event["text"] for event in result["stream"] if event.get("text")]
+                self.assertEqual(len(pieces), 3)
+                self.assertEqual("".join(pieces).split(), ["token"] * 6)
+                self.assertTrue(provider.generate("hi", model, messages=messages)["success"])
+        finally:
+            upstream.stop()
+
+class ServerOpenAITester(unittest.TestCase):
+    """Tests the OpenAI-compatible endpoints against the server"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a gateway in front of the mock upstream"""
+        cls.upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=4, stream_chunks=2)).start()
+        cls.gateway = GatewayProcess(cls.upstream.url, ["gemini", "mistral"], {"health_check": {"enabled": False}})
+        cls.gateway.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the gateway and the mock upstream"""
+        cls.gateway.stop()
+        cls.upstream.stop()
+
+    def test_chat_completion(self):
+        """Test a non-streamed completion"""
+        body = {"model": "fast", "messages": [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "hi"}]}
+        response = requests.post(f"{self.gateway.url}/v1/chat/completions", json=body, timeout=10)
+        self.assertEqual(response.status_code, 200, response.text)
+        completion = response.json()
+        self.assertEqual((completion["object"], completion["model"]), ("chat.completion", "gemini-1.5-flash"))
+        self.assertEqual(completion["choices"][0]["message"], {"role": "assistant", "content": "token token token token"})
+        self.assertEqual(completion["usage"]["completion_tokens"], 4)
+
+    def test_streamed_chat_completion(self):
+        """Test a streamed completion with a usage chunk"""
+        body = {"model": "mistral-small", "messages": [{"role": "user", "content": "hi"}], "stream": True,
+                "stream_options": {"include_usage": True}}
+        with requests.post(f"{self.gateway.url}/v1/chat/completions", json=body, stream=True, timeout=10) as response:
+            self.assertEqual(response.headers["content-type"].split(";")[0], "text/event-stream")
+            events = read_events(response)
+        self.assertEqual(events[-1], "[DONE]")
+        chunks = events[:-1]
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+        self.assertEqual(text.split(), ["token"] * 4)
+        self.assertEqual(chunks[-2]["choices"][0]["finish_reason"], "stop")
+        self.assertGreater(chunks[-1]["usage"]["completion_tokens"], 0)
+        self.assertTrue(all(c["model"] == "mistral-small" for c in chunks))
+
+    def test_errors_and_models(self):
+        """Test OpenAI-shaped errors and the model list"""
+        response = requests.post(f"{self.gateway.url}/v1/chat/completions",
+                                 json={"messages": [{"role": "tool", "content": "x"}]}, timeout=10)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"]["type"], "invalid_request_error")
+        response = requests.post(f"{self.gateway.url}/v1/chat/completions", json={"messages": []}, timeout=10)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("messages", response.json()["error"]["message"])
+        # Other endpoints keep their own error shape
+        self.assertIn("detail", requests.get(f"{self.gateway.url}/jobs", timeout=10).json())
+
+        models = requests.get(f"{self.gateway.url}/v1/models", timeout=10).json()
+        owners = {model["id"]: model["owned_by"] for model in models["data"]}
+        self.assertEqual(owners["gemini-1.5-flash"], "gemini")
+        self.assertEqual(owners["mistral-small"], "mistral")
+        self.assertIn("fast", owners)
+
+def main():
+    """Main entry point for OpenAI-compatible API tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+II-Agent MCP Server Add-On - Test Profiling
+Tests the sampling profiler and per-stage timers
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.utils.metrics import get_registry
+from ii_agent_mcp_mvp.utils.profiling import SamplingProfiler, ProfilerBusy, configure_profiling, run_profile, stage, STAGE_BUCKETS
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+def busy_loop(stop: threading.Event):
+    """Burn CPU until stopped"""
+    while not stop.is_set():
+        sum(range(1000))
+
+class ProfilingTester(unittest.TestCase):
+    """Tests profiling functionality"""
+
+    def tearDown(self):
+        """Disable stage timers"""
+        configure_profiling(None)
+
+    def test_sampling_profiler(self):
+        """Test that a busy thread shows up in the collapsed stacks"""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+        worker.start()
+        try:
+            profiler = run_profile(0.2, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+
+        self.assertGreater(profiler.samples, 10)
+        lines = profiler.collapsed().splitlines()
+        busy = [line for line in lines if line.startswith("busy-worker;") and "busy_loop" in line]
+        self.assertTrue(busy, lines)
+        stack, count = busy[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(stack.endswith(":busy_loop"), stack)
+
+    def test_idle_threads_skipped(self):
+        """Test that threads waiting for work are left out by default"""
+        stop = threading.Event()
+        waiter = threading.Thread(target=stop.wait, name="idle-waiter")
+        waiter.start()
+        try:
+            idle = SamplingProfiler(0.005)
+            idle.run(0.05)
+            everything = SamplingProfiler(0.005, include_idle=True)
+            everything.run(0.05)
+        finally:
+            stop.set()
+            waiter.join()
+
+        self.assertFalse(any(s.startswith("idle-waiter;") for s in idle.stacks))
+        self.assertTrue(any(s.startswith("idle-waiter;") for s in everything.stacks))
+
+    def test_single_profile_at_a_time(self):
+        """Test that concurrent profiles are refused"""
+        thread = threading.Thread(target=run_profile, args=(0.3,))
+        thread.start()
+        time.sleep(0.05)
+        try:
+            with self.assertRaises(ProfilerBusy):
+                run_profile(0.1)
+        finally:
+            thread.join()
+
+    def test_stage_timers(self):
+        """Test that stages are only recorded when enabled"""
+        histogram = get_registry().histogram("mcp_stage_seconds", "", STAGE_BUCKETS)
+        labels = {"stage": "test_stage"}
+
+        with stage("test_stage"):
+            pass
+        self.assertEqual(histogram.get_count(labels), 0)
+
+        configure_profiling({"stage_timers": True})
+        with stage("test_stage"):
+            time.sleep(0.01)
+        self.assertEqual(histogram.get_count(labels), 1)
+        self.assertGreaterEqual(histogram.get_sum(labels), 0.01)
+
+def main():
+    """Main entry point for profiling tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
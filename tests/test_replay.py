@@ -0,0 +1,191 @@
+"""
+II-Agent MCP Server Add-On - Test Replay Log
+Tests the replay log writer, segment rotation, streaming statistics and replay
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.replay import (
+    ReplayLogWriter, LatencyHistogram, Replayer, compute_stats, iter_entries, list_segments
+)
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+REQUEST = {"prompt": "Summarize the release notes", "model": "gemini-1.5-flash", "provider": None,
+           "temperature": 0.7, "max_tokens": 64, "top_p": None, "top_k": None, "priority": None}
+
+def make_result(provider: str, latency: float) -> dict:
+    """Build a successful fallback handler result"""
+    return {"success": True, "text": "notes", "model": f"{provider}-model", "provider": provider,
+            "usage": {"prompt_tokens": 4, "completion_tokens": 6, "total_tokens": 10}, "latency": latency}
+
+class ReplayLogWriterTester(unittest.TestCase):
+    """Tests writing and reading replay logs"""
+
+    def setUp(self):
+        """Create a log directory"""
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the log directory"""
+        shutil.rmtree(self.directory)
+
+    def make_writer(self, **kwargs) -> ReplayLogWriter:
+        writer = ReplayLogWriter(self.directory, registry=MetricsRegistry(), **kwargs)
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_round_trip(self):
+        """Test that recorded requests are read back in order, with prompts but not responses"""
+        writer = self.make_writer()
+        for i in range(10):
+            writer.record_request(REQUEST, "team-a", "normal", 200, make_result("gemini", 0.1 * (i + 1)), 0.1 * (i + 1), 0.001)
+        writer.record_request(REQUEST, "team-a", "normal", 500, {"success": False, "error": "API Error: 503"}, 2.0)
+        self.assertTrue(writer.flush())
+
+        entries = list(iter_entries([self.directory]))
+        self.assertEqual(len(entries), 11)
+        self.assertEqual(entries[0]["request"]["prompt"], REQUEST["prompt"])
+        self.assertEqual(entries[0]["provider"], "gemini")
+        self.assertNotIn("text", entries[0])
+        self.assertEqual(entries[-1]["status"], 500)
+        self.assertEqual(entries[-1]["error"], "API Error: 503")
+        self.assertTrue(list_segments(self.directory)[0].endswith(".jsonl.gz"))
+
+    def test_capture_settings(self):
+        """Test that prompts can be left out and responses kept"""
+        writer = self.make_writer(compression="none", capture_prompts=False, capture_responses=True)
+        writer.record_request(REQUEST, "team-a", "normal", 200, make_result("gemini", 0.1), 0.1)
+        writer.flush()
+
+        entry = next(iter_entries([self.directory]))
+        self.assertNotIn("prompt", entry["request"])
+        self.assertEqual(entry["request"]["model"], "gemini-1.5-flash")
+        self.assertEqual(entry["text"], "notes")
+
+    def test_rotation_and_retention(self):
+        """Test that segments rotate by size and old segments are deleted"""
+        writer = self.make_writer(segment_max_bytes=200, max_segments=3, batch_size=1)
+        for i in range(8):
+            writer.record_request(REQUEST, f"client-{i}", "normal", 200, make_result("gemini", 0.1), 0.1)
+            writer.flush()
+
+        segments = list_segments(self.directory)
+        self.assertEqual(len(segments), 3)
+        clients = [entry["client"] for entry in iter_entries(segments)]
+        self.assertEqual(clients, sorted(clients))
+        self.assertIn("client-7", clients)
+        self.assertNotIn("client-0", clients)
+
+    def test_truncated_segment(self):
+        """Test that a partly written final batch ends reading without losing earlier entries"""
+        writer = self.make_writer(batch_size=1)
+        for _ in range(3):
+            writer.record_request(REQUEST, "team-a", "normal", 200, make_result("gemini", 0.1), 0.1)
+            writer.flush()
+        writer.close()
+
+        path = list_segments(self.directory)[0]
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 10)
+        self.assertEqual(len(list(iter_entries([path]))), 2)
+
+    def test_full_queue_drops(self):
+        """Test that recording never blocks when the queue is full"""
+        writer = self.make_writer(queue_size=1)
+        results = [writer.record({"n": i}) for i in range(1000)]
+        self.assertIn(False, results)
+        writer.flush()
+
+class ReplayStatsTester(unittest.TestCase):
+    """Tests streaming statistics"""
+
+    def test_histogram_percentiles(self):
+        """Test that percentiles are within the bucket resolution"""
+        histogram = LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.add(i / 1000.0)
+        summary = histogram.summary()
+        self.assertAlmostEqual(summary["mean"], 0.5005, places=4)
+        self.assertAlmostEqual(summary["p50"], 0.5, delta=0.5 * 0.04)
+        self.assertAlmostEqual(summary["p99"], 0.99, delta=0.99 * 0.04)
+        self.assertEqual(LatencyHistogram().percentile(50), 0.0)
+
+    def test_compute_stats(self):
+        """Test aggregation by status and provider"""
+        entries = [
+            {"timestamp": 100.0, "status": 200, "provider": "gemini", "latency": 0.2, "cost": 0.01,
+             "usage": {"total_tokens": 10}},
+            {"timestamp": 110.0, "status": 200, "provider": "mistral", "latency": 0.4, "fallback_used": True,
+             "usage": {"total_tokens": 5}},
+            {"timestamp": 105.0, "status": 200, "provider": "gemini", "latency": 0.001, "cached": True, "cost": 0.0},
+            {"timestamp": 120.0, "status": 500, "provider": None, "latency": 3.0, "usage": None}
+        ]
+        stats = compute_stats(iter(entries))
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["statuses"], {"200": 3, "500": 1})
+        self.assertEqual(stats["duration"], 20.0)
+        self.assertEqual((stats["fallback_used"], stats["cached"]), (1, 1))
+        self.assertEqual(stats["providers"]["gemini"]["requests"], 2)
+        self.assertEqual(stats["providers"]["gemini"]["tokens"], 10)
+        self.assertEqual(stats["providers"]["none"]["requests"], 1)
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    """Records /generate requests"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.path, self.headers.get("X-Client-ID"), body))
+        data = b'{"text": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class ReplayerTester(unittest.TestCase):
+    """Tests replaying captured requests"""
+
+    def test_replay(self):
+        """Test that captured requests are resent with their parameters and client"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), GatewayHandler)
+        server.received = []
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            entries = [{"timestamp": 100.0 + i, "client": "team-a", "request": REQUEST} for i in range(5)]
+            entries.append({"timestamp": 106.0, "client": "team-a", "request": {"model": "gemini-1.5-flash"}})
+            replayer = Replayer(f"http://127.0.0.1:{server.server_address[1]}", concurrency=2)
+            summary = replayer.run(iter(entries), limit=4)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual((summary["sent"], summary["skipped"]), (4, 0))
+        self.assertEqual(summary["statuses"], {"200": 4})
+        self.assertEqual(len(server.received), 4)
+        path, client, body = server.received[0]
+        self.assertEqual((path, client), ("/generate", "team-a"))
+        self.assertEqual(body, {"prompt": REQUEST["prompt"], "model": "gemini-1.5-flash", "temperature": 0.7, "max_tokens": 64})
+
+def main():
+    """Main entry point for replay log tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+II-Agent MCP Server Add-On - Test Routing
+Tests the compiled routing table and routed generation
+"""
+import os
+import sys
+import unittest
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.routing import RoutingTable
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+PROVIDER_MODELS = {
+    "gemini": ["gemini-1.5-pro", "gemini-1.5-flash"],
+    "deepseek": ["deepseek-chat", "deepseek-coder"],
+    "mistral": ["mistral-large", "mistral-small"]
+}
+
+class RoutingTableTester(unittest.TestCase):
+    """Tests route compilation and lookup"""
+
+    def setUp(self):
+        """Compile a table for all three providers"""
+        self.table = RoutingTable(PROVIDER_MODELS, {"code": {"deepseek": "deepseek-coder", "mistral": "mistral-large"}})
+
+    def test_default_model(self):
+        """Test that the default model routes to each provider's first model"""
+        self.assertEqual(self.table.route("default").targets,
+                         [("gemini", "gemini-1.5-pro"), ("deepseek", "deepseek-chat"), ("mistral", "mistral-large")])
+
+    def test_concrete_model(self):
+        """Test that the provider serving a model comes first and the others use their defaults"""
+        self.assertEqual(self.table.route("mistral-small").targets,
+                         [("mistral", "mistral-small"), ("gemini", "gemini-1.5-pro"), ("deepseek", "deepseek-chat")])
+
+    def test_aliases(self):
+        """Test built-in and configured aliases"""
+        self.assertEqual(self.table.route("fast").targets,
+                         [("gemini", "gemini-1.5-flash"), ("deepseek", "deepseek-chat"), ("mistral", "mistral-small")])
+        self.assertEqual(self.table.route("code").targets, [("deepseek", "deepseek-coder"), ("mistral", "mistral-large")])
+
+    def test_requested_provider(self):
+        """Test that a requested provider goes first with its target for the model"""
+        self.assertEqual(self.table.route("smart", "mistral").targets,
+                         [("mistral", "mistral-large"), ("gemini", "gemini-1.5-pro"), ("deepseek", "deepseek-chat")])
+        self.assertEqual(self.table.route("deepseek-coder", "gemini").targets[:2],
+                         [("gemini", "gemini-1.5-pro"), ("deepseek", "deepseek-coder")])
+        self.assertEqual(self.table.route("code", "gemini").providers, ["gemini", "deepseek", "mistral"])
+
+    def test_unknown_model_and_provider(self):
+        """Test that unknown models are left for providers to resolve"""
+        route = self.table.route("gemini-2.0-flash", "deepseek")
+        self.assertEqual(route.providers, ["deepseek", "gemini", "mistral"])
+        self.assertEqual(route.models, {})
+        self.assertIs(self.table.route("fast", "openai"), self.table.route("fast"))
+
+    def test_aliases_skip_unlisted_models(self):
+        """Test that alias targets a provider does not list are dropped"""
+        table = RoutingTable({"gemini": ["gemini-1.5-flash"], "deepseek": ["deepseek-chat"]})
+        self.assertNotIn("gemini", dict(table.route("smart").targets))
+        self.assertEqual(table.route("smart").targets[0], ("deepseek", "deepseek-chat"))
+
+    def test_lookup_is_precompiled(self):
+        """Test that routes are shared rather than rebuilt per request"""
+        self.assertIs(self.table.route("fast", "mistral"), self.table.route("fast", "mistral"))
+
+class RoutedGenerationTester(unittest.TestCase):
+    """Tests routing through the fallback handler and server"""
+
+    def setUp(self):
+        """Start a mock upstream"""
+        self.upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=2)).start()
+
+    def tearDown(self):
+        """Stop the upstream"""
+        self.upstream.stop()
+
+    def test_handler_uses_routed_models(self):
+        """Test that routed models are sent as they are, and fallback uses the next target's model"""
+        factory = ProviderFactory()
+        factory.create_provider("gemini", "key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        factory.create_provider("mistral", "key", ["mistral-small"], f"{self.upstream.url}/v1")
+        route = RoutingTable.from_config(factory, ["gemini", "mistral"], None).route("default")
+        handler = FallbackHandler(factory)
+
+        result = handler.process_request("hi", "default", route.providers, provider_models=route.models)
+        self.assertTrue(result["success"], result)
+        self.assertEqual((result["provider"], result["model"]), ("gemini", "gemini-1.5-flash"))
+
+        self.upstream.behaviour.error_rate = 1.0
+        factory.create_provider("mistral", "key", ["mistral-small"], "http://127.0.0.1:9/v1")
+        result = handler.process_request("hi", "default", route.providers, provider_models=route.models)
+        self.assertFalse(result["success"])
+        self.assertIn("mistral", result["details"][-1])
+
+    def test_default_without_models(self):
+        """Test that default resolves to the provider's fallback model when none were configured or discovered"""
+        factory = ProviderFactory()
+        gemini = factory.create_provider("gemini", "key", [], f"{self.upstream.url}/v1beta")
+        gemini.models = []
+        route = RoutingTable.from_config(factory, ["gemini"], None).route("default")
+        self.assertEqual(route.targets, [("gemini", None)])
+
+        result = FallbackHandler(factory).process_request("hi", "default", route.providers, provider_models=route.models)
+        self.assertTrue(result["success"], result)
+        self.assertEqual(result["model"], "gemini-1.5-flash")
+
+    def test_server_routes_aliases(self):
+        """Test that the server resolves default and aliases to concrete models"""
+        gateway = GatewayProcess(self.upstream.url, ["gemini", "mistral"], {"health_check": {"enabled": False}})
+        try:
+            gateway.start()
+            for model, expected in (("default", "gemini-1.5-flash"), ("fast", "gemini-1.5-flash")):
+                response = requests.post(f"{gateway.url}/generate", json={"prompt": "hi", "model": model}, timeout=10)
+                self.assertEqual(response.status_code, 200, response.text)
+                self.assertEqual(response.json()["model"], expected)
+            response = requests.post(f"{gateway.url}/generate",
+                                     json={"prompt": "hi", "model": "fast", "provider": "Mistral"}, timeout=10)
+            self.assertEqual((response.json()["provider"], response.json()["model"]), ("mistral", "mistral-small"))
+        finally:
+            gateway.stop()
+
+def main():
+    """Main entry point for routing tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+II-Agent MCP Server Add-On - Test Shadow Traffic
+Tests mirroring sampled requests to candidate providers and comparing them
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import GatewayProcess
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.config import ConfigManager
+from ii_agent_mcp_mvp.shadow import ShadowMirror, ShadowTarget
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+PRIMARY = {"success": True, "text": "ok", "provider": "gemini", "model": "gemini-1.5-flash", "latency": 0.5,
+           "usage": {"completion_tokens": 10}}
+
+def wait_idle(mirror, timeout=5.0):
+    """Wait until no shadow calls are pending"""
+    deadline = time.time() + timeout
+    while mirror.get_status()["pending"] and time.time() < deadline:
+        time.sleep(0.01)
+
+class ShadowMirrorTester(unittest.TestCase):
+    """Tests sampling, bounding and comparison of shadow calls"""
+
+    def setUp(self):
+        """Create a mirror over a mock candidate provider"""
+        self.registry = MetricsRegistry()
+        self.candidate = MagicMock()
+        self.candidate.generate.return_value = {"success": True, "text": "a longer answer", "latency": 0.1,
+                                                "usage": {"completion_tokens": 30}}
+        factory = MagicMock()
+        factory.get_provider = lambda name: self.candidate if name == "mistral" else None
+        self.mirror = ShadowMirror(factory, [ShadowTarget("mistral", "mistral-large", 1.0)], max_workers=1,
+                                   max_pending=1, registry=self.registry)
+
+    def tearDown(self):
+        """Stop the mirror"""
+        self.mirror.close()
+
+    def test_comparison(self):
+        """Test that answered and failed shadow calls are compared with the live result"""
+        self.assertEqual(self.mirror.mirror("hi", {"max_tokens": 100, "top_k": None}, PRIMARY), 1)
+        wait_idle(self.mirror)
+        self.candidate.generate.assert_called_once_with("hi", "mistral-large", max_tokens=100)
+
+        self.candidate.generate.return_value = {"success": False, "error": "API Error: 500"}
+        self.mirror.mirror("hi", {}, PRIMARY)
+        wait_idle(self.mirror)
+
+        stats = self.mirror.get_status()["targets"][0]
+        self.assertEqual((stats["mirrored"], stats["errors"], stats["compared"]), (2, 1, 1))
+        self.assertEqual(stats["error_rate"], 0.5)
+        self.assertEqual(stats["output_tokens"], {"shadow_mean": 30, "primary_mean": 10})
+        self.assertEqual(stats["latency"]["primary_mean"], 0.5)
+        counter = self.registry.counter("mcp_shadow_requests_total", "")
+        self.assertEqual(counter.get({"provider": "mistral", "model": "mistral-large", "outcome": "error"}), 1)
+
+    def test_bounded_and_off_path(self):
+        """Test that mirroring does not wait for a slow candidate and drops calls beyond max_pending"""
+        release = threading.Event()
+        self.candidate.generate.side_effect = lambda *args, **kwargs: release.wait(5) and {"success": True, "text": ""}
+        start = time.perf_counter()
+        self.assertEqual(self.mirror.mirror("hi", {}, PRIMARY), 1)
+        self.assertEqual(self.mirror.mirror("hi", {}, PRIMARY), 0)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        release.set()
+        wait_idle(self.mirror)
+        self.assertEqual(self.mirror.get_status()["targets"][0]["dropped"], 1)
+
+    def test_sampling(self):
+        """Test that unsampled requests and requests the target itself answered are not mirrored"""
+        self.mirror.targets[0].sample_rate = 0.0
+        self.assertEqual(self.mirror.mirror("hi", {}, PRIMARY), 0)
+        self.mirror.targets[0].sample_rate = 1.0
+        self.assertEqual(self.mirror.mirror("hi", {}, {**PRIMARY, "provider": "mistral", "model": "mistral-large"}), 0)
+        self.candidate.generate.assert_not_called()
+
+    def test_shadow_only_providers(self):
+        """Test that shadow-only providers are left out of the fallback order"""
+        config = ConfigManager("missing-providers.yaml")
+        config.config["providers"] = [{"name": "Gemini"}, {"name": "mistral", "shadow_only": True}]
+        self.assertEqual(config.get_provider_order(), ["gemini"])
+
+class ServerShadowTester(unittest.TestCase):
+    """Tests shadow traffic through the server"""
+
+    def test_mirrored_requests(self):
+        """Test that answered requests are mirrored and reported in /status"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0)).start()
+        shadow = {"enabled": True, "targets": [{"provider": "mistral", "model": "mistral-small", "sample_rate": 1.0}]}
+        gateway = GatewayProcess(upstream.url, ["gemini", "mistral"], {"health_check": {"enabled": False}, "shadow": shadow})
+        try:
+            gateway.start()
+            for _ in range(3):
+                response = requests.post(f"{gateway.url}/generate", json={"prompt": "hi"}, timeout=10)
+                self.assertEqual(response.json()["provider"], "gemini")
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                stats = requests.get(f"{gateway.url}/status", timeout=5).json()["shadow"]["targets"][0]
+                if stats["mirrored"] == 3:
+                    break
+                time.sleep(0.05)
+            self.assertEqual((stats["mirrored"], stats["errors"]), (3, 0))
+            self.assertEqual(upstream.behaviour.stats["requests"], 6)
+        finally:
+            gateway.stop()
+            upstream.stop()
+
+def main():
+    """Main entry point for shadow traffic tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
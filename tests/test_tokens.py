@@ -0,0 +1,99 @@
+"""
+II-Agent MCP Server Add-On - Test Token Estimation
+Tests local token estimation and context limit checks in the fallback handler
+"""
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.tokens import ContextLimits, estimate_tokens
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class TokenTester(unittest.TestCase):
+    """Tests token estimation and context limit handling"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.limits = ContextLimits({
+            "small-model": {"context": 100, "max_output": 50},
+            "large-model": {"context": 10000, "max_output": 2000}
+        }, safety_margin=1.0)
+        self.provider_factory = ProviderFactory()
+        self.fallback_handler = FallbackHandler(self.provider_factory, max_retries=2, context_limits=self.limits)
+
+    def _mock_provider(self, model: str, models=None):
+        """Create a mock provider that resolves every request to one model"""
+        provider = MagicMock()
+        provider.rate_limit_remaining = None
+        provider.models = models or [model]
+        provider.resolve_model.return_value = model
+        provider.generate.return_value = {"success": True, "text": "ok", "model": model, "provider": "mock", "latency": 0.1}
+        return provider
+
+    def test_estimate_tokens(self):
+        """Test the local estimator"""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("Hello, world!"), 4)
+        # Long words count as several tokens
+        self.assertGreater(estimate_tokens("internationalization"), 1)
+        # Roughly four characters per token on ordinary prose
+        text = "The quick brown fox jumps over the lazy dog. " * 100
+        self.assertTrue(800 < estimate_tokens(text) < 1500)
+
+    def test_limit_lookup_and_clamp(self):
+        """Test prefix lookup and max_tokens clamping"""
+        self.assertEqual(self.limits.get_limits("gemini-1.5-pro-002")["context"], 2097152)
+        self.assertIsNone(self.limits.get_limits("unknown-model"))
+        self.assertEqual(self.limits.fit("small-model", 80, 1024), (True, 20))
+        self.assertEqual(self.limits.fit("small-model", 100, 1024), (False, 0))
+        self.assertEqual(self.limits.fit("unknown-model", 10**9, 1024), (True, 1024))
+
+    def test_oversized_prompt_skips_provider(self):
+        """Test that providers whose context is too small are never called"""
+        small = self._mock_provider("small-model")
+        large = self._mock_provider("large-model")
+        self.provider_factory.providers = {"small": small, "large": large}
+
+        result = self.fallback_handler.process_request("word " * 500, "default", ["small", "large"], max_tokens=4096)
+
+        self.assertTrue(result["success"])
+        small.generate.assert_not_called()
+        self.assertEqual(large.generate.call_args.kwargs["max_tokens"], 2000)
+
+    def test_route_to_larger_context_model(self):
+        """Test rerouting to a larger model offered by the same provider"""
+        provider = self._mock_provider("small-model", ["small-model", "large-model"])
+        self.provider_factory.providers = {"mock": provider}
+
+        result = self.fallback_handler.process_request("word " * 500, "small-model", ["mock"])
+
+        self.assertTrue(result["success"])
+        self.assertEqual(provider.generate.call_args.args[1], "large-model")
+
+    def test_all_providers_too_small(self):
+        """Test that oversized prompts are rejected without upstream calls"""
+        provider = self._mock_provider("small-model")
+        self.provider_factory.providers = {"mock": provider}
+
+        result = self.fallback_handler.process_request("word " * 500, "default", ["mock"])
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["error_type"], "context_length_exceeded")
+        self.assertEqual(result["attempts"], 0)
+        provider.generate.assert_not_called()
+
+def main():
+    """Main entry point for token tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+II-Agent MCP Server Add-On - Test Tracing
+Tests trace context propagation and span export for fallback attempts and upstream calls
+"""
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.providers.chaos import FaultProfile, FaultInjectingProvider
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.providers.gemini import GeminiProvider
+from ii_agent_mcp_mvp.fallback.handler import FallbackHandler
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.tracing import (SpanContext, Tracer, NOOP_SPAN, OtlpHttpSpanExporter, TracingMiddleware,
+                                            configure_tracing, get_tracer)
+from ii_agent_mcp_mvp.utils.logging import get_logger
+from test_chaos import StubProvider
+
+# Initialize logger
+logger = get_logger(__name__)
+
+TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+class TracingTester(unittest.TestCase):
+    """Tests tracing functionality"""
+
+    def setUp(self):
+        """Enable tracing to a temporary JSONL file"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.trace_file = os.path.join(self.temp_dir.name, "traces.jsonl")
+        self.tracer = configure_tracing({"enabled": True, "exporter": "file", "file": self.trace_file})
+
+    def tearDown(self):
+        """Disable tracing"""
+        configure_tracing(None)
+        self.temp_dir.cleanup()
+
+    def _spans(self):
+        self.tracer.flush()
+        if not os.path.exists(self.trace_file):
+            return []
+        with open(self.trace_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_traceparent(self):
+        """Test W3C traceparent parsing and formatting"""
+        context = SpanContext.from_traceparent(TRACEPARENT)
+        self.assertEqual(context.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertEqual(context.span_id, "00f067aa0ba902b7")
+        self.assertTrue(context.sampled)
+        self.assertEqual(context.to_traceparent(), TRACEPARENT)
+
+        self.assertIsNone(SpanContext.from_traceparent("garbage"))
+        self.assertIsNone(SpanContext.from_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01"))
+        self.assertFalse(SpanContext.from_traceparent(TRACEPARENT[:-2] + "00").sampled)
+
+    def test_disabled_tracer(self):
+        """Test that spans are no-ops without an exporter"""
+        tracer = Tracer()
+        with tracer.span("noop") as span:
+            self.assertIs(span, NOOP_SPAN)
+            span.set_attribute("ignored", True)
+        self.assertIsNone(tracer.current_span())
+
+    def test_remote_parent_and_nesting(self):
+        """Test that spans join an incoming trace and nest under the current span"""
+        with self.tracer.span("server", kind="server", parent=self.tracer.extract({"traceparent": TRACEPARENT})):
+            with self.tracer.span("child") as child:
+                headers = self.tracer.inject({})
+                self.assertEqual(headers["traceparent"], child.context.to_traceparent())
+            with self.assertRaises(RuntimeError):
+                with self.tracer.span("failing"):
+                    raise RuntimeError("boom")
+
+        spans = {span["name"]: span for span in self._spans()}
+        self.assertEqual(spans["server"]["trace_id"], "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertEqual(spans["server"]["parent_id"], "00f067aa0ba902b7")
+        self.assertEqual(spans["child"]["parent_id"], spans["server"]["span_id"])
+        self.assertEqual(spans["failing"]["status"], "error")
+        self.assertIn("boom", spans["failing"]["status_message"])
+
+    def test_fallback_attempt_spans(self):
+        """Test that every fallback attempt is recorded with its outcome"""
+        provider_factory = ProviderFactory()
+        primary = StubProvider("key", ["stub-model"])
+        provider_factory.providers = {
+            "primary": FaultInjectingProvider(primary, FaultProfile(error_rate=1.0, error_codes=[503]), registry=MetricsRegistry()),
+            "secondary": StubProvider("key", ["stub-model"])
+        }
+        handler = FallbackHandler(provider_factory, max_retries=2)
+
+        result = handler.process_request("prompt", "stub-model", ["primary", "secondary"])
+        self.assertTrue(result["success"])
+
+        spans = self._spans()
+        attempts = [s for s in spans if s["name"] == "fallback.attempt"]
+        self.assertEqual([a["attributes"]["provider"] for a in attempts], ["primary", "primary", "secondary"])
+        self.assertEqual([a["attributes"]["outcome"] for a in attempts], ["API Error: 503", "API Error: 503", "success"])
+
+        root = next(s for s in spans if s["name"] == "fallback.process_request")
+        self.assertEqual(root["attributes"]["attempts"], 3)
+        self.assertTrue(all(a["parent_id"] == root["span_id"] for a in attempts))
+
+    def test_http_and_decode_spans(self):
+        """Test that upstream calls record status, sizes and JSON decode time"""
+        upstream = MockUpstream(UpstreamBehaviour(latency=0.0, completion_tokens=5)).start()
+        try:
+            provider = GeminiProvider("secret-key", ["gemini-1.5-flash"], f"{upstream.url}/v1beta")
+            self.assertTrue(provider.generate("hello", "gemini-1.5-flash")["success"])
+        finally:
+            upstream.stop()
+
+        spans = {span["name"]: span for span in self._spans()}
+        http_span = spans["http.request"]
+        self.assertEqual(upstream.behaviour.traceparents,
+                         [f"00-{http_span['trace_id']}-{http_span['span_id']}-01"])
+        self.assertEqual(http_span["kind"], "client")
+        self.assertEqual(http_span["attributes"]["http.status_code"], 200)
+        self.assertGreater(http_span["attributes"]["http.request_bytes"], 0)
+        self.assertGreater(http_span["attributes"]["http.response_bytes"], 0)
+        self.assertNotIn("secret-key", json.dumps(http_span))
+        self.assertEqual(spans["json.decode"]["attributes"]["bytes"], http_span["attributes"]["http.response_bytes"])
+
+    def test_otlp_encoding(self):
+        """Test the OTLP/HTTP JSON encoding of a span"""
+        with self.tracer.span("encoded", {"count": 3, "ratio": 0.5, "ok": True, "name": "x"}, kind="client") as span:
+            pass
+        encoded = OtlpHttpSpanExporter("http://localhost:4318/v1/traces", "test")._encode(span)
+        self.assertEqual(encoded["kind"], 3)
+        self.assertEqual(encoded["traceId"], span.context.trace_id)
+        values = {a["key"]: a["value"] for a in encoded["attributes"]}
+        self.assertEqual(values["count"], {"intValue": "3"})
+        self.assertEqual(values["ratio"], {"doubleValue": 0.5})
+        self.assertEqual(values["ok"], {"boolValue": True})
+        self.assertIs(get_tracer(), self.tracer)
+
+    def test_middleware(self):
+        """Test that the server span continues the caller's trace and is returned in the response"""
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 503, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/generate", "headers": [(b"traceparent", TRACEPARENT.encode())]}
+        asyncio.run(TracingMiddleware(app)(scope, None, send))
+        traceparent = dict(messages[0]["headers"])[b"traceparent"].decode()
+        self.assertTrue(traceparent.startswith("00-4bf92f3577b34da6a3ce929d0e0e4736-"))
+
+        span = self._spans()[0]
+        self.assertEqual((span["name"], span["parent_id"], span["status"]), ("POST /generate", "00f067aa0ba902b7", "error"))
+        self.assertEqual(span["attributes"]["http.status_code"], 503)
+
+def main():
+    """Main entry point for tracing tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+II-Agent MCP Server Add-On - Test Usage Accounting
+Tests token usage extraction, cost calculation and metrics rendering
+"""
+import os
+import sys
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ii_agent_mcp_mvp.usage import UsageTracker
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.providers.gemini import GeminiProvider
+from ii_agent_mcp_mvp.providers.deepseek import DeepSeekProvider
+from ii_agent_mcp_mvp.providers.mistral import MistralProvider
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class UsageTester(unittest.TestCase):
+    """Tests usage accounting functionality"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.registry = MetricsRegistry()
+        self.tracker = UsageTracker({
+            "gemini-1.5-pro": {"input": 1.25, "output": 5.0},
+            "deepseek/deepseek-chat": {"input": 0.27, "cached_input": 0.07, "output": 1.10}
+        }, registry=self.registry)
+
+    def test_usage_extraction(self):
+        """Test provider-specific usage parsing"""
+        gemini = GeminiProvider("test-key", ["gemini-1.5-pro"])
+        usage = gemini._extract_usage({
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 20, "cachedContentTokenCount": 4, "totalTokenCount": 30}
+        })
+        self.assertEqual(usage, {"prompt_tokens": 10, "completion_tokens": 20, "cached_tokens": 4, "total_tokens": 30})
+
+        deepseek = DeepSeekProvider("test-key", ["deepseek-chat"])
+        usage = deepseek._extract_usage({
+            "usage": {"prompt_tokens": 7, "completion_tokens": 3, "prompt_cache_hit_tokens": 5}
+        })
+        self.assertEqual(usage, {"prompt_tokens": 7, "completion_tokens": 3, "cached_tokens": 5, "total_tokens": 10})
+
+        mistral = MistralProvider("test-key", ["mistral-large"])
+        self.assertEqual(mistral._extract_usage({})["total_tokens"], 0)
+
+    def test_cost_calculation(self):
+        """Test cost calculation with plain and provider-qualified price keys"""
+        usage = {"prompt_tokens": 1_000_000, "completion_tokens": 1_000_000, "cached_tokens": 0}
+        self.assertAlmostEqual(self.tracker.calculate_cost("gemini", "gemini-1.5-pro", usage), 6.25)
+
+        usage = {"prompt_tokens": 1_000_000, "completion_tokens": 0, "cached_tokens": 500_000}
+        self.assertAlmostEqual(self.tracker.calculate_cost("deepseek", "deepseek-chat", usage), 0.17)
+
+        # Unknown models are free
+        self.assertEqual(self.tracker.calculate_cost("mistral", "mistral-large", usage), 0.0)
+
+    def test_summary_and_metrics(self):
+        """Test aggregation by provider, model and client"""
+        usage = {"prompt_tokens": 100, "completion_tokens": 200, "cached_tokens": 0, "total_tokens": 300}
+        self.tracker.record("gemini", "gemini-1.5-pro", "agent-a", usage, 2.0)
+        self.tracker.record("gemini", "gemini-1.5-pro", "agent-a", usage, 2.0)
+        self.tracker.record("gemini", "gemini-1.5-pro", "agent-b", None, 1.0)
+
+        summary = self.tracker.get_summary()
+        totals = summary["gemini"]["gemini-1.5-pro"]["agent-a"]
+        self.assertEqual(totals["requests"], 2)
+        self.assertEqual(totals["completion_tokens"], 400)
+        self.assertAlmostEqual(totals["tokens_per_second"], 100.0)
+        self.assertEqual(summary["gemini"]["gemini-1.5-pro"]["agent-b"]["prompt_tokens"], 0)
+
+        rendered = self.registry.render()
+        self.assertIn('mcp_tokens_total{client="agent-a",model="gemini-1.5-pro",provider="gemini",type="completion"} 400.0', rendered)
+        self.assertIn("# TYPE mcp_cost_usd_total counter", rendered)
+
+def main():
+    """Main entry point for usage tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
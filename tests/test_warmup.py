@@ -0,0 +1,103 @@
+"""
+II-Agent MCP Server Add-On - Test Connection Warm-Up
+Tests pre-connection, warm-up probes, keep-alive pings and connection reuse
+"""
+import os
+import sys
+import time
+import unittest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehaviour
+from ii_agent_mcp_mvp.providers.factory import ProviderFactory
+from ii_agent_mcp_mvp.warmup import ConnectionWarmer
+from ii_agent_mcp_mvp.utils.metrics import MetricsRegistry
+from ii_agent_mcp_mvp.utils.logging import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+class ConnectionWarmerTester(unittest.TestCase):
+    """Tests connection warm-up against the mock upstream"""
+
+    def setUp(self):
+        """Start a mock upstream with a Gemini and a DeepSeek provider"""
+        self.behaviour = UpstreamBehaviour(latency=0.0, completion_tokens=2)
+        self.upstream = MockUpstream(self.behaviour).start()
+        self.factory = ProviderFactory()
+        self.gemini = self.factory.create_provider("gemini", "test-key", ["gemini-1.5-flash"], f"{self.upstream.url}/v1beta")
+        self.factory.create_provider("deepseek", "test-key", ["deepseek-chat"], f"{self.upstream.url}/v1")
+        self.registry = MetricsRegistry()
+
+    def tearDown(self):
+        """Close connections and stop the mock upstream"""
+        for provider in self.factory.get_all_providers():
+            provider.close()
+        self.upstream.stop()
+
+    def test_warm_up_reuses_connections(self):
+        """Test that generations after warm-up use the pre-established connections"""
+        warmer = ConnectionWarmer(self.factory, connections=2, registry=self.registry)
+        results = warmer.warm_up()
+
+        self.assertEqual(set(results), {"gemini", "deepseek"})
+        self.assertTrue(all(r["warmed"] and r["connections"] == 2 for r in results.values()))
+        self.assertIn("dns_seconds", results["gemini"])
+        self.assertEqual(self.behaviour.stats["connections"], 4)
+
+        for _ in range(3):
+            self.assertTrue(self.gemini.generate("hello", "gemini-1.5-flash")["success"])
+        self.assertEqual(self.behaviour.stats["connections"], 4)
+        self.assertEqual(self.behaviour.stats["requests"], 3)
+
+    def test_probe(self):
+        """Test that the optional probe sends a one-token generation"""
+        warmer = ConnectionWarmer(self.factory, connections=1, probe=True, registry=self.registry)
+        results = warmer.warm_up()
+        self.assertTrue(results["gemini"]["probe_ok"])
+        self.assertEqual(self.behaviour.stats["requests"], 2)
+
+    def test_unreachable_provider(self):
+        """Test that a provider that cannot be reached is reported but does not fail warm-up"""
+        self.factory.create_provider("mistral", "test-key", ["mistral-small"], "http://127.0.0.1:9/v1")
+        warmer = ConnectionWarmer(self.factory, connections=1, timeout=1.0, registry=self.registry)
+        results = warmer.warm_up()
+        self.assertFalse(results["mistral"]["warmed"])
+        self.assertTrue(results["gemini"]["warmed"])
+
+    def test_keepalive_pings_idle_providers(self):
+        """Test that only providers idle for a keep-alive interval are pinged"""
+        warmer = ConnectionWarmer(self.factory, connections=1, keepalive_interval=0.2, registry=self.registry)
+        warmer.ping_idle()
+        self.assertEqual(self.behaviour.stats["head_requests"], 2)
+
+        warmer.ping_idle()
+        self.assertEqual(self.behaviour.stats["head_requests"], 2)
+
+        time.sleep(0.25)
+        self.gemini.generate("hello", "gemini-1.5-flash")
+        warmer.ping_idle()
+        self.assertEqual(self.behaviour.stats["head_requests"], 3)
+
+        pings = self.registry.counter("mcp_keepalive_pings_total", "")
+        self.assertEqual(pings.get({"provider": "deepseek", "result": "ok"}), 2)
+        self.assertEqual(warmer.get_status()["gemini"]["ping_failures"], 0)
+
+    def test_from_config(self):
+        """Test configuration parsing"""
+        self.assertIsNone(ConnectionWarmer.from_config(self.factory, {"enabled": False}))
+        warmer = ConnectionWarmer.from_config(self.factory, {"connections": 4, "keepalive_interval": 0})
+        self.assertEqual(warmer.connections, 4)
+        self.assertFalse(warmer.wait_on_startup)
+        self.assertTrue(ConnectionWarmer.from_config(self.factory, {"wait_on_startup": True}).wait_on_startup)
+        warmer.start()
+        self.assertIsNone(warmer._thread)
+
+def main():
+    """Main entry point for connection warm-up tester"""
+    unittest.main()
+
+if __name__ == "__main__":
+    main()